@@ -0,0 +1,352 @@
+import hashlib
+import os
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from instrumentacja import instrumented
+from stacje import station_index
+
+
+class DailyAggregates:
+    """
+        Częściowe agregaty dobowe pomiarów PM2.5: suma i liczba pomiarów dla każdej stacji i dnia.
+
+        Agregaty liczone są jednym przebiegiem po tabeli godzinowej (`from_frame`), z dniem zapisanym
+        jako liczba całkowita (numer dnia od 1970-01-01) zamiast obiektów `date`. Średnie miesięczne,
+        roczne, dobowe oraz zestawienia dla miast i województw wyliczane są już z agregatów (`rollup`),
+        więc kolejne funkcje z `obliczenia` nie przeglądają ponownie całej tabeli.
+
+        Atrybuty:
+            daily (pd.DataFrame): Tabela z kolumnami 'stacja', 'miejscowość', 'rok', 'miesiąc', 'dzień',
+                                  'suma' (float64), 'liczba' (pomiary niepuste), 'wiersze' (wszystkie wiersze).
+    """
+
+    keys = ['stacja', 'miejscowość', 'rok', 'dzień']
+
+    def __init__(self, daily):
+        self.daily = daily
+
+    def __len__(self):
+        return len(self.daily)
+
+    def __repr__(self):
+        return f"DailyAggregates({len(self)} wierszy, lata: {sorted(self.daily['rok'].unique().tolist())})"
+
+    @classmethod
+    def from_frame(cls, df, year=None):
+        """
+            Liczy agregaty dobowe z tabeli pomiarów w formacie long (jeden przebieg po danych).
+            Args:
+                df (pd.DataFrame): DataFrame z kolumnami 'czas', 'stacja', 'rok', 'wartość'
+                                   (opcjonalnie 'miejscowość').
+                year (int, optional): Rok danych, gdy `df` nie ma kolumny 'rok' (np. wynik `prepare_to_analize`
+                                      dla jednego roku). Domyślnie None.
+            Returns:
+                DailyAggregates: Agregaty dobowe.
+        """
+        if 'rok' not in df.columns:
+            if year is None:
+                raise ValueError("Brak kolumny 'rok' – podaj rok danych (`year`) lub słownik {rok: DataFrame}")
+            df = df.assign(rok=np.int16(year))
+        czas = df['czas']
+        if not pd.api.types.is_datetime64_any_dtype(czas):
+            czas = pd.to_datetime(czas)
+        day = czas.to_numpy().astype('datetime64[D]').view('int64').astype('int32')
+
+        places = df['miejscowość'] if 'miejscowość' in df.columns else pd.Series(np.nan, index=df.index)
+        values = df['wartość'].astype('float64')  # sumy w float64, niezależnie od typu kolumny
+        keys = [df['stacja'], places.rename('miejscowość'), df['rok'], pd.Series(day, index=df.index, name='dzień')]
+        grouped = values.groupby(keys, observed=True, dropna=False, sort=True)
+        daily = grouped.agg(['sum', 'count', 'size']).reset_index()
+        daily = daily.rename(columns={'sum': 'suma', 'count': 'liczba', 'size': 'wiersze'})
+        daily['liczba'] = daily['liczba'].astype('int32')
+        daily['wiersze'] = daily['wiersze'].astype('int32')
+        daily['stacja'] = daily['stacja'].astype('category')
+        daily['miejscowość'] = daily['miejscowość'].astype('category')
+        daily.insert(3, 'miesiąc', day_to_month(daily['dzień'].to_numpy()))
+        return cls(daily)
+
+    @classmethod
+    def from_years(cls, all_data):
+        """
+            Liczy agregaty dobowe dla słownika {rok: DataFrame} (np. wyniku `prepare_to_analize`).
+        """
+        parts = [cls.from_frame(df, year) for year, df in all_data.items()]
+        return parts[0].append(parts[1:], mode='add') if parts else None
+
+    def append(self, others, mode='replace'):
+        """
+            Dołącza agregaty nowych pomiarów bez przeliczania historii.
+
+            Przy mode='replace' dni (stacja, rok, dzień) obecne w nowych agregatach zastępują dotychczasowe –
+            tak można dołączyć zarówno kolejny miesiąc, jak i ponownie pobrany arkusz całego roku.
+            Sumy dobowe liczone są tak samo jak przy pełnym przeliczeniu, więc wyniki są identyczne.
+            Przy mode='add' sumy i liczby pomiarów z tych samych dni są dodawane (nowe godziny tego samego dnia).
+            Args:
+                others (DailyAggregates | pd.DataFrame | list): Nowe agregaty lub tabela nowych pomiarów
+                                                               (albo lista takich obiektów).
+                mode (str, optional): 'replace' lub 'add'. Domyślnie 'replace'.
+            Returns:
+                DailyAggregates: Nowe agregaty (obiekt `self` nie jest zmieniany).
+        """
+        if mode not in ('replace', 'add'):
+            raise ValueError(f"Nieznany tryb łączenia agregatów: {mode} (dostępne: 'replace', 'add')")
+        if not isinstance(others, (list, tuple)):
+            others = [others]
+
+        daily = self.daily
+        for other in others:
+            other = other if isinstance(other, DailyAggregates) else DailyAggregates.from_frame(other)
+            old, new = _union_categories(daily, other.daily)
+            if mode == 'replace':
+                key = ['stacja', 'rok', 'dzień']
+                daily = pd.concat([old[~_row_keys(old, key).isin(_row_keys(new, key))], new], ignore_index=True)
+            else:
+                daily = pd.concat([old, new], ignore_index=True)
+                daily = (daily.groupby(self.keys, observed=True, dropna=False, sort=False)
+                         .agg({'miesiąc': 'first', 'suma': 'sum', 'liczba': 'sum', 'wiersze': 'sum'}).reset_index())
+                daily = daily[old.columns]
+
+        daily = daily.sort_values(self.keys, ignore_index=True)
+        return DailyAggregates(daily)
+
+    def common_stations(self):
+        """
+            Zostawia tylko stacje obecne we wszystkich latach (ta sama zasada co w `combine_years`).
+        """
+        years_per_station = self.daily.groupby('stacja', observed=True)['rok'].nunique()
+        stations = years_per_station[years_per_station == self.daily['rok'].nunique()].index
+        return DailyAggregates(self.daily[self.daily['stacja'].isin(stations)])
+
+    def save(self, path):
+        """
+            Zapisuje agregaty do pliku Parquet.
+        """
+        self.daily.to_parquet(path, index=False)
+
+    @classmethod
+    def load(cls, path):
+        """
+            Wczytuje agregaty zapisane przez `save`.
+        """
+        return cls(pd.read_parquet(path))
+
+    def valid_years(self, min_months=10):
+        """
+            Lata, dla których są dane z co najmniej `min_months` miesięcy (odpowiednik `filter_data`).
+        """
+        months_per_year = self.daily.groupby('rok')['miesiąc'].nunique()
+        return months_per_year[months_per_year >= min_months].index
+
+    def filtered(self, min_months=10):
+        """
+            Zwraca agregaty tylko dla lat z co najmniej `min_months` miesiącami danych.
+        """
+        return DailyAggregates(self.daily[self.daily['rok'].isin(self.valid_years(min_months))])
+
+    def select(self, cities=None, years=None):
+        """
+            Wybiera agregaty dla podanych miejscowości i lat (None – wszystkie).
+        """
+        daily = self.daily
+        if cities is not None:
+            daily = daily[daily['miejscowość'].isin(cities)]
+        if years is not None:
+            daily = daily[daily['rok'].isin(years)]
+        return DailyAggregates(daily)
+
+    def with_voivodeship(self, meta):
+        """
+            Dołącza kolumnę 'Województwo' (z indeksu stacji) do agregatów.
+            Args:
+                meta (pd.DataFrame | StationIndex): Metadane stacji lub gotowy indeks stacji.
+        """
+        daily = self.daily.assign(Województwo=station_index(meta).lookup(self.daily['stacja'], 'Województwo'))
+        return DailyAggregates(daily)
+
+    def rollup(self, by):
+        """
+            Łączy agregaty dobowe w grupy (np. ['stacja', 'rok', 'miesiąc'] lub ['miejscowość', 'rok', 'dzień'])
+            i liczy średnią ze wszystkich pomiarów w grupie.
+            Args:
+                by (list): Kolumny grupujące.
+            Returns:
+                pd.DataFrame: Tabela z kolumnami `by`, 'suma', 'liczba', 'średnia' (NaN, gdy brak pomiarów).
+        """
+        result = self.daily.groupby(by, observed=True, sort=True)[['suma', 'liczba']].sum().reset_index()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['średnia'] = result['suma'] / result['liczba'].where(result['liczba'] > 0)
+        return result
+
+    def daily_matrix(self, by, per_year=True):
+        """
+            Układa agregaty dobowe w macierze [dzień roku, grupa], gdzie grupa to kombinacja kolumn `by` i roku.
+            Przy `per_year=False` grupą są same kolumny `by`, a wiersze to kolejne dni całego okresu
+            (ciągła oś dni, np. dla epizodów przechodzących przez przełom roku).
+            Args:
+                by (list): Kolumny grupujące (np. ['stacja'] lub ['Województwo', 'rok']).
+                per_year (bool, optional): Czy dzielić grupy na lata. Domyślnie True.
+            Returns:
+                tuple: (tabela grup z kolumnami `by` – kolumny macierzy, sumy [dzień, grupa],
+                        liczby pomiarów [dzień, grupa], numer dnia roku – lub przy `per_year=False` numer dnia
+                        od 1970-01-01 – odpowiadający wierszowi 0); dni bez danych mają sumę i liczbę 0.
+        """
+        if per_year:
+            by = by if 'rok' in by else by + ['rok']
+        daily = self.rollup(by + ['dzień'])
+        column = daily.groupby(by, observed=True, sort=True).ngroup().to_numpy()
+        groups = daily.drop_duplicates(by)[by].reset_index(drop=True)
+
+        if per_year:
+            # numer dnia w roku grupy (0 = 1 stycznia; dzień sprzed 1 stycznia przesuwa początek macierzy)
+            year_start = (daily['rok'].to_numpy().astype('int64') - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+            row = daily['dzień'].to_numpy() - year_start.astype('int64')
+            first = min(int(row.min()), 0) if len(row) else 0
+        else:
+            row = daily['dzień'].to_numpy().copy()
+            first = int(row.min()) if len(row) else 0
+        row -= first
+        n_days = int(row.max()) + 1 if len(row) else 0
+
+        sums = np.zeros((n_days, len(groups)))
+        counts = np.zeros((n_days, len(groups)), dtype='int64')
+        sums[row, column] = daily['suma'].to_numpy()
+        counts[row, column] = daily['liczba'].to_numpy()
+        return groups, sums, counts, first
+
+    def exceedances(self, by, norms=15, window=1):
+        """
+            Liczba dni, w których średnia grupy przekroczyła normę, dla każdej grupy, roku i normy.
+            Wszystkie normy liczone są jednym porównaniem na macierzy średnich [dzień, grupa] (`daily_matrix`).
+            Args:
+                by (list): Kolumny grupujące (np. ['stacja', 'miejscowość'] lub ['Województwo']).
+                norms (float | list, optional): Norma lub lista norm PM2.5 (µg/m³), np. [15, 25]. Domyślnie 15.
+                window (int, optional): Długość okna w dniach – średnia ze wszystkich pomiarów z `window`
+                                        kolejnych dni kończących się danym dniem (okna w obrębie roku;
+                                        pierwsze `window` - 1 dni roku nie są oceniane). Domyślnie 1 (średnia dobowa).
+            Returns:
+                pd.DataFrame: Tabela z kolumnami `by` (z 'rok' na pozycji podanej w `by` lub na końcu),
+                              'norma' i 'przekroczenia'.
+        """
+        norms = np.atleast_1d(np.asarray(norms, dtype='float64'))
+        groups, sums, counts, _ = self.daily_matrix(by)
+
+        if window > 1:
+            # sumy kroczące przez sumy skumulowane – O(liczba dni) niezależnie od długości okna
+            sums = np.cumsum(sums, axis=0)
+            counts = np.cumsum(counts, axis=0)
+            sums[window:] = sums[window:] - sums[:-window]
+            counts[window:] = counts[window:] - counts[:-window]
+            sums, counts = sums[window - 1:], counts[window - 1:]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / np.where(counts > 0, counts, np.nan)
+        # średnie porównywane w typie przechowywania pomiarów (float32), tak jak średnie z groupby po 'wartość' –
+        # w float64 średnie bliskie normie (np. 25.0000004) dawały dodatkowe przekroczenia
+        means = means.astype('float32')
+        exceeded = (means[:, :, None] > norms).sum(axis=0)  # [grupa, norma]
+
+        result = groups.loc[groups.index.repeat(len(norms))].reset_index(drop=True)
+        result['norma'] = np.tile(norms, len(groups))
+        result['przekroczenia'] = exceeded.ravel()
+        return result
+
+
+def _union_categories(a, b):
+    # wspólne kategorie kolumn 'stacja' i 'miejscowość' (pd.concat różnych kategorii dałby kolumny typu object)
+    a, b = a.copy(), b.copy()
+    for col in ('stacja', 'miejscowość'):
+        categories = a[col].cat.categories.union(b[col].cat.categories)
+        a[col] = a[col].cat.set_categories(categories)
+        b[col] = b[col].cat.set_categories(categories)
+    return a, b
+
+
+def _row_keys(df, columns):
+    # klucz wiersza jako MultiIndex z kodów kategorii i liczb (szybkie isin)
+    return pd.MultiIndex.from_arrays([df[col].cat.codes if col == 'stacja' else df[col] for col in columns])
+
+
+def update_store(path, data, mode='replace', common_stations=False):
+    """
+        Aktualizuje agregaty dobowe zapisane w pliku Parquet nowymi pomiarami (tryb przyrostowy).
+        Gdy pliku nie ma, agregaty są liczone od zera.
+
+        Przykład – comiesięczna aktualizacja bez przeliczania poprzednich lat:
+            cleared = prepare_to_analize({2025: raw_2025}, df_meta)
+            aggregates = update_store("agregaty.parquet", cleared)
+            count_daily_avg(aggregates)
+        Args:
+            path (str): Ścieżka do pliku z agregatami.
+            data (pd.DataFrame | dict): Nowe pomiary w formacie long (z kolumną 'rok') lub słownik {rok: DataFrame}.
+            mode (str, optional): Sposób łączenia z istniejącymi agregatami (patrz `DailyAggregates.append`).
+                                  Domyślnie 'replace'.
+            common_stations (bool, optional): Czy zostawić tylko stacje obecne we wszystkich latach
+                                              (jak `combine_years`). Domyślnie False.
+        Returns:
+            DailyAggregates: Zaktualizowane (i zapisane) agregaty.
+    """
+    new = DailyAggregates.from_years(data) if isinstance(data, dict) else DailyAggregates.from_frame(data)
+    aggregates = DailyAggregates.load(path).append(new, mode) if os.path.exists(path) else new
+    if common_stations:
+        aggregates = aggregates.common_stations()
+    aggregates.save(path)
+    return aggregates
+
+
+def day_to_month(days):
+    """
+        Zamienia numery dni (od 1970-01-01) na numery miesięcy (1–12, int8).
+    """
+    months = np.asarray(days, dtype='int64').astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+    return (months % 12 + 1).astype('int8')
+
+
+# agregaty policzone dla tabel pomiarów: {id(df): (weakref, podpis zawartości, DailyAggregates)}
+_aggregates_cache = {}
+
+
+def _signature(df):
+    # podpis wszystkich kolumn, z których liczone są agregaty (także kolumn grup 'miejscowość' i 'rok') –
+    # zmienia się także po edycji tabeli w miejscu; SHA-1 danych kolumn to ok. 10% czasu liczenia agregatów
+    digest = hashlib.sha1()
+    columns = [column for column in ('czas', 'wartość', 'stacja', 'miejscowość', 'rok') if column in df.columns]
+    digest.update('\x00'.join(columns).encode('utf-8'))
+    for column in columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            digest.update('\x00'.join(map(str, values.cat.categories)).encode('utf-8'))
+            values = values.cat.codes
+        values = values.to_numpy()
+        if values.dtype == object:
+            values = pd.util.hash_array(values)
+        digest.update(np.ascontiguousarray(values).view('uint8'))
+    return len(df), digest.hexdigest()
+
+
+@instrumented
+def daily_aggregates(df):
+    """
+        Zwraca agregaty dobowe dla tabeli pomiarów, licząc je tylko przy pierwszym wywołaniu dla danego
+        DataFrame (kolejne funkcje z `obliczenia` korzystają z tych samych agregatów).
+        Zapisane agregaty są sprawdzane z podpisem kolumn 'czas', 'wartość', 'stacja', 'miejscowość' i 'rok',
+        więc po zmianie `df` w miejscu są liczone ponownie.
+        Args:
+            df (pd.DataFrame | DailyAggregates): Tabela pomiarów w formacie long lub gotowe agregaty.
+        Returns:
+            DailyAggregates: Agregaty dobowe.
+    """
+    if isinstance(df, DailyAggregates):
+        return df
+
+    signature = _signature(df)
+    cached = _aggregates_cache.get(id(df))
+    if cached is not None and cached[0]() is df and cached[1] == signature:
+        return cached[2]
+
+    aggregates = DailyAggregates.from_frame(df)
+    _aggregates_cache[id(df)] = (weakref.ref(df, lambda _, key=id(df): _aggregates_cache.pop(key, None)),
+                                 signature, aggregates)
+    return aggregates
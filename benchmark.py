@@ -0,0 +1,400 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from agregaty import DailyAggregates, daily_aggregates
+from czyszczenie_danych import clear_data, combine_years, memory_report, prepare_to_analize
+from obliczenia import (add_month_column, count_daily_avg, count_exceedances, count_monthly_avg_city,
+                        count_monthly_avg_station, exceedance_episodes, filter_data, longest_episode, rolling_mean,
+                        top_stations, voivodeship_above_norm_mean)
+from wczytywanie import excel_engines, read_sheet
+
+
+def synthetic_gios_sheet(year=2024, n_stations=100, seed=0, comma_fraction=0.1, missing_fraction=0.02, codes=None):
+    """
+        Generuje syntetyczny arkusz pomiarów godzinowych PM2.5 w układzie plików GIOŚ.
+
+        Arkusz zawiera blok nagłówkowy ('Nr', 'Kod stacji', 'Wskaźnik', 'Czas uśredniania',
+        'Jednostka', 'Kod stanowiska') i wiersze godzinowe od 01:00 1 stycznia do północy
+        31 grudnia (zapisanej jako 00:00 następnego roku). Część wartości zapisana jest tekstem
+        z przecinkiem dziesiętnym, a część jest pusta – tak jak w prawdziwych plikach.
+        Args:
+            year (int, optional): Rok pomiarów. Domyślnie 2024.
+            n_stations (int, optional): Liczba stacji (kolumn). Domyślnie 100.
+            seed (int, optional): Ziarno generatora liczb losowych. Domyślnie 0.
+            comma_fraction (float, optional): Udział wartości zapisanych tekstem z przecinkiem. Domyślnie 0.1.
+            missing_fraction (float, optional): Udział brakujących pomiarów. Domyślnie 0.02.
+            codes (list, optional): Kody stacji (kolumn). Domyślnie None – 'Syn0000', 'Syn0001', ...
+        Returns:
+            pd.DataFrame: Arkusz w postaci zwracanej przez `pd.read_excel(header=None)`.
+    """
+    rng = np.random.default_rng(seed)
+    if codes is None:
+        codes = [f"Syn{i:04d}" for i in range(n_stations)]
+    n_stations = len(codes)
+    times = pd.date_range(f"{year}-01-01 01:00", f"{year + 1}-01-01 00:00", freq="h")
+
+    values = rng.gamma(2.0, 10.0, size=(len(times), n_stations)).round(1).astype(object)
+    values[rng.random(values.shape) < missing_fraction] = None
+    commas = rng.random(values.shape) < comma_fraction
+    values[commas] = [str(v).replace('.', ',') if v is not None else None for v in values[commas]]
+
+    header = [
+        ["Nr"] + list(range(1, n_stations + 1)),
+        ["Kod stacji"] + codes,
+        ["Wskaźnik"] + ["PM2.5"] * n_stations,
+        ["Czas uśredniania"] + ["1g"] * n_stations,
+        ["Jednostka"] + ["ug/m3"] * n_stations,
+        ["Kod stanowiska"] + [f"{code}-PM2.5-1g" for code in codes],
+    ]
+    data = np.column_stack([times.to_pydatetime().astype(object), values])
+
+    return pd.DataFrame(np.vstack([np.array(header, dtype=object), data]))
+
+
+def synthetic_metadata(n_stations=100, n_cities=20, renamed_fraction=0.1, seed=0):
+    """
+        Generuje syntetyczne metadane stacji w układzie pliku GIOŚ (jak `load_metadane2`).
+        Część stacji ma stary kod (kolumna 'Stary Kod stacji \n(o ile inny od aktualnego)'),
+        pod którym występuje w arkuszach ze starszych lat (`old_codes`).
+        Args:
+            n_stations (int, optional): Liczba stacji. Domyślnie 100.
+            n_cities (int, optional): Liczba miejscowości. Domyślnie 20.
+            renamed_fraction (float, optional): Udział stacji, którym zmieniono kod. Domyślnie 0.1.
+            seed (int, optional): Ziarno generatora liczb losowych. Domyślnie 0.
+        Returns:
+            pd.DataFrame: Metadane z kolumnami 'Kod stacji', 'Stary Kod stacji \n(o ile inny od aktualnego)',
+                          'Województwo', 'Miejscowość', 'WGS84 φ N', 'WGS84 λ E'.
+    """
+    rng = np.random.default_rng(seed)
+    codes = [f"Syn{i:04d}" for i in range(n_stations)]
+    renamed = rng.random(n_stations) < renamed_fraction
+    cities = [f"Miasto{i % n_cities:02d}" for i in range(n_stations)]
+
+    return pd.DataFrame({
+        'Kod stacji': codes,
+        'Stary Kod stacji \n(o ile inny od aktualnego)': [f"Old{code[3:]}" if r else None
+                                                          for code, r in zip(codes, renamed)],
+        'Województwo': [f"WOJ{i % 16:02d}" for i in range(n_stations)],
+        'Miejscowość': cities,
+        'WGS84 φ N': rng.uniform(49.0, 54.8, n_stations),
+        'WGS84 λ E': rng.uniform(14.1, 24.1, n_stations),
+    })
+
+
+def old_codes(meta):
+    """
+        Zwraca kody stacji w postaci sprzed zmiany (stary kod, jeśli stacja go ma).
+        Służy do generowania arkuszy ze starszych lat (`synthetic_gios_sheet(codes=old_codes(meta))`).
+    """
+    old = meta['Stary Kod stacji \n(o ile inny od aktualnego)']
+    return old.fillna(meta['Kod stacji']).tolist()
+
+
+def synthetic_dataset(years=(2015, 2018, 2021, 2024), n_stations=100, n_cities=20, seed=0):
+    """
+        Generuje komplet danych syntetycznych: surowe arkusze dla kilku lat i metadane stacji.
+        Pierwszy rok używa starych kodów stacji, kolejne – aktualnych.
+        Args:
+            years (tuple, optional): Lata pomiarów. Domyślnie (2015, 2018, 2021, 2024).
+            n_stations (int, optional): Liczba stacji. Domyślnie 100.
+            n_cities (int, optional): Liczba miejscowości. Domyślnie 20.
+            seed (int, optional): Ziarno generatora liczb losowych. Domyślnie 0.
+        Returns:
+            tuple: (słownik {rok: surowy arkusz}, metadane stacji).
+    """
+    meta = synthetic_metadata(n_stations, n_cities, seed=seed)
+    raw = {}
+    for i, year in enumerate(years):
+        codes = old_codes(meta) if i == 0 else meta['Kod stacji'].tolist()
+        raw[year] = synthetic_gios_sheet(year, seed=seed + i, codes=codes)
+    return raw, meta
+
+
+def _legacy_long_format(raw, meta):
+    # tabela long zbudowana tak jak przed kompaktowaniem (melt arkuszy, `replace` starych kodów, `map` miejscowości,
+    # pivot/concat/melt lat, `pd.to_numeric` wartości) – punkt odniesienia dla `benchmark_long_format_memory`
+    code_map = {old_code.strip(): row['Kod stacji'] for _, row in meta.iterrows()
+                for old_code in str(row['Stary Kod stacji \n(o ile inny od aktualnego)'] or '').split(',')
+                if old_code.strip()}
+    place_map = dict(zip(meta['Kod stacji'], meta['Miejscowość']))
+
+    years = {}
+    for year, df in raw.items():
+        idx_kod = df.index[df.eq("Kod stacji").any(axis=1)][0]
+        df = df.copy()
+        df.columns = df.iloc[idx_kod]
+        df = df.iloc[idx_kod + 1:].reset_index(drop=True)
+        df = df.rename(columns={df.columns[0]: "czas"})
+        df['czas'] = pd.to_datetime(df['czas'], format='mixed', errors='coerce')
+        df = df.dropna(subset=['czas']).reset_index(drop=True)
+        mask_midnight = df['czas'].dt.hour == 0
+        df.loc[mask_midnight, 'czas'] = df.loc[mask_midnight, 'czas'] - pd.Timedelta(seconds=1)
+        df = df.sort_values('czas').reset_index(drop=True)
+        df = df.melt(id_vars='czas', var_name='stacja', value_name='wartość')
+        df['stacja'] = df['stacja'].replace(code_map)
+        years[year] = df.pivot(index='czas', columns='stacja', values='wartość')
+
+    df_all = pd.concat(years.values(), axis=0, join='inner').reset_index().melt(
+        id_vars='czas', var_name='stacja', value_name='wartość')
+    df_all['miejscowość'] = df_all['stacja'].map(place_map)
+    df_all['rok'] = df_all['czas'].dt.year
+    df_all['wartość'] = pd.to_numeric(df_all['wartość'].astype(str).str.replace(',', '.'), errors='coerce')
+    df_all['miesiąc'] = df_all['czas'].dt.month
+    return df_all[['czas', 'stacja', 'miejscowość', 'rok', 'miesiąc', 'wartość']]
+
+
+def benchmark_long_format_memory(years=(2015, 2018, 2021, 2024), n_stations=100):
+    """
+        Porównuje zużycie pamięci zbiorczej tabeli pomiarów zbudowanej dawnym potokiem (melt, `replace`
+        i `map` na kolumnach typu object, `pd.to_numeric` wartości) i obecnym potokiem
+        (`prepare_to_analize` → `combine_years` → `add_month_column`: category, float32, int16/int8).
+        Obie tabele liczone są z tych samych danych syntetycznych i mają tyle samo wierszy.
+        Args:
+            years (tuple, optional): Lata danych syntetycznych. Domyślnie (2015, 2018, 2021, 2024).
+            n_stations (int, optional): Liczba stacji. Domyślnie 100.
+        Returns:
+            pd.DataFrame: Raport `czyszczenie_danych.memory_report` (MB na kolumnę).
+    """
+    raw, meta = synthetic_dataset(years, n_stations)
+    with contextlib.redirect_stdout(io.StringIO()):
+        compact = add_month_column(combine_years(prepare_to_analize(raw, meta)))
+
+    legacy = _legacy_long_format(raw, meta)
+    return memory_report(przed=legacy, po=compact)
+
+
+def benchmark_excel_engines(path=None, year=2024, n_stations=100, engines=excel_engines, repeat=1):
+    """
+        Porównuje czas wczytywania arkusza GIOŚ przez dostępne silniki (`wczytywanie.read_sheet`).
+        Silniki, których zależności nie są zainstalowane, są pomijane.
+        Args:
+            path (str, optional): Ścieżka do pliku Excel. Domyślnie None – generowany jest arkusz
+                                  syntetyczny o rozmiarze zbliżonym do rocznego pliku GIOŚ.
+            year (int, optional): Rok arkusza syntetycznego. Domyślnie 2024.
+            n_stations (int, optional): Liczba stacji w arkuszu syntetycznym. Domyślnie 100.
+            engines (tuple, optional): Silniki do porównania. Domyślnie wszystkie.
+            repeat (int, optional): Liczba powtórzeń (wynikiem jest najlepszy czas). Domyślnie 1.
+        Returns:
+            dict: Słownik {silnik: czas wczytywania w sekundach}.
+    """
+    tmp_path = None
+    if path is None:
+        tmp_path = os.path.join(tempfile.mkdtemp(), f"{year}_PM25_1g.xlsx")
+        synthetic_gios_sheet(year, n_stations).to_excel(tmp_path, header=False, index=False)
+        path = tmp_path
+
+    results = {}
+    try:
+        for engine in engines:
+            times = []
+            try:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    read_sheet(path, engine)
+                    times.append(time.perf_counter() - start)
+            except ImportError as e:
+                print(f"Pominięto silnik {engine}: {e}")
+                continue
+            results[engine] = min(times)
+    finally:
+        if tmp_path is not None:
+            os.remove(tmp_path)
+
+    return results
+
+
+def _result_size(result):
+    # liczba wierszy i rozmiar wyniku etapu (DataFrame, słownik DataFrame'ów lub agregaty dobowe)
+    frames = result.values() if isinstance(result, dict) else [getattr(result, 'daily', result)]
+    frames = [df for df in frames if isinstance(df, pd.DataFrame)]
+    rows = sum(len(df) for df in frames)
+    size = sum(df.memory_usage(deep=True).sum() for df in frames) / 1024 ** 2
+    return rows, size
+
+
+def _measure(function, repeat=1):
+    # czas etapu: najlepszy z `repeat` przebiegów bez śledzenia pamięci; szczyt pamięci: osobny przebieg
+    # pod `tracemalloc` (alokacje Pythona i numpy – śledzenie spowalnia, więc nie wlicza się do czasu)
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = function()
+        times.append(time.perf_counter() - start)
+
+    rows, size = _result_size(result)
+    return result, {'czas [s]': round(min(times), 4), 'szczyt pamięci [MB]': round(peak / 1024 ** 2, 2),
+                    'wiersze wyniku': int(rows), 'rozmiar wyniku [MB]': round(float(size), 2)}
+
+
+def _git_version():
+    # skrót bieżącego commita (None poza repozytorium git)
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_pipeline(years=(2015, 2018, 2021, 2024), n_stations=100, n_cities=20, seed=0, repeat=1, output=None,
+                       max_workers=None):
+    """
+        Mierzy czas i szczyt pamięci każdego etapu analizy na danych syntetycznych (`synthetic_dataset`):
+        `clear_data` (wszystkie lata), `prepare_to_analize`, `combine_years`, `add_month_column`,
+        agregaty dobowe (`daily_aggregates`) i każdą funkcję z `obliczenia`.
+
+        Etapy wykonywane są w kolejności potoku, każdy na wyniku poprzedniego. Funkcje z `obliczenia`
+        korzystają z agregatów dobowych policzonych w etapie 'daily_aggregates' (jak w notatniku).
+        Szczyt pamięci mierzony jest w osobnym przebiegu przez `tracemalloc` (alokacje Pythona i numpy,
+        bez buforów Arrow), a czas – bez śledzenia pamięci.
+        Przy `max_workers` > 1 mierzony jest też etap 'prepare_to_analize_parallel' (lata w puli procesów),
+        do porównania z 'prepare_to_analize' – przyspieszenie zależy od liczby procesorów ('środowisko');
+        pamięć procesów potomnych nie jest wliczana.
+        Args:
+            years (tuple, optional): Lata danych syntetycznych. Domyślnie (2015, 2018, 2021, 2024).
+            n_stations (int, optional): Liczba stacji. Domyślnie 100.
+            n_cities (int, optional): Liczba miejscowości. Domyślnie 20.
+            seed (int, optional): Ziarno generatora liczb losowych. Domyślnie 0.
+            repeat (int, optional): Liczba pomiarów czasu (wynikiem jest najlepszy czas). Domyślnie 1.
+            output (str, optional): Ścieżka pliku JSON z wynikami. Domyślnie None – bez zapisu.
+            max_workers (int, optional): Liczba procesów w etapie 'prepare_to_analize_parallel'.
+                                         Domyślnie None – bez tego etapu.
+        Returns:
+            dict: Wyniki: 'wersja' (commit git), 'data', 'środowisko', 'parametry' i 'etapy'
+                  ({etap: {'czas [s]', 'szczyt pamięci [MB]', 'wiersze wyniku', 'rozmiar wyniku [MB]'}}).
+    """
+    years = tuple(years)
+    raw, meta = synthetic_dataset(years, n_stations, n_cities, seed)
+    reference_year = years[-1]
+
+    stages = {}
+    results = {}
+
+    def stage(name, function):
+        results[name], stages[name] = _measure(function, repeat)
+        return results[name]
+
+    stage('clear_data', lambda: {year: clear_data(df, year) for year, df in raw.items()})
+    prepared = stage('prepare_to_analize', lambda: prepare_to_analize(raw, meta))
+    if max_workers is not None and max_workers > 1:
+        stage('prepare_to_analize_parallel', lambda: prepare_to_analize(raw, meta, max_workers=max_workers))
+    combined = stage('combine_years', lambda: combine_years(prepared))
+    final_df = stage('add_month_column', lambda: add_month_column(combined))
+    # agregaty mierzone bez pamięci podręcznej, a potem zapamiętane dla funkcji z `obliczenia`
+    stage('daily_aggregates', lambda: DailyAggregates.from_frame(final_df))
+    daily_aggregates(final_df)
+
+    stage('count_monthly_avg_station', lambda: count_monthly_avg_station(final_df))
+    stage('count_monthly_avg_city', lambda: count_monthly_avg_city(final_df))
+    stage('filter_data', lambda: filter_data(final_df))
+    exceedances = stage('count_exceedances', lambda: count_exceedances(final_df))
+    stage('top_stations', lambda: top_stations(exceedances, reference_year))
+    stage('count_daily_avg', lambda: count_daily_avg(final_df, reference_year=reference_year))
+    stage('voivodeship_above_norm_mean', lambda: voivodeship_above_norm_mean(meta, final_df))
+    stage('rolling_mean', lambda: rolling_mean(final_df))
+    stage('exceedance_episodes', lambda: exceedance_episodes(final_df))
+    stage('longest_episode', lambda: longest_episode(final_df))
+
+    benchmark = {
+        'wersja': _git_version(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'środowisko': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                       'procesory': os.cpu_count()},
+        'parametry': {'lata': list(years), 'stacje': n_stations, 'miejscowości': n_cities, 'ziarno': seed,
+                      'powtórzenia': repeat, 'procesy': max_workers, 'wiersze': len(final_df)},
+        'etapy': stages,
+    }
+    if output is not None:
+        save_benchmark(benchmark, output)
+    return benchmark
+
+
+def save_benchmark(benchmark, path):
+    """
+        Zapisuje wyniki `benchmark_pipeline` do pliku JSON.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(benchmark, f, ensure_ascii=False, indent=2)
+
+
+def load_benchmark(path):
+    """
+        Wczytuje wyniki zapisane przez `save_benchmark`.
+    """
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_benchmarks(before, after):
+    """
+        Porównuje dwa wyniki `benchmark_pipeline` (np. dwóch wersji kodu), żeby widać było regresje.
+        Args:
+            before (dict | str): Wyniki wcześniejsze lub ścieżka pliku JSON.
+            after (dict | str): Wyniki późniejsze lub ścieżka pliku JSON.
+        Returns:
+            pd.DataFrame: Tabela (indeks: etap) z czasem i szczytem pamięci przed i po
+                          oraz ich ilorazami ('czas po/przed', 'pamięć po/przed'; > 1 – pogorszenie).
+                          Gdy wyniki dotyczą danych o różnych parametrach, wypisywane jest ostrzeżenie.
+    """
+    before = load_benchmark(before) if isinstance(before, (str, os.PathLike)) else before
+    after = load_benchmark(after) if isinstance(after, (str, os.PathLike)) else after
+    if before['parametry'] != after['parametry']:
+        print("Uwaga: porównywane wyniki dotyczą danych o różnych parametrach")
+    old = pd.DataFrame.from_dict(before['etapy'], orient='index')
+    new = pd.DataFrame.from_dict(after['etapy'], orient='index')
+
+    report = pd.DataFrame({
+        'czas przed [s]': old['czas [s]'],
+        'czas po [s]': new['czas [s]'],
+        'pamięć przed [MB]': old['szczyt pamięci [MB]'],
+        'pamięć po [MB]': new['szczyt pamięci [MB]'],
+    }).rename_axis('etap')
+    report['czas po/przed'] = report['czas po [s]'] / report['czas przed [s]']
+    report['pamięć po/przed'] = report['pamięć po [MB]'] / report['pamięć przed [MB]']
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark potoku analizy PM2.5 na danych syntetycznych GIOŚ")
+    parser.add_argument('--years', type=int, nargs='+', default=[2015, 2018, 2021, 2024], help="lata danych")
+    parser.add_argument('--stations', type=int, default=100, help="liczba stacji")
+    parser.add_argument('--cities', type=int, default=20, help="liczba miejscowości")
+    parser.add_argument('--repeat', type=int, default=1, help="liczba pomiarów czasu")
+    parser.add_argument('--output', help="plik JSON z wynikami")
+    parser.add_argument('--compare', help="plik JSON z wcześniejszymi wynikami do porównania")
+    parser.add_argument('--workers', type=int, help="liczba procesów w etapie prepare_to_analize_parallel")
+    parser.add_argument('--engines', action='store_true', help="porównanie silników wczytywania arkusza")
+    parser.add_argument('--memory', action='store_true', help="zużycie pamięci formatu long (przed i po kompaktowaniu)")
+    args = parser.parse_args()
+
+    benchmark = benchmark_pipeline(args.years, args.stations, args.cities, repeat=args.repeat, output=args.output,
+                                   max_workers=args.workers)
+    print(pd.DataFrame.from_dict(benchmark['etapy'], orient='index').to_string())
+    if args.compare:
+        print(compare_benchmarks(args.compare, benchmark).round(2).to_string())
+
+    if args.memory:
+        print(benchmark_long_format_memory())
+    if args.engines:
+        for engine, seconds in benchmark_excel_engines().items():
+            print(f"{engine}: {seconds:.2f} s")
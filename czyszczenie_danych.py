@@ -1,61 +1,339 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from instrumentacja import instrumented
+from jakosc import QualityReport, YearQuality
+from stacje import station_index
+
+# liczba początkowych wierszy, w których szukamy wiersza 'Kod stacji' (blok nagłówkowy plików GIOŚ)
+header_search_rows = 50
+
 
-def clear_data(df, year):
+def find_header_row(df, year):
     """
-        Funkcja:
-        1. Usuwa nieprawidłowe wiersze
-        2. Konwertuje "czas" na datetime
-        3. Przesuwa pomiary o północy na dzień poprzedni
+        Zwraca numer wiersza z kodami stacji ('Kod stacji').
+        Przeszukuje najpierw tylko początkowe wiersze arkusza, a cały arkusz dopiero wtedy,
+        gdy nagłówka tam nie ma.
         Args:
             df (pd.DataFrame): DataFrame z surowymi danymi.
             year (int): Rok, dla którego dane są przetwarzane.
         Returns:
-            pd.DataFrame: Dane w formacie long z kolumnami 'czas', 'stacja', 'wartość'.
+            int: Pozycja wiersza 'Kod stacji' (lub None, gdy go nie ma).
     """
-
-    # Znalezienie wiersza z kodami stacji
-    try:
-        idx_kod = df.index[df.eq("Kod stacji").any(axis=1)][0]
-    except IndexError:
+    found = np.flatnonzero(df.iloc[:header_search_rows].eq("Kod stacji").any(axis=1).to_numpy())
+    if not len(found):
+        found = np.flatnonzero(df.eq("Kod stacji").any(axis=1).to_numpy())
+    if not len(found):
         print(f"Nie znaleziono wiersza 'Kod stacji' w roku {year}")
         return None
+    return found[0]
+
+
+def infer_time_format(values, samples=50):
+    """
+        Ustala kandydatów na jeden format daty dla kolumny czasu na podstawie pierwszych wartości tekstowych.
+        Args:
+            values (pd.Series): Kolumna z czasem pomiaru (obiekty datetime i/lub tekst).
+            samples (int, optional): Maksymalna liczba sprawdzanych wartości tekstowych. Domyślnie 50.
+        Returns:
+            list: Formaty w stylu `strftime` – najpierw odczyt miesiąc-dzień, potem dzień-miesiąc
+                  (pusta lista, gdy nie udało się ustalić formatu).
+    """
+    checked = 0
+    for value in values:
+        if not isinstance(value, str):
+            continue
+        formats = [guess_datetime_format(value.strip()), guess_datetime_format(value.strip(), dayfirst=True)]
+        formats = list(dict.fromkeys(fmt for fmt in formats if fmt is not None))
+        if formats:
+            return formats
+        checked += 1
+        if checked >= samples:
+            break
+    return []
+
+
+def parse_time(values):
+    """
+        Konwertuje kolumnę czasu na datetime w jednym przebiegu.
+        Wartości są parsowane jednym, ustalonym formatem (`infer_time_format`);
+        wolniejsze parsowanie `format='mixed'` stosowane jest tylko do wartości,
+        których nie udało się w ten sposób odczytać.
+        Args:
+            values (pd.Series): Kolumna z czasem pomiaru.
+        Returns:
+            pd.Series: Kolumna datetime64 (NaT dla wartości, które nie są datą).
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    formats = infer_time_format(values)
+    if not formats:
+        return pd.to_datetime(values, format='mixed', errors='coerce')
+
+    # wybór formatu na próbce wartości z całego roku (np. '01.02' jest niejednoznaczne, '13.02' już nie)
+    if len(formats) > 1:
+        text = values[values.map(type) == str]
+        sample = text.iloc[::max(1, len(text) // 1000)]
+        formats.sort(key=lambda fmt: pd.to_datetime(sample, format=fmt, errors='coerce').isna().sum())
+
+    czas = pd.to_datetime(values, format=formats[0], errors='coerce')
+    retry = czas.isna() & values.notna()
+    if retry.any():
+        czas[retry] = pd.to_datetime(values[retry], format='mixed', errors='coerce')
+    return czas
+
+
+def parse_values(values, stats=None):
+    """
+        Konwertuje wartości pomiarów na float32.
+        Liczby są przepisywane bez zmian, a tekst z przecinkiem dziesiętnym (np. '12,5')
+        jest zamieniany na liczbę; pozostałe wartości stają się NaN.
+        Liczby i tekst konwertowane są wektorowo (pyarrow), bez `astype(str)` i wywołań Pythona dla każdej
+        wartości; w kolumnach mieszanych liczby i tekst są najpierw rozdzielane według typu wartości.
+        Args:
+            values (pd.Series): Wartości pomiarów (liczby i/lub tekst).
+            stats (dict, optional): Słownik uzupełniany liczbą niepustych wartości, których nie udało się
+                                    odczytać jako liczby (klucz 'wartości nieliczbowe'). Domyślnie None.
+        Returns:
+            pd.Series: Wartości typu float32.
+    """
+    parsed, unparsed = _parse_values(values)
+    if stats is not None:
+        stats['wartości nieliczbowe'] = int(np.count_nonzero(unparsed)) if unparsed is not None else 0
+    return parsed
 
-    # Ustawienie nagłówków kolumn
-    df.columns = df.iloc[idx_kod] #przypisanie tego wiersza jako kolumny
-    df = df.iloc[idx_kod + 1:].reset_index(drop=True)
 
-    # Usuwanie wierszy, które nie zawierają daty w pierwszej kolumnie
-    df = df[pd.to_datetime(df[df.columns[0]], format='mixed', errors='coerce').notna()].reset_index(drop=True)
+# liczba dziesiętna w postaci akceptowanej przez rzutowanie tekstu na liczbę w pyarrow (po zamianie ',' na '.')
+_number_pattern = r'^-?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$|^-?(inf|infinity|nan)$'
 
-    # Ujednolicenie nazwy kolumny czasu
-    df = df.rename(columns={df.columns[0]: "czas"})
 
-    # Konwersja na datetime
-    df['czas'] = pd.to_datetime(df['czas'], format='mixed', errors='coerce')
-    df = df.dropna(subset=['czas']).reset_index(drop=True)
+def _parse_text(text):
+    # tablica napisów (None – brak wartości) -> (float32, maska niepustych napisów, które nie są liczbą)
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    strings = pc.replace_substring(pc.utf8_trim_whitespace(pa.array(text, type=pa.string(), from_pandas=True)), ',', '.')
+    try:
+        numbers = pc.cast(strings, pa.float64())
+    except pa.ArrowInvalid:
+        # nie wszystkie napisy są liczbami – rzutowanie tylko tych, które pasują do wzorca
+        strings = pc.replace_substring_regex(strings, r'^\+', '')
+        valid = pc.match_substring_regex(strings, _number_pattern, ignore_case=True)
+        numbers = pc.cast(pc.if_else(valid, strings, pa.scalar(None, pa.string())), pa.float64())
+    numbers = numbers.to_numpy(zero_copy_only=False).astype('float32')
+    return numbers, strings.is_valid().to_numpy(zero_copy_only=False) & np.isnan(numbers)
+
+
+def _parse_values(values):
+    # (wartości float32, maska niepustych wartości, których nie udało się odczytać jako liczby – None dla liczb)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float32'), None
+
+    import pyarrow as pa
+
+    array = values.to_numpy(dtype=object)
+    try:
+        # same liczby (i braki)
+        numbers = pa.array(array, type=pa.float64(), from_pandas=True).to_numpy(zero_copy_only=False)
+        return pd.Series(numbers.astype('float32'), index=values.index, name=values.name), None
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    # tekst (np. wartości zapisane z przecinkiem dziesiętnym) oddzielony od liczb według typu wartości
+    is_text = np.fromiter(map(type, array), dtype=object, count=len(array)) == str
+    numbers = np.full(len(array), np.nan, dtype='float32')
+    unparsed = np.zeros(len(array), dtype=bool)
+    try:
+        numbers[~is_text] = pa.array(array[~is_text], type=pa.float64(), from_pandas=True).to_numpy(zero_copy_only=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # inne obiekty niż liczby i tekst – jak dotąd przez `pd.to_numeric`
+        other = pd.to_numeric(pd.Series(array[~is_text]), errors='coerce')
+        numbers[~is_text] = other.to_numpy(dtype='float64')
+        unparsed[~is_text] = (other.isna() & pd.Series(array[~is_text]).notna()).to_numpy()
+    numbers[is_text], unparsed[is_text] = _parse_text(array[is_text])
+    return pd.Series(numbers, index=values.index, name=values.name), unparsed
+
+
+def remap_categories(values, mapping):
+    """
+        Zamienia wartości według słownika, operując tylko na unikalnych kategoriach (nie na każdym wierszu).
+        Kategorie, których nie ma w słowniku, pozostają bez zmian; kilka starych kategorii
+        może zostać połączonych w jedną nową.
+        Args:
+            values (pd.Series): Kolumna typu category (lub dowolna – zostanie przekonwertowana).
+            mapping (dict): Słownik {stara wartość: nowa wartość}.
+        Returns:
+            pd.Series: Kolumna typu category z zamienionymi wartościami.
+    """
+    values = values.astype('category')
+    old = values.cat.categories
+    new = pd.Categorical(old.map(lambda value: mapping.get(value, value)))
+
+    # kod nowej kategorii dla każdej starej kategorii; -1 (brak wartości) pozostaje -1
+    lookup = np.append(new.codes, -1)
+    codes = lookup[values.cat.codes.to_numpy()]
+
+    return pd.Series(pd.Categorical.from_codes(codes, new.categories), index=values.index, name=values.name)
+
+
+def map_categories(values, mapping):
+    """
+        Przypisuje każdej wartości odpowiednik ze słownika (jak `Series.map`),
+        licząc mapowanie tylko dla unikalnych kategorii.
+        Args:
+            values (pd.Series): Kolumna typu category (lub dowolna – zostanie przekonwertowana).
+            mapping (dict | pd.Series): Słownik {wartość: odpowiednik}.
+        Returns:
+            pd.Series: Kolumna typu category (NaN dla wartości spoza słownika).
+    """
+    values = values.astype('category')
+    mapped = pd.Categorical(values.cat.categories.map(mapping))
+
+    lookup = np.append(mapped.codes, -1)
+    codes = lookup[values.cat.codes.to_numpy()]
+
+    return pd.Series(pd.Categorical.from_codes(codes, mapped.categories), index=values.index)
+
+
+def memory_report(**frames):
+    """
+        Zestawia zużycie pamięci (w MB) poszczególnych kolumn kilku DataFrame'ów.
+        Przykład: `memory_report(przed=df_object, po=df_compact)`.
+        Args:
+            **frames: DataFrame'y do porównania (nazwa argumentu = nazwa kolumny raportu).
+        Returns:
+            pd.DataFrame: Tabela z kolumnami (MB) oraz wierszem 'RAZEM' i typami kolumn.
+    """
+    sizes = {name: df.memory_usage(deep=True, index=False) / 1024 ** 2 for name, df in frames.items()}
+    report = pd.DataFrame(sizes)
+    report.loc['RAZEM'] = report.sum()
+    for name, df in frames.items():
+        report[f"typ ({name})"] = df.dtypes.astype(str)
+    return report
+
+
+@instrumented
+def clear_data_wide(df, year, report=None):
+    """
+        Oczyszcza surowy arkusz GIOŚ, pozostawiając go w formacie szerokim (czas x stacja).
+        Funkcja:
+        1. Usuwa nieprawidłowe wiersze
+        2. Konwertuje "czas" na datetime (jeden przebieg, jeden format daty dla całego roku)
+        3. Przesuwa pomiary o północy na dzień poprzedni
+        4. Konwertuje wartości na float32
+        5. Gdy podano raport, dodaje do niego statystyki jakości roku (`jakosc.YearQuality`)
+        Args:
+            df (pd.DataFrame): DataFrame z surowymi danymi.
+            year (int): Rok, dla którego dane są przetwarzane.
+            report (QualityReport, optional): Raport jakości danych uzupełniany statystykami roku. Domyślnie None.
+        Returns:
+            tuple: (czas – tablica datetime64, stacje – pd.Index z kodami stacji,
+                    wartości – tablica float32 o wymiarach [czas, stacja]) lub None, gdy brak wiersza 'Kod stacji'.
+    """
+    if len(df.columns) and df.columns[0] == "Kod stacji":
+        # Dane wczytane silnikiem 'stream' – nagłówki są już ustawione
+        stations = df.columns[1:]
+        body = df
+    else:
+        # Znalezienie wiersza z kodami stacji
+        idx_kod = find_header_row(df, year)
+        if idx_kod is None:
+            return None
+
+        # Ustawienie nagłówków kolumn (bez modyfikowania surowego DataFrame)
+        stations = pd.Index(df.iloc[idx_kod, 1:].tolist())
+        body = df.iloc[idx_kod + 1:]
+
+    # Konwersja na datetime i usunięcie wierszy, które nie zawierają daty w pierwszej kolumnie
+    czas = parse_time(body.iloc[:, 0])
+    valid = czas.notna().to_numpy()
+    czas = czas.to_numpy()[valid]
+    values = body.iloc[valid, 1:]
 
     # Przesunięcie pomiarów o północy na dzień poprzedni;
-    mask_midnight = df['czas'].dt.hour == 0
-    df.loc[mask_midnight, 'czas'] = df.loc[mask_midnight, 'czas'] - pd.Timedelta(seconds=1)
+    midnight = (czas - czas.astype('datetime64[D]')) < np.timedelta64(1, 'h')
+    czas = np.where(midnight, czas - np.timedelta64(1, 's'), czas)
+
+    # Sortowanie (tylko gdy dane nie są już uporządkowane)
+    if not (czas[1:] >= czas[:-1]).all():
+        order = np.argsort(czas, kind='stable')
+        czas = czas[order]
+        values = values.iloc[order]
+
+    # Konwersja wartości (kolumna po kolumnie -> tablica [stacja, czas], zwracana jako widok [czas, stacja])
+    flat = values.to_numpy().ravel(order='F')
+    flat, unparsed = _parse_values(pd.Series(flat, dtype=flat.dtype))  # bez zamiany tekstu na typ 'str' pandas
+    values = flat.to_numpy().reshape(len(stations), len(czas)).T
+
+    if report is not None:
+        # liczba wartości nieliczbowych w każdej kolumnie (dla arkuszy 'stream' – policzona przy wczytywaniu)
+        non_numeric = df.attrs.get('wartości nieliczbowe')
+        if non_numeric is None and unparsed is not None:
+            non_numeric = unparsed.reshape(len(stations), len(czas)).sum(axis=1)
+        # wiersze z niepustą, ale niepoprawną datą po pierwszym pomiarze (bez opisowych wierszy nagłówka)
+        rows_without_date = df.attrs.get('wiersze bez daty')
+        if rows_without_date is None:
+            first = np.argmax(valid) if valid.any() else len(valid)
+            rows_without_date = np.count_nonzero(~valid[first:] & body.iloc[first:, 0].notna().to_numpy())
+        report.add(YearQuality.from_wide(year, czas, stations, values, non_numeric, rows_without_date))
+
+    return czas, stations, values
+
+
+@instrumented
+def clear_data(df, year, report=None):
+    """
+        Funkcja:
+        1. Usuwa nieprawidłowe wiersze
+        2. Konwertuje "czas" na datetime (jeden przebieg, jeden format daty dla całego roku)
+        3. Przesuwa pomiary o północy na dzień poprzedni
+        4. Konwertuje wartości na float32 (jak `parse_values`; dla arkusza z openpyxl, czyli obiektów Pythona
+           w każdej komórce, to ok. 3/4 czasu funkcji – reszta jest ok. 7 razy szybsza niż dawne `melt`)
+        5. Gdy podano raport, dodaje do niego statystyki jakości roku (liczba stacji, dni z pomiarami,
+           kompletność stacji – zamiast wypisywania ich na ekran)
+        Args:
+            df (pd.DataFrame): DataFrame z surowymi danymi.
+            year (int): Rok, dla którego dane są przetwarzane.
+            report (QualityReport, optional): Raport jakości danych. Domyślnie None.
+        Returns:
+            pd.DataFrame: Dane w formacie long z kolumnami 'czas', 'stacja' (category), 'wartość' (float32).
+    """
 
-    # Sortowanie
-    df = df.sort_values('czas').reset_index(drop=True)
+    cleaned = clear_data_wide(df, year, report)
+    if cleaned is None:
+        return None
+    czas, stations, values = cleaned
 
     # Przygotowanie df do analizy danych
-    df = df.melt(id_vars='czas', var_name='stacja', value_name='wartość')
-
-    # Sanity Check
-    if 'stacja' in df.columns:
-        stations = df['stacja'].nunique()
-        print(f"Liczba stacji: {stations}")
-    if 'czas' in df.columns:
-        df_year = df[df['czas'].dt.year == year]
-        days = df_year['czas'].dt.date.nunique()
-        print(f"Liczba dni w roku {year}, w których wykonywano pomiary: {days}")
+    # (odpowiednik `melt` – kolejne stacje jedna pod drugą, zbudowany bezpośrednio z tablic;
+    # stacja jako category, wartość jako float32)
+    station_codes = pd.Categorical(stations)
+    df = pd.DataFrame({
+        'czas': np.tile(czas, len(stations)),
+        'stacja': pd.Categorical.from_codes(np.repeat(station_codes.codes, len(czas)), station_codes.categories),
+        'wartość': values.T.ravel(),
+    })
 
     return df
 
 
+def station_code_map(meta):
+    """
+        Tworzy słownik {stary kod stacji: aktualny kod stacji} na podstawie metadanych (patrz `stacje.StationIndex`).
+        Args:
+            meta (pd.DataFrame | StationIndex): DataFrame z metadanymi stacji lub gotowy indeks stacji.
+        Returns:
+            dict: Słownik {stary kod: nowy kod}.
+    """
+    return station_index(meta).code_map()
+
+
+@instrumented
 def update_data(df, meta):
     """
         Aktualizuje kody stacji w DataFrame na podstawie danych metadanych.
@@ -75,17 +353,13 @@ def update_data(df, meta):
         Returns:
             pd.DataFrame: DataFrame `df` z uaktualnionymi kodami stacji.
     """
-    # słownik klucz: stary kod, wartość: nowy kod
-    code_map = {old_code.strip(): row['Kod stacji'] for _, row in meta.iterrows()
-                for old_code in str(row['Stary Kod stacji \n(o ile inny od aktualnego)'] or '').split(',')
-                if old_code.strip()}  # gwarancja braku pustych kluczy w słowniku
-
-    # uaktualnienie nazw stacji w df
-    df['stacja'] = df['stacja'].replace(code_map)
+    # uaktualnienie nazw stacji w df (indeks stacji budowany raz dla metadanych, zamiana tylko unikalnych kodów)
+    df['stacja'] = station_index(meta).canonical(df['stacja'])
 
     return df
 
 
+@instrumented
 def add_place(df, meta):
     """
         Dodaje kolumnę 'miejscowość' do DataFrame na podstawie metadanych stacji i ustala kolejność kolumn.
@@ -99,18 +373,49 @@ def add_place(df, meta):
                           ['czas', 'stacja', 'miejscowość', 'wartość'].
     """
 
-    # słownik klucz: kod stacji, wartość: miejscowość stacji;
-    place_map = dict(zip(meta['Kod stacji'], meta['Miejscowość']))
-
     # utworzenie kolumny 'miejscowość' i przypisanie każdej stacji w df odpowiedniej miejscowości
-    df['miejscowość'] = df['stacja'].map(place_map)
+    # (wyszukiwanie w tablicach indeksu stacji, tylko dla unikalnych kodów)
+    df['miejscowość'] = station_index(meta).lookup(df['stacja'], 'miejscowość')
 
     df = df[['czas', 'stacja', 'miejscowość', 'wartość']]  # ustalenie kolejności kolumn
 
     return df
 
 # Funkcja przygotowująca DateFrame do  analizy (czyszczenie danych, aktualizacja kodów stacji, dodanie miejscowości)
-def prepare_to_analize(all_data, meta):
+def _clean_year(df, year, meta, report=None):
+    # clear_data -> update_data -> add_place dla jednego roku (None, gdy brak wiersza 'Kod stacji')
+    df_cleaned = clear_data(df, year, report)
+    if df_cleaned is None:
+        return None
+    if report is not None:
+        # statystyki jakości z aktualnymi kodami stacji (jak w wyniku `update_data`)
+        quality = report.years[year]
+        quality.rename_stations(station_index(meta).canonical(pd.Series(quality.stations.index)).astype(object))
+    return add_place(update_data(df_cleaned, meta), meta)
+
+
+# dane wejściowe dziedziczone przez procesy potomne (fork), żeby nie kopiować surowych arkuszy przez pickle
+_pool_inputs = {}
+
+
+def _clean_year_worker(year, df=None, meta=None, quality=False):
+    # zadanie wykonywane w procesie potomnym: (wynik, komunikat błędu, statystyki jakości roku);
+    # kompaktowy wynik (category, float32, daty) jest odsyłany przez pickle jako bufory tablic numpy –
+    # pomiar dla roku 100 stacji: pickle DataFrame 17 ms, bufor Arrow IPC 38 ms (konwersja w obie strony)
+    if df is None:
+        df, meta = _pool_inputs['all_data'][year], _pool_inputs['meta']
+    report = QualityReport() if quality else None
+    try:
+        result = _clean_year(df, year, meta, report)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", None
+    if result is None:
+        return None, "Nie znaleziono wiersza 'Kod stacji'", None
+    return result, None, report.years.get(year) if report is not None else None
+
+
+@instrumented
+def prepare_to_analize(all_data, meta, max_workers=None, errors=None, report=None):
     """
         Przygotowuje i oczyszcza dane PM2.5 do analizy dla wielu lat.
         Funkcja:
@@ -119,86 +424,213 @@ def prepare_to_analize(all_data, meta):
         3. Dodaje kolumnę 'miejscowość' (`add_place`)
         4. Porządkuje kolejność kolumn w DataFrame
 
+        Lata są niezależne, więc przy `max_workers` > 1 są przetwarzane równolegle w puli procesów.
+        Procesy potomne dziedziczą surowe dane (fork, bez kopiowania), a odsyłają kompaktowe wyniki.
+        Gdy podano słownik `errors`, rok, którego nie udało się oczyścić, jest pomijany, a przyczyna
+        trafia do `errors`; bez niego funkcja (jak dotąd) wypisuje przyczynę i zwraca None.
+        Gdy podano raport (`jakosc.QualityReport`), trafiają do niego statystyki jakości każdego roku
+        (kompletność stacji, mapy dni bez pomiarów, powtórzone znaczniki czasu, wartości nieliczbowe).
+
         Args:
             all_data (dict): Słownik z kluczami będącymi latami (int), a wartościami DataFrame z danymi surowymi.
             meta (pd.DataFrame): DataFrame z metadanymi stacji zawierający kolumny:
                                 'Kod stacji', 'Stary kod stacji (o ile inny od aktualnego)', 'Miejscowość'.
+            max_workers (int, optional): Liczba procesów. Domyślnie None – lata przetwarzane kolejno.
+            errors (dict, optional): Słownik uzupełniany błędami: {rok: komunikat}. Domyślnie None.
+            report (QualityReport, optional): Raport jakości danych uzupełniany statystykami lat. Domyślnie None.
         Returns:
-            dict: Słownik DataFrame'ów przygotowanych do analizy, jeden DataFrame na każdy rok.
+            dict: Słownik DataFrame'ów przygotowanych do analizy, jeden DataFrame na każdy rok
+                  (w kolejności lat z `all_data`).
     """
     processed_data = {}
-
-    # Czyszczenie i niezbędne modyfikacje
-    for year, df in all_data.items():
-        df_cleaned = clear_data(df, year)
-        if df_cleaned is None:
+    failed = {}
+
+    # indeks stacji budowany raz – procesy potomne dostają gotowy indeks
+    index = station_index(meta)
+
+    if max_workers is not None and max_workers > 1 and len(all_data) > 1:
+        failed = _prepare_parallel(all_data, index, max_workers, processed_data, report)
+    else:
+        # Czyszczenie i niezbędne modyfikacje
+        for year, df in all_data.items():
+            if errors is None:
+                df_final = _clean_year(df, year, index, report)
+            else:
+                try:
+                    df_final = _clean_year(df, year, index, report)
+                except Exception as e:
+                    failed[year] = f"{type(e).__name__}: {e}"
+                    continue
+
+            if df_final is None:
+                failed[year] = "Nie znaleziono wiersza 'Kod stacji'"
+                if errors is None:
+                    return None
+                continue
+
+            # Dodanie DF do słownika
+            processed_data[year] = df_final
+
+    if failed:
+        # przyczyna wypisywana także bez słownika `errors` (w puli procesów komunikaty procesów potomnych giną)
+        for year, message in failed.items():
+            print(f"Błąd przy czyszczeniu roku {year}: {message}")
+        if errors is None:
             return None
+        errors.update(failed)
 
-        # Aktualizacja starych kodów na nowe
-        df_updated = update_data(df_cleaned, meta)
-
-        # Dodanie miejscowości i ustalenie kolejności kolumn
-        df_final = add_place(df_updated, meta)
+    # zachowanie kolejności lat z all_data
+    return {year: processed_data[year] for year in all_data.keys() if year in processed_data}
 
-        # Dodanie DF do słownika
-        processed_data[year] = df_final
-
-    return processed_data
 
+def _prepare_parallel(all_data, index, max_workers, processed_data, report=None):
+    # przetwarzanie lat w puli procesów; zwraca słownik błędów {rok: komunikat}
+    failed = {}
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if fork else None)
+    if fork:
+        _pool_inputs.update(all_data=all_data, meta=index)
 
+    try:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(all_data)), mp_context=context) as executor:
+            futures = {}
+            for year, df in all_data.items():
+                args = (year, None, None, report is not None) if fork else (year, df, index, report is not None)
+                futures[executor.submit(_clean_year_worker, *args)] = year
+
+            for future in as_completed(futures):
+                year = futures[future]
+                try:
+                    result, message, quality = future.result()
+                except Exception as e:  # np. proces potomny zakończony przez system
+                    result, message, quality = None, f"{type(e).__name__}: {e}", None
+                if message is not None:
+                    failed[year] = message
+                else:
+                    processed_data[year] = result
+                    if report is not None:
+                        report.add(quality)
+    finally:
+        _pool_inputs.clear()
+
+    return failed
+
+
+def _station_sets(all_data):
+    # zbiory stacji każdego roku (z kategorii używanych w kolumnie, bez przeglądania wartości tekstowych)
+    sets = []
+    for df in all_data.values():
+        stations = df['stacja'].astype('category')
+        used = np.unique(stations.cat.codes.to_numpy())
+        sets.append(set(stations.cat.categories[used[used >= 0]]))
+    return sets
+
+
+def _year_layout(df):
+    # układ z `clear_data`: każda stacja w jednym bloku wierszy z tymi samymi, rosnącymi znacznikami czasu;
+    # zwraca (stacje kolejnych bloków, czas bloku, wartości jako macierz stacje x czas) albo None
+    stations = df['stacja'].astype('category')
+    codes = stations.cat.codes.to_numpy()
+    if len(codes) == 0:
+        return None
+    starts = np.append(0, np.flatnonzero(codes[1:] != codes[:-1]) + 1)
+    block = len(codes) // len(starts)
+    if block * len(starts) != len(codes) or np.any(np.diff(starts) != block) or len(np.unique(codes[starts])) < len(starts):
+        return None
 
-def combine_years(all_data):
+    czas = df['czas'].to_numpy().reshape(len(starts), block)
+    if np.any(czas[0, 1:] <= czas[0, :-1]) or not (czas == czas[0]).all():
+        return None
+    values = df['wartość'].to_numpy().reshape(len(starts), block)
+    return np.asarray(stations.cat.categories[codes[starts]], dtype=object), czas[0], values
+
+
+def _year_matrix(df, keep):
+    # czas roku, stacje z `keep` obecne w danym roku (posortowane) oraz macierz wartości (stacje x czas)
+    # z numerami jej wierszy dla tych stacji – wartości nie są kopiowane
+    layout = _year_layout(df)
+    if layout is not None:
+        names, czas, values = layout
+        selected = np.flatnonzero(np.isin(names, keep))
+        selected = selected[np.argsort(names[selected], kind='stable')]
+        return czas, names[selected], values, selected
+
+    # dowolny inny układ: jak dotąd pivot (braki jako NaN), ale tylko dla potrzebnych stacji
+    czas = np.unique(df['czas'].to_numpy())
+    rows = df[df['stacja'].isin(keep)]
+    names = np.array(sorted(set(rows['stacja'])), dtype=object)
+    pivoted = rows.pivot(index='czas', columns='stacja', values='wartość').reindex(index=czas, columns=names)
+    return czas, names, pivoted.to_numpy().T, np.arange(len(names))
+
+
+@instrumented
+def combine_years(all_data, min_years=None, report=None):
     """
         Łączy dane PM2.5 z wielu lat w jeden DataFrame w formacie long.
 
         Funkcja:
         1. Zachowuje kolumnę 'miejscowość' z oryginalnych DataFrame'ów.
-        2. Tworzy pivot dla każdego roku, by filtrować tylko stacje obecne we wszystkich latach.
-        3. Łączy dane w jeden DataFrame.
+        2. Wybiera stacje na podstawie zbiorów stacji z każdego roku (domyślnie obecne we wszystkich latach)
+           i kopiuje tylko ich pomiary (bez pivotowania całych lat).
+        3. Łączy dane w jeden DataFrame (kolejne stacje jedna pod drugą, w każdej stacji kolejne lata).
         4. Dodaje kolumnę 'miejscowość' i kolumnę 'rok'.
-        5. Wykonuje sanity check – wypisuje liczbę unikalnych stacji i liczbę dni w każdym roku.
+        5. Gdy podano raport, zapisuje w nim liczbę pozostawionych i odrzuconych stacji oraz liczbę dni
+           z pomiarami w każdym roku (`QualityReport.combined`).
 
         Args:
             all_data (dict): Słownik DataFrame'ów (jeden DataFrame na każdy rok), w formacie long
                              z kolumnami 'czas', 'stacja', 'wartość', 'miejscowość'.
+            min_years (int, optional): Minimalna liczba lat, w których stacja musi występować.
+                                       Domyślnie None – wszystkie lata. Dla stacji, której brakuje
+                                       w danym roku, nie ma wierszy z tego roku.
+            report (QualityReport, optional): Raport jakości danych. Domyślnie None.
         Returns:
             pd.DataFrame: Połączone dane w formacie long z kolumnami:
                           'czas', 'stacja', 'wartość', 'miejscowość', 'rok'.
     """
     # Zachowanie miejscowości z dfów, w postaci słownika
-    full_df = pd.concat(all_data.values())
-    place_map = full_df.drop_duplicates('stacja').set_index('stacja')['miejscowość']
-
-    dfs = []
-    for year, df in all_data.items():
-        # Zmiana na format szeroki (żeby join ='inner' działało)
-        pivoted = df.pivot(index='czas', columns='stacja', values='wartość')
-        dfs.append(pivoted)
-
-    # Filtrowanie stacji: wszystkie te, które występują we wszystkich analizowanych latach
-    combined_wide = pd.concat(dfs, axis=0, join='inner')
-
-    # Powrót do odpowiedniego formatu do analizy danych
-    df_all = combined_wide.reset_index().melt(
-        id_vars='czas',
-        var_name='stacja',
-        value_name='wartość'
-    )
-
-    # Dodanie kolumny miejscowość
-    df_all['miejscowość'] = df_all['stacja'].map(place_map)
+    places = pd.concat([df[['stacja', 'miejscowość']].drop_duplicates('stacja') for df in all_data.values()])
+    place_map = places.drop_duplicates('stacja').set_index('stacja')['miejscowość'].astype(object)
+
+    # Filtrowanie stacji na zbiorach stacji: obecne w co najmniej `min_years` latach (domyślnie we wszystkich)
+    station_sets = _station_sets(all_data)
+    min_years = len(station_sets) if min_years is None else min_years
+    counts = pd.Series([station for stations in station_sets for station in stations], dtype=object).value_counts()
+    keep = np.array(sorted(counts.index[counts >= min_years]), dtype=object)
+
+    # Wycinki lat tylko dla wybranych stacji, zapisywane od razu na swoje miejsce w tabeli wynikowej
+    # (kolejne stacje jedna pod drugą, w każdej stacji kolejne lata)
+    years = [_year_matrix(df, keep) for df in all_data.values()]
+    lengths = np.zeros((len(keep), len(years)), dtype=np.int64)
+    for i, (czas, names, _, _) in enumerate(years):
+        lengths[np.searchsorted(keep, names), i] = len(czas)
+    starts = (np.cumsum(lengths.ravel()) - lengths.ravel()).reshape(lengths.shape)
+
+    czas_out = np.empty(lengths.sum(), dtype=np.result_type(*[czas for czas, _, _, _ in years]) if years else 'datetime64[ns]')
+    values_out = np.empty(lengths.sum(), dtype=np.result_type(*[matrix for _, _, matrix, _ in years]) if years else 'float32')
+    for i, (czas, names, matrix, rows) in enumerate(years):
+        for start, row in zip(starts[np.searchsorted(keep, names), i], rows):
+            czas_out[start:start + len(czas)] = czas
+            values_out[start:start + len(czas)] = matrix[row]
+
+    df_all = pd.DataFrame({
+        'czas': czas_out,
+        'stacja': pd.Categorical.from_codes(np.repeat(np.arange(len(keep)), lengths.sum(axis=1)), categories=keep),
+        'wartość': values_out,
+    }, copy=False)
+
+    # Dodanie kolumny miejscowość (kompaktowo: stacja i miejscowość jako category)
+    df_all['miejscowość'] = map_categories(df_all['stacja'], place_map)
 
     # Dodanie kolumny rok
-    df_all['rok'] = df_all['czas'].dt.year
-
-    # Sanity Check
-    if 'stacja' in df_all.columns:
-        stations = df_all['stacja'].nunique()
-        print(f"Liczba unikalnych kodów stacji: {stations}")
-    if 'czas' in df_all.columns:
-        years = df_all['rok'].unique()
-        for year in years:
-            days = df_all[df_all['rok'] == year]['czas'].dt.date.nunique()
-            print(f"Liczba dni w roku {year}: {days}")
+    df_all['rok'] = df_all['czas'].dt.year.astype('int16')
+
+    # Podsumowanie łączenia lat (na znacznikach czasu poszczególnych lat zamiast na całej tabeli)
+    if report is not None:
+        report.combined = pd.DataFrame({
+            'stacje': [len(names) for _, names, _, _ in years],
+            'odrzucone stacje': [len(stations) - len(names) for stations, (_, names, _, _) in zip(station_sets, years)],
+            'dni z pomiarami': [len(np.unique(czas.astype('datetime64[D]'))) for czas, _, _, _ in years],
+        }, index=pd.Index(list(all_data.keys()), name='rok'))
 
     return df_all
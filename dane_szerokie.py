@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+
+from czyszczenie_danych import clear_data_wide, station_code_map
+from stacje import station_index
+
+
+def _segments(keys):
+    # początki kolejnych grup w posortowanej tablicy kluczy
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+class WideStore:
+    """
+        Dane PM2.5 w formacie szerokim: macierz float32 o wymiarach [czas, stacja]
+        z indeksem czasu (DatetimeIndex) i metadanymi stacji (miejscowość, województwo).
+
+        Alternatywa dla formatu long: łączenie lat, wybór stacji i lat oraz średnie dobowe
+        i miesięczne liczone są bezpośrednio na macierzy, bez `melt`/`pivot`.
+        Format long (`to_long`) budowany jest dopiero na potrzeby wykresów.
+
+        Atrybuty:
+            times (pd.DatetimeIndex): Czas pomiaru (posortowany rosnąco).
+            stations (pd.Index): Kody stacji (kolumny macierzy).
+            values (np.ndarray): Macierz pomiarów float32 [czas, stacja] (NaN – brak pomiaru).
+            stations_meta (pd.DataFrame): Metadane stacji (indeks: kod stacji), np. kolumny
+                                          'miejscowość', 'Województwo'.
+    """
+
+    def __init__(self, times, stations, values, stations_meta=None):
+        self.times = pd.DatetimeIndex(times, name='czas')
+        self.stations = pd.Index(stations, name='stacja')
+        self.values = np.asarray(values, dtype='float32')
+        if stations_meta is None:
+            stations_meta = pd.DataFrame(index=self.stations)
+        self.stations_meta = stations_meta.reindex(self.stations)
+
+    def __repr__(self):
+        years = ', '.join(str(year) for year in self.years)
+        return f"WideStore({len(self.times)} x {len(self.stations)} stacji, lata: {years})"
+
+    @property
+    def years(self):
+        """
+            Lata występujące w danych.
+        """
+        return sorted(set(self.times.year))
+
+    @classmethod
+    def from_raw(cls, df, year, meta=None):
+        """
+            Tworzy magazyn z surowego arkusza GIOŚ (jak `clear_data`, ale bez przejścia do formatu long).
+            Gdy podano metadane, stare kody stacji są aktualizowane, a do stacji przypisywane są
+            miejscowości i województwa.
+            Args:
+                df (pd.DataFrame): DataFrame z surowymi danymi.
+                year (int): Rok, dla którego dane są przetwarzane.
+                meta (pd.DataFrame, optional): Metadane stacji. Domyślnie None.
+            Returns:
+                WideStore: Magazyn danych dla jednego roku (lub None, gdy brak wiersza 'Kod stacji').
+        """
+        cleaned = clear_data_wide(df, year)
+        if cleaned is None:
+            return None
+        store = cls(*cleaned)
+        if meta is not None:
+            store = store.rename_stations(station_code_map(meta)).with_meta(meta)
+        return store
+
+    @classmethod
+    def from_long(cls, df):
+        """
+            Tworzy magazyn z danych w formacie long (np. wyniku `prepare_to_analize` lub `combine_years`).
+            Wiersze bez kodu stacji lub bez czasu są pomijane.
+            Args:
+                df (pd.DataFrame): DataFrame z kolumnami 'czas', 'stacja', 'wartość' (opcjonalnie 'miejscowość').
+            Returns:
+                WideStore: Magazyn danych.
+        """
+        # macierz wypełniana bezpośrednio kodami czasu i stacji (bez `pivot`)
+        time_codes, times = pd.factorize(df['czas'], sort=True)
+        station_codes = pd.Categorical(df['stacja'])
+        station_codes = station_codes.remove_unused_categories()
+        stations = pd.Index(station_codes.categories.astype(object), name='stacja')
+        values = np.full((len(times), len(stations)), np.nan, dtype='float32')
+        # kod -1 (brak stacji lub czasu) wskazywałby ostatnią kolumnę / wiersz macierzy – takie wiersze są pomijane
+        valid = (time_codes >= 0) & (station_codes.codes >= 0)
+        values[time_codes[valid], station_codes.codes[valid]] = df['wartość'].to_numpy(dtype='float32')[valid]
+
+        stations_meta = None
+        if 'miejscowość' in df.columns:
+            places = df.loc[df['stacja'].notna(), ['stacja', 'miejscowość']].drop_duplicates('stacja')
+            stations_meta = places.set_index(places['stacja'].astype(object))[['miejscowość']]
+        return cls(times, stations, values, stations_meta)
+
+    def rename_stations(self, code_map):
+        """
+            Zamienia stare kody stacji na aktualne. Jeśli kilka kolumn dostanie ten sam kod,
+            są łączone (pierwszy dostępny pomiar w danej godzinie).
+            Args:
+                code_map (dict): Słownik {stary kod: nowy kod} (np. `station_code_map(meta)`).
+            Returns:
+                WideStore: Nowy magazyn z uaktualnionymi kodami stacji.
+        """
+        stations = self.stations.map(lambda code: code_map.get(code, code))
+        values = self.values
+        if stations.has_duplicates:
+            frame = pd.DataFrame(values.T, index=stations)
+            merged = frame.groupby(level=0, sort=False).first()
+            stations, values = merged.index, merged.to_numpy(dtype='float32').T
+        return WideStore(self.times, stations, values)
+
+    def with_meta(self, meta):
+        """
+            Dołącza metadane stacji (miejscowość i województwo).
+            Args:
+                meta (pd.DataFrame | StationIndex): Metadane stacji lub gotowy indeks stacji.
+            Returns:
+                WideStore: Nowy magazyn z metadanymi stacji.
+        """
+        index = station_index(meta)
+        stations_meta = index.stations.set_index('Kod stacji')[['miejscowość', 'Województwo']]
+        return WideStore(self.times, self.stations, self.values, stations_meta)
+
+    def select_stations(self, stations):
+        """
+            Wybiera podane stacje (w podanej kolejności; stacje spoza magazynu są pomijane).
+        """
+        stations = pd.Index(stations)
+        positions = self.stations.get_indexer(stations)
+        positions = positions[positions >= 0]
+        return WideStore(self.times, self.stations[positions], self.values[:, positions],
+                         self.stations_meta.iloc[positions])
+
+    def select_years(self, years):
+        """
+            Wybiera wiersze z podanych lat (np. `store.select_years([2015, 2024])`).
+        """
+        mask = np.isin(self.times.year, list(years))
+        return WideStore(self.times[mask], self.stations, self.values[mask], self.stations_meta)
+
+    @staticmethod
+    def concat(stores):
+        """
+            Łączy magazyny z kolejnych lat, zachowując tylko stacje obecne we wszystkich z nich
+            (odpowiednik `combine_years`).
+            Args:
+                stores (list | dict): Magazyny WideStore (lub słownik {rok: WideStore}).
+            Returns:
+                WideStore: Magazyn z danymi ze wszystkich lat.
+        """
+        stores = list(stores.values()) if isinstance(stores, dict) else list(stores)
+        common = stores[0].stations
+        for store in stores[1:]:
+            common = common[common.isin(store.stations)]
+
+        parts = [store.select_stations(common) for store in stores]
+        times = np.concatenate([part.times.to_numpy() for part in parts])
+        values = np.concatenate([part.values for part in parts], axis=0)
+        if not (times[1:] >= times[:-1]).all():
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+
+        stations_meta = pd.concat([part.stations_meta for part in parts])
+        stations_meta = stations_meta[~stations_meta.index.duplicated()]
+        return WideStore(times, common, values, stations_meta)
+
+    def _reduce(self, keys):
+        # średnia z pominięciem braków dla kolejnych grup posortowanych kluczy (np. dni)
+        starts = _segments(keys)
+        valid = ~np.isnan(self.values)
+        sums = np.add.reduceat(np.where(valid, self.values, 0.0), starts, axis=0, dtype='float64')
+        counts = np.add.reduceat(valid, starts, axis=0, dtype='int64')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        return keys[starts], means
+
+    def daily_mean(self):
+        """
+            Średnie dobowe dla każdej stacji (pomiar z północy należy do poprzedniego dnia).
+            Returns:
+                pd.DataFrame: Tabela [dzień, stacja] (indeks: DatetimeIndex 'data').
+        """
+        days, means = self._reduce(self.times.to_numpy().astype('datetime64[D]'))
+        return pd.DataFrame(means, index=pd.DatetimeIndex(days, name='data'), columns=self.stations)
+
+    def monthly_mean(self):
+        """
+            Średnie miesięczne dla każdej stacji.
+            Returns:
+                pd.DataFrame: Tabela [(rok, miesiąc), stacja].
+        """
+        months, means = self._reduce(self.times.to_numpy().astype('datetime64[M]'))
+        months = pd.DatetimeIndex(months)
+        index = pd.MultiIndex.from_arrays([months.year, months.month], names=['rok', 'miesiąc'])
+        return pd.DataFrame(means, index=index, columns=self.stations)
+
+    def daily_exceedances(self, norm=15):
+        """
+            Liczba dni w roku, w których średnia dobowa przekroczyła normę.
+            Args:
+                norm (float, optional): Norma dobowa PM2.5 (µg/m³). Domyślnie 15.
+            Returns:
+                pd.DataFrame: Tabela [rok, stacja] z liczbą dni z przekroczeniem.
+        """
+        # średnie porównywane w float32, tak jak w `DailyAggregates.exceedances` (te same dni graniczne)
+        daily = self.daily_mean().astype('float32')
+        return (daily > np.float64(norm)).groupby(daily.index.year.rename('rok')).sum()
+
+    def to_frame(self):
+        """
+            Zwraca dane jako DataFrame w formacie szerokim (indeks: czas, kolumny: stacje).
+        """
+        return pd.DataFrame(self.values, index=self.times, columns=self.stations)
+
+    def to_long(self):
+        """
+            Buduje format long zgodny z wynikiem `combine_years`
+            (kolumny 'czas', 'stacja', 'wartość', 'miejscowość', 'rok').
+        """
+        station_codes = pd.Categorical(self.stations)
+        codes = np.repeat(station_codes.codes, len(self.times))
+        df = pd.DataFrame({
+            'czas': np.tile(self.times.to_numpy(), len(self.stations)),
+            'stacja': pd.Categorical.from_codes(codes, station_codes.categories),
+            'wartość': self.values.T.ravel(),
+        })
+        if 'miejscowość' in self.stations_meta.columns:
+            places = pd.Categorical(self.stations_meta['miejscowość'])
+            df['miejscowość'] = pd.Categorical.from_codes(np.repeat(places.codes, len(self.times)),
+                                                          places.categories)
+        df['rok'] = df['czas'].dt.year.astype('int16')
+        return df
+
+
+def prepare_wide(all_data, meta):
+    """
+        Przygotowuje dane w formacie szerokim dla wielu lat (odpowiednik `prepare_to_analize`).
+        Args:
+            all_data (dict): Słownik {rok: surowy DataFrame}.
+            meta (pd.DataFrame): Metadane stacji.
+        Returns:
+            dict: Słownik {rok: WideStore} (lub None, gdy któregoś roku nie udało się oczyścić).
+    """
+    stores = {}
+    for year, df in all_data.items():
+        store = WideStore.from_raw(df, year, meta)
+        if store is None:
+            return None
+        stores[year] = store
+    return stores
@@ -0,0 +1,252 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows – bez pomiaru szczytowego RSS
+    resource = None
+
+# aktywny profiler (None – instrumentacja wyłączona, funkcje wywoływane bezpośrednio)
+_active = None
+
+
+def peak_rss_mb():
+    """
+        Zwraca szczytowy RSS procesu od jego startu w MB (None, gdy moduł `resource` jest niedostępny).
+    """
+    # ru_maxrss: KB w Linuksie, bajty w macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _size(obj):
+    # (liczba wierszy, liczba bajtów) DataFrame'u, Series, tablicy, agregatów dobowych lub ich kolekcji;
+    # bajty bez zawartości obiektów Pythona (memory_usage bez deep), żeby pomiar nie przeglądał danych
+    if isinstance(obj, pd.DataFrame):
+        return len(obj), int(obj.memory_usage(index=True).sum())
+    if isinstance(obj, pd.Series):
+        return len(obj), int(obj.memory_usage(index=True))
+    if isinstance(obj, np.ndarray):
+        return len(obj) if obj.ndim else 1, int(obj.nbytes)
+    if isinstance(getattr(obj, 'daily', None), pd.DataFrame):
+        return _size(obj.daily)
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        sizes = [_size(item) for item in obj]
+        sizes = [size for size in sizes if size is not None]
+        if not sizes:
+            return None
+        if isinstance(obj, tuple):
+            # krotka to jeden wynik (np. czas, stacje, macierz z `clear_data_wide`) – wiersze największej części
+            return max(rows for rows, _ in sizes), sum(nbytes for _, nbytes in sizes)
+        return sum(rows for rows, _ in sizes), sum(nbytes for _, nbytes in sizes)
+    return None
+
+
+def _sum_sizes(objects):
+    sizes = [size for size in map(_size, objects) if size is not None]
+    if not sizes:
+        return None, None
+    return sum(rows for rows, _ in sizes), sum(nbytes for _, nbytes in sizes)
+
+
+class Profiler:
+    """
+        Zbiera pomiary wywołań funkcji potoku oznaczonych `instrumented` (włączany przez `profile`).
+
+        Dla każdego wywołania zapisywane są: czas rzeczywisty i czas CPU, szczytowy RSS procesu i jego przyrost,
+        liczba wierszy i rozmiar (bajty) danych wejściowych i wyniku, poziom zagnieżdżenia (np. `clear_data`
+        wywołane przez `prepare_to_analize`) oraz nazwa wyjątku, gdy funkcja zakończyła się błędem.
+        Przy `trace_memory=True` zapisywana jest też pamięć przydzielona w trakcie wywołania (szczyt `tracemalloc`
+        ponad stan z początku wywołania; śledzenie alokacji spowalnia obliczenia).
+        Wywołania w procesach potomnych (np. `prepare_to_analize` z `max_workers`) nie są rejestrowane.
+
+        Atrybuty:
+            records (list): Lista słowników z pomiarami (w kolejności zakończenia wywołań).
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+            Args:
+                trace_memory (bool, optional): Czy mierzyć pamięć przydzieloną w trakcie wywołań. Domyślnie False.
+        """
+        self.records = []
+        self.trace_memory = trace_memory
+        self._start = time.perf_counter()
+        self._local = threading.local()
+
+    def call(self, name, function, args, kwargs):
+        """
+            Wywołuje funkcję i zapisuje pomiar wywołania.
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        rows_in, bytes_in = _sum_sizes(list(args) + list(kwargs.values()))
+        frame = {'peak': 0}
+        if self.trace_memory:
+            traced, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['traced'] = traced
+        stack.append(frame)
+
+        rss_before = peak_rss_mb()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            cpu = time.process_time() - cpu_start
+            rss = peak_rss_mb()
+            stack.pop()
+            rows_out, bytes_out = _sum_sizes([result]) if error is None else (None, None)
+
+            record = {
+                'funkcja': name,
+                'poziom': len(stack),
+                'wątek': threading.get_ident(),
+                'początek [s]': start - self._start,
+                'czas [s]': end - start,
+                'czas CPU [s]': cpu,
+                'szczyt RSS [MB]': rss,
+                'przyrost szczytu RSS [MB]': rss - rss_before if rss is not None else None,
+                'wiersze wejścia': rows_in,
+                'wiersze wyjścia': rows_out,
+                'bajty wejścia': bytes_in,
+                'bajty wyjścia': bytes_out,
+                'błąd': error,
+            }
+            if self.trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                record['przydzielona pamięć [MB]'] = max(peak - frame['traced'], 0) / 1024 ** 2
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            self.records.append(record)
+
+    def to_frame(self):
+        """
+            Zwraca pomiary jako DataFrame (jeden wiersz na wywołanie, w kolejności rozpoczęcia).
+        """
+        if not self.records:
+            return pd.DataFrame(columns=['funkcja', 'poziom', 'początek [s]', 'czas [s]'])
+        return pd.DataFrame(self.records).sort_values('początek [s]', ignore_index=True)
+
+    def summary(self):
+        """
+            Zestawia pomiary dla każdej funkcji.
+            Returns:
+                pd.DataFrame: Tabela (indeks: funkcja) z liczbą wywołań, łącznym czasem i czasem CPU,
+                              największym przyrostem szczytu RSS oraz łączną liczbą wierszy wejścia i wyjścia,
+                              posortowana malejąco po łącznym czasie.
+        """
+        frame = self.to_frame()
+        if frame.empty:
+            return pd.DataFrame(columns=['wywołania', 'czas [s]', 'czas CPU [s]', 'przyrost szczytu RSS [MB]',
+                                         'wiersze wejścia', 'wiersze wyjścia']).rename_axis('funkcja')
+        summary = frame.groupby('funkcja').agg(**{
+            'wywołania': ('czas [s]', 'size'),
+            'czas [s]': ('czas [s]', 'sum'),
+            'czas CPU [s]': ('czas CPU [s]', 'sum'),
+            'przyrost szczytu RSS [MB]': ('przyrost szczytu RSS [MB]', 'max'),
+            'wiersze wejścia': ('wiersze wejścia', 'sum'),
+            'wiersze wyjścia': ('wiersze wyjścia', 'sum'),
+        })
+        return summary.sort_values('czas [s]', ascending=False)
+
+    def save_log(self, path):
+        """
+            Zapisuje pomiary jako logi strukturalne: jeden obiekt JSON na wiersz (JSON Lines).
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def save_chrome_trace(self, path):
+        """
+            Zapisuje pomiary w formacie Chrome Trace (JSON), do obejrzenia jako oś czasu
+            w `chrome://tracing` lub Perfetto (ui.perfetto.dev); zagnieżdżone wywołania są pod wywołującymi.
+        """
+        pid = os.getpid()
+        events = []
+        for record in self.records:
+            module, _, function = record['funkcja'].rpartition('.')
+            events.append({
+                'name': function,
+                'cat': module,
+                'ph': 'X',
+                'ts': record['początek [s]'] * 1e6,
+                'dur': record['czas [s]'] * 1e6,
+                'pid': pid,
+                'tid': record['wątek'],
+                'args': {key: value for key, value in record.items()
+                         if key not in ('funkcja', 'wątek', 'początek [s]', 'czas [s]')},
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+
+@contextlib.contextmanager
+def profile(trace_memory=False):
+    """
+        Włącza instrumentację funkcji potoku na czas bloku `with`:
+
+            with profile() as profiler:
+                final_df = add_month_column(combine_years(prepare_to_analize(raw_all_data, metadane)))
+            profiler.summary()
+            profiler.save_chrome_trace("profil.json")
+
+        Args:
+            trace_memory (bool, optional): Czy mierzyć pamięć przydzieloną w trakcie wywołań (`tracemalloc`).
+                                           Domyślnie False.
+        Returns:
+            Profiler: Profiler z pomiarami (uzupełniany do końca bloku).
+    """
+    global _active
+    previous = _active
+    profiler = Profiler(trace_memory)
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    _active = profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+        if start_tracing:
+            tracemalloc.stop()
+
+
+def instrumented(function):
+    """
+        Dekorator funkcji potoku: gdy instrumentacja jest włączona (`profile`), wywołanie jest mierzone,
+        a w przeciwnym razie funkcja jest wywoływana bezpośrednio (koszt jednego sprawdzenia zmiennej).
+    """
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profiler = _active
+        if profiler is None:
+            return function(*args, **kwargs)
+        return profiler.call(name, function, args, kwargs)
+
+    return wrapper
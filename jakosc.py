@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+
+class YearQuality:
+    """
+        Statystyki jakości danych jednego roku, zbierane podczas czyszczenia arkusza (`clear_data_wide`)
+        na macierzy wartości [czas, stacja] – bez dodatkowych przebiegów po tabeli w formacie long.
+
+        Atrybuty:
+            year (int): Rok.
+            stations (pd.DataFrame): Statystyki stacji (indeks: kod stacji) z kolumnami 'godziny z pomiarem',
+                                     'kompletność' (udział godzin roku z pomiarem), 'dni bez pomiarów'
+                                     i 'wartości nieliczbowe'.
+            missing_days (pd.DataFrame): Mapa dni bez żadnego pomiaru (indeks: dni roku, kolumny: stacje, bool).
+            rows_without_date (int): Liczba wierszy z niepoprawną datą po pierwszym pomiarze (usuniętych).
+            duplicate_timestamps (int): Liczba powtórzonych znaczników czasu.
+            measurement_days (int): Liczba dni roku, w których wykonywano pomiary.
+    """
+
+    def __init__(self, year, stations, missing_days, rows_without_date=0, duplicate_timestamps=0, measurement_days=0):
+        self.year = year
+        self.stations = stations
+        self.missing_days = missing_days
+        self.rows_without_date = rows_without_date
+        self.duplicate_timestamps = duplicate_timestamps
+        self.measurement_days = measurement_days
+
+    @classmethod
+    def from_wide(cls, year, czas, stations, values, non_numeric=None, rows_without_date=0):
+        """
+            Liczy statystyki z oczyszczonego arkusza w formacie szerokim.
+            Args:
+                year (int): Rok.
+                czas (np.ndarray): Posortowane znaczniki czasu (datetime64).
+                stations (pd.Index): Kody stacji (kolumny macierzy).
+                values (np.ndarray): Wartości float32 [czas, stacja].
+                non_numeric (np.ndarray, optional): Liczba wartości nieliczbowych dla każdej stacji.
+                rows_without_date (int, optional): Liczba usuniętych wierszy z niepoprawną datą.
+            Returns:
+                YearQuality: Statystyki roku.
+        """
+        days = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq='D')
+        day = (czas.astype('datetime64[D]') - days[0].to_datetime64().astype('datetime64[D]')).astype(np.int64)
+        in_year = (day >= 0) & (day < len(days))
+        day, valid = day[in_year], ~np.isnan(values[in_year])
+
+        # pomiary w kolejnych dniach (czas jest posortowany, więc dni tworzą ciągłe bloki wierszy)
+        has_measurement = np.zeros((len(days), len(stations)), dtype=bool)
+        if len(day):
+            starts = np.flatnonzero(np.append(True, day[1:] != day[:-1]))
+            has_measurement[day[starts]] = np.add.reduceat(valid.astype(np.int32), starts, axis=0) > 0
+
+        hours = valid.sum(axis=0)
+        missing = ~has_measurement
+        station_stats = pd.DataFrame({
+            'godziny z pomiarem': hours,
+            'kompletność': hours / (len(days) * 24),
+            'dni bez pomiarów': missing.sum(axis=0),
+            'wartości nieliczbowe': non_numeric if non_numeric is not None else 0,
+        }, index=pd.Index(stations, name='stacja'))
+
+        return cls(year, station_stats,
+                   pd.DataFrame(missing, index=pd.Index(days, name='dzień'), columns=station_stats.index),
+                   rows_without_date=int(rows_without_date),
+                   duplicate_timestamps=int(np.count_nonzero(czas[1:] == czas[:-1])),
+                   measurement_days=int(len(np.unique(day))))
+
+    def rename_stations(self, codes):
+        """
+            Zamienia kody stacji (np. na aktualne kody z `update_data`).
+        """
+        codes = pd.Index(codes, name='stacja')
+        self.stations.index = codes
+        self.missing_days.columns = codes
+
+    def summary(self):
+        """
+            Zwraca podsumowanie roku (słownik jak wiersz `QualityReport.summary`).
+        """
+        return {
+            'stacje': len(self.stations),
+            'dni z pomiarami': self.measurement_days,
+            'wiersze bez daty': self.rows_without_date,
+            'zduplikowane znaczniki czasu': self.duplicate_timestamps,
+            'wartości nieliczbowe': int(self.stations['wartości nieliczbowe'].sum()),
+            'średnia kompletność': float(self.stations['kompletność'].mean()) if len(self.stations) else np.nan,
+        }
+
+
+class QualityReport:
+    """
+        Raport jakości danych wielu lat, uzupełniany przez `prepare_to_analize` (statystyki lat)
+        i `combine_years` (stacje pozostawione po łączeniu lat) zamiast wypisywania komunikatów.
+
+        Atrybuty:
+            years (dict): Słownik {rok: YearQuality}.
+            combined (pd.DataFrame): Wynik łączenia lat (indeks: rok) z kolumnami 'stacje' (pozostawione),
+                                     'odrzucone stacje' i 'dni z pomiarami' (None przed `combine_years`).
+    """
+
+    def __init__(self):
+        self.years = {}
+        self.combined = None
+
+    def add(self, quality):
+        """
+            Dodaje statystyki roku.
+        """
+        self.years[quality.year] = quality
+
+    def summary(self):
+        """
+            Zwraca podsumowanie lat.
+            Returns:
+                pd.DataFrame: Tabela (indeks: rok) z kolumnami 'stacje', 'dni z pomiarami', 'wiersze bez daty',
+                              'zduplikowane znaczniki czasu', 'wartości nieliczbowe', 'średnia kompletność'.
+        """
+        return pd.DataFrame.from_dict({year: quality.summary() for year, quality in sorted(self.years.items())},
+                                      orient='index').rename_axis('rok')
+
+    def stations(self):
+        """
+            Zwraca statystyki stacji ze wszystkich lat.
+            Returns:
+                pd.DataFrame: Tabela z kolumnami 'rok', 'stacja' i kolumnami `YearQuality.stations`.
+        """
+        frames = [quality.stations.reset_index().assign(rok=year) for year, quality in sorted(self.years.items())]
+        if not frames:
+            return pd.DataFrame(columns=['rok', 'stacja'])
+        stations = pd.concat(frames, ignore_index=True)
+        return stations[['rok'] + [col for col in stations.columns if col != 'rok']]
+
+    def missing_days(self, year):
+        """
+            Zwraca mapę dni bez pomiarów w danym roku (indeks: dni roku, kolumny: stacje).
+        """
+        return self.years[year].missing_days
+
+    def low_coverage(self, min_completeness=0.75):
+        """
+            Zwraca stacje, których kompletność w danym roku jest mniejsza niż `min_completeness`
+            (np. do alertów o spadku pokrycia danych).
+            Args:
+                min_completeness (float, optional): Minimalny udział godzin z pomiarem. Domyślnie 0.75.
+            Returns:
+                pd.DataFrame: Wiersze `stations()` dla stacji poniżej progu.
+        """
+        stations = self.stations()
+        return stations[stations['kompletność'] < min_completeness].reset_index(drop=True)
@@ -1,28 +1,54 @@
+import numpy as np
 import pandas as pd
 
+from agregaty import daily_aggregates
+from czyszczenie_danych import parse_values
+from dane_szerokie import WideStore
+from instrumentacja import instrumented
+
+
+def drop_unused_categories(df):
+    """
+        Usuwa nieużywane kategorie z kolumn typu category (np. stacje odfiltrowane przed grupowaniem),
+        żeby nie pojawiały się jako puste pozycje na wykresach.
+        Args:
+            df (pd.DataFrame): DataFrame wynikowy.
+        Returns:
+            pd.DataFrame: Ten sam DataFrame z oczyszczonymi kategoriami.
+    """
+    for col in df.columns[df.dtypes == 'category']:
+        df[col] = df[col].cat.remove_unused_categories()
+    return df
+
 #dodanie kolumny z miesiącem i zmienienie kolejności kolumn na bardziej czytelną
+@instrumented
 def add_month_column(df):
     """
         Dodaje kolumnę 'miesiąc' do DataFrame i zmienia kolejność kolumn na bardziej czytelną.
         Funkcja dodatkowo:
-        - konwertuje kolumnę 'wartość' na typ numeryczny (zastępując przecinki kropkami)
+        - konwertuje kolumnę 'wartość' na float32 (zastępując przecinki kropkami), jeśli nie jest jeszcze liczbowa
+          (wartości z `clear_data` są konwertowane już przy wczytywaniu)
+        - zapisuje miesiąc jako int8
         - ustawia kolumny w kolejności: ['czas', 'stacja', 'miejscowość', 'rok', 'miesiąc', 'wartość']
+        Pozostałe kolumny nie są kopiowane – wynik współdzieli je z `df`, a `df` nie jest modyfikowany.
         Args:
             df (pd.DataFrame): DataFrame z kolumnami 'czas', 'stacja', 'miejscowość', 'rok', 'wartość'.
         Returns:
             pd.DataFrame: DataFrame z dodaną kolumną 'miesiąc' i uporządkowanymi kolumnami.
     """
 
-    df = df.copy()
-    df['wartość'] = pd.to_numeric(df['wartość'].astype(str).str.replace(',', '.'), errors='coerce')
-    df['miesiąc'] = df['czas'].dt.month
-    df = df[['czas', 'stacja', 'miejscowość', 'rok', 'miesiąc', 'wartość']]
+    columns = {'miesiąc': df['czas'].dt.month.astype('int8')}
+    if not pd.api.types.is_numeric_dtype(df['wartość']):  # dane z `clear_data` są już typu float32
+        columns['wartość'] = parse_values(df['wartość'])
+    df = df.assign(**columns)[['czas', 'stacja', 'miejscowość', 'rok', 'miesiąc', 'wartość']]
 
     return df
 
+@instrumented
 def count_monthly_avg_station(df):
     """
         Wylicza średnie miesięczne stężenie PM2.5 dla każdej stacji i każdego roku.
+        Średnie liczone są z agregatów dobowych (`agregaty.daily_aggregates`), wspólnych dla wszystkich funkcji modułu.
         Args:
             df (pd.DataFrame): DataFrame z kolumnami 'rok', 'stacja', 'miesiąc', 'wartość', 'miejscowość', 'czas'.
         Returns:
@@ -30,16 +56,17 @@ def count_monthly_avg_station(df):
                           'rok', 'stacja', 'miesiąc', 'średnie_PM25' zawierający średnie miesięczne wartości PM2.5.
     """
 
-    monthly_avg = (df.groupby(['rok', 'stacja', 'miesiąc'])['wartość'].mean().reset_index()
-    .rename(columns={'wartość': 'średnie_PM25'}))
+    monthly_avg = monthly_means(daily_aggregates(df), ['rok', 'stacja', 'miesiąc'])
 
     return monthly_avg
 
 
+@instrumented
 def count_monthly_avg_city(df, cities=None, years=None):
     """
     Wylicza średnie miesięczne stężenie PM2.5 dla wybranych miast i lat.
     Jeśli cities lub years nie są podane, funkcja liczy dla wszystkich dostępnych.
+    Uwzględniane są tylko lata z co najmniej 10 miesiącami danych (jak w `filter_data`).
 
     Args:
         df (pd.DataFrame): DataFrame z kolumnami 'miejscowość', 'rok', 'miesiąc', 'wartość'.
@@ -50,22 +77,24 @@ def count_monthly_avg_city(df, cities=None, years=None):
         pd.DataFrame: DataFrame z kolumnami:
                       'miejscowość', 'rok', 'miesiąc', 'średnie_PM25'.
     """
-    df = filter_data(df)
-    df_filtered = df.copy()
+    # filtrowanie lat i wybór miast na agregatach dobowych (zamiast kopii całej tabeli)
+    aggregates = daily_aggregates(df).filtered().select(cities, years)
 
-    if cities is not None:
-        df_filtered = df_filtered[df_filtered['miejscowość'].isin(cities)]
-    if years is not None:
-        df_filtered = df_filtered[df_filtered['rok'].isin(years)]
+    monthly_avg = monthly_means(aggregates, ['miejscowość', 'rok', 'miesiąc'])
 
-    monthly_avg = (df_filtered.groupby(['miejscowość', 'rok', 'miesiąc'])['wartość'].mean().reset_index()
-                   .rename(columns={'wartość': 'średnie_PM25'}))
+    return drop_unused_categories(monthly_avg)
 
-    return monthly_avg
 
+def monthly_means(aggregates, by):
+    # średnie miesięczne z agregatów dobowych w układzie dotychczasowego groupby(...).mean()
+    monthly_avg = aggregates.rollup(by)
+    monthly_avg['średnie_PM25'] = monthly_avg['średnia'].astype('float32')
+    return monthly_avg[by + ['średnie_PM25']]
 
 
 
+
+@instrumented
 def filter_data(df):
     """
         Filtruje dane, aby zachować tylko lata, dla których mamy dane dla co najmniej 10 miesięcy.
@@ -85,53 +114,246 @@ def filter_data(df):
 
 
 
+@instrumented
+def count_exceedances(df, norms=(15, 25), by=('stacja', 'miejscowość'), window=1, meta=None, min_months=10):
+    """
+        Liczy dni z przekroczeniem norm PM2.5 dla każdej grupy (np. stacji, miasta, województwa) i roku.
+        Wszystkie normy liczone są jednym porównaniem na macierzy średnich [dzień, grupa]
+        zbudowanej z agregatów dobowych (`agregaty.DailyAggregates.exceedances`).
+        Uwzględniane są tylko lata z co najmniej `min_months` miesiącami danych (jak w `filter_data`).
+
+        Args:
+            df (pd.DataFrame | DailyAggregates): DataFrame z kolumnami 'stacja', 'miejscowość', 'rok', 'czas', 'wartość'
+                                                 lub agregaty dobowe.
+            norms (float | list, optional): Norma lub lista norm (µg/m³), np. [15, 25] (WHO, UE). Domyślnie (15, 25).
+            by (tuple, optional): Kolumny grupujące; 'Województwo' wymaga `meta`. Domyślnie ('stacja', 'miejscowość').
+            window (int, optional): Długość okna średniej w dniach (1 – średnia dobowa). Domyślnie 1.
+            meta (pd.DataFrame | StationIndex, optional): Metadane stacji (dla grupowania po województwie).
+            min_months (int, optional): Minimalna liczba miesięcy z danymi w roku. Domyślnie 10.
+        Returns:
+            pd.DataFrame: Tabela z kolumnami `by`, 'rok', 'norma', 'ilość przekroczeń'.
+    """
+    aggregates = daily_aggregates(df).filtered(min_months)
+    if meta is not None:
+        aggregates = aggregates.with_voivodeship(meta)
+
+    return (aggregates.exceedances(list(by), norms=norms, window=window)
+            .rename(columns={'przekroczenia': 'ilość przekroczeń'}))
+
+
+@instrumented
+def top_stations(exceedances, reference_year=2024, k=3, norm=None, by='stacja'):
+    """
+        Wybiera k grup (np. stacji) z największą i k z najmniejszą liczbą przekroczeń w roku odniesienia
+        i zwraca ich przekroczenia ze wszystkich lat.
+        Args:
+            exceedances (pd.DataFrame): Wynik `count_exceedances` (lub tabela z kolumnami 'stacja', 'rok',
+                                        'ilość przekroczeń').
+            reference_year (int, optional): Rok, według którego wybierane są grupy. Domyślnie 2024.
+            k (int, optional): Liczba grup z największą i z najmniejszą liczbą przekroczeń. Domyślnie 3.
+            norm (float, optional): Norma, według której wybierane są grupy (gdy tabela zawiera kilka norm).
+                                    Domyślnie None – pierwsza norma z tabeli.
+            by (str, optional): Kolumna grup (np. 'miejscowość' lub 'Województwo'). Domyślnie 'stacja'.
+        Returns:
+            pd.DataFrame: Przekroczenia wybranych grup dla wszystkich lat.
+        Raises:
+            ValueError: gdy tabela nie zawiera kolumny `by`.
+    """
+    if by not in exceedances.columns:
+        raise ValueError(f"Brak kolumny grup: {by} (dostępne: {', '.join(map(str, exceedances.columns))})")
+    if 'norma' in exceedances.columns:
+        norm = exceedances['norma'].iloc[0] if norm is None else norm
+        ranked = exceedances[exceedances['norma'] == norm]
+    else:
+        ranked = exceedances
+
+    # Tabela dla roku odniesienia i wyznaczenie k grup o największej i k o najmniejszej liczbie wykroczeń
+    reference = ranked[ranked['rok'] == reference_year]
+    max_k = reference.nlargest(k, 'ilość przekroczeń')
+    min_k = reference.nsmallest(k, 'ilość przekroczeń')
+
+    chosen = pd.concat([max_k, min_k])[by].tolist()
+
+    return drop_unused_categories(exceedances[exceedances[by].isin(chosen)].copy())
+
+
 #ZADANIE 4
-def count_daily_avg(df):
+@instrumented
+def count_daily_avg(df, norm=15, reference_year=2024, k=3):
     """
         Oblicza średnie dobowe stężenia PM2.5, wykrywa przekroczenia normy i wybiera stacje z najwyższymi oraz najniższymi wykroczeniami.
         Funkcja:
         1. Filtruje dane, aby pozostawić tylko lata z co najmniej 10 miesiącami danych (`filter_data`).
         2. Wylicza średnie dobowe stężenia PM2.5 dla każdej stacji i roku.
-        3. Tworzy kolumnę binarną `przekroczenie`, wskazującą, czy dobowa średnia przekroczyła normę 15 µg/m³.
+        3. Sprawdza, czy dobowa średnia przekroczyła normę (domyślnie 15 µg/m³).
         4. Sumuje liczbę przekroczeń dla każdej stacji w danych latach
-        5. Dla roku 2024 wybiera 3 stacje z największą i 3 z najmniejszą liczbą przekroczeń.
+        5. Dla roku odniesienia (domyślnie 2024) wybiera k stacji z największą i k z najmniejszą liczbą przekroczeń.
         6. Zwraca tabelę przekroczeń dla wybranych stacji dla danych lat.
 
         Args:
-            df (pd.DataFrame): DataFrame z kolumnami 'stacja', 'miejscowość', 'rok', 'czas', 'wartość'.
+            df (pd.DataFrame | DailyAggregates): DataFrame z kolumnami 'stacja', 'miejscowość', 'rok', 'czas', 'wartość'.
+            norm (float, optional): Norma dobowa PM2.5 (µg/m³). Domyślnie 15.
+            reference_year (int, optional): Rok, według którego wybierane są stacje. Domyślnie 2024.
+            k (int, optional): Liczba stacji z największą i z najmniejszą liczbą przekroczeń. Domyślnie 3.
         Returns:
             pd.DataFrame: DataFrame z liczbą przekroczeń dobowej normy PM2.5 dla wybranych stacji
                           (kolumny: 'stacja', 'rok', 'miejscowość', 'ilość przekroczeń').
         """
-    # Filtrowanie danych
-    df = filter_data(df)
+    # Filtrowanie danych i zliczenie dni z przekroczeniem normy dla każdej stacji w danych latach
+    # (średnie dobowe wyliczane z agregatów dobowych, bez grupowania po `czas.dt.date`)
+    exceedances = count_exceedances(df, norms=norm, by=('stacja', 'rok', 'miejscowość')).drop(columns='norma')
+
+    # Tabela wykroczeń dla wybranych stacji dla danych lat
+    return top_stations(exceedances, reference_year, k)
+
+@instrumented
+def rolling_mean(df, hours=24, min_periods=None):
+    """
+        Średnia krocząca z `hours` ostatnich godzin dla każdej stacji (np. 24 h lub 8 h).
+        Liczona na macierzy godzinowej [czas, stacja] przez sumy skumulowane – w czasie liniowym,
+        niezależnie od długości okna. Okno wyznaczane jest według czasu, więc brakujące godziny
+        (luki w danych) nie przesuwają okna, a jedynie zmniejszają liczbę pomiarów w oknie.
+
+        Args:
+            df (pd.DataFrame | WideStore): DataFrame z kolumnami 'czas', 'stacja', 'wartość' lub magazyn WideStore.
+            hours (int, optional): Długość okna w godzinach. Domyślnie 24.
+            min_periods (int, optional): Minimalna liczba pomiarów w oknie. Domyślnie 75% długości okna
+                                         (np. 18 z 24 godzin).
+        Returns:
+            pd.DataFrame: Średnie kroczące (float32) [czas, stacja]; NaN, gdy w oknie jest za mało pomiarów.
+    """
+    store = df if isinstance(df, WideStore) else WideStore.from_long(df)
+    min_periods = int(np.ceil(0.75 * hours)) if min_periods is None else min_periods
+    hour = _hour_numbers(store.times)
 
-    # Tabela dobowych stężeń dla wszystkich stacji wynikająca z jednostkowych pomiarów.
-    daily_avg = (df.groupby(['stacja', 'rok', 'miejscowość', df['czas']
-        .dt.date])['wartość'].mean().reset_index() .rename(columns={'czas': 'data', 'wartość': 'pm25_dobowe'}) )
+    valid = ~np.isnan(store.values)
+    sums = np.zeros((len(hour) + 1, len(store.stations)))
+    counts = np.zeros((len(hour) + 1, len(store.stations)), dtype='int64')
+    np.cumsum(np.where(valid, store.values, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
 
-    # Tablica binarna stwierdzająca, czy zmierzone stężenia PM2.5 przekraczały dobową normę
-    daily_avg['przekroczenie'] = ((daily_avg['pm25_dobowe'] > 15).astype(int))
+    # pierwszy wiersz okna kończącego się w danym wierszu
+    start = np.searchsorted(hour, hour - hours + 1)
+    window_sums = sums[1:] - sums[start]
+    window_counts = counts[1:] - counts[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(window_counts >= min_periods, window_sums / window_counts, np.nan)
 
-    # Tabela sumująca ilość wykroczeń dla każdej stacji względem lat danych lat
-    exceedances = (daily_avg.groupby(['stacja', 'rok', 'miejscowość'])['przekroczenie'].sum()
-                   .reset_index().rename(columns={'przekroczenie': 'ilość przekroczeń'}))
+    return pd.DataFrame(means.astype('float32'), index=store.times, columns=store.stations)
 
-    # Tabela dla roku 2024
-    transgressions_2024 = exceedances[exceedances['rok'] == 2024]
 
-    # Wyznaczenie 3 stacji o największej liczbie wykroczeń w roku 2024 i 3 o najmniejszej
-    max_3 = transgressions_2024.nlargest(3, 'ilość przekroczeń')
-    min_3 = transgressions_2024.nsmallest(3, 'ilość przekroczeń')
+def _hour_numbers(times):
+    # numer godziny od 1970-01-01; pomiar z północy przesunięty na 23:59:59 dostaje godzinę 24:00
+    return times.ceil('h').to_numpy().astype('datetime64[h]').astype('int64')
 
-    chosen_stations = pd.concat([max_3, min_3])['stacja'].tolist()
 
-    # Tabela wykroczeń dla wybranych stacji dla danych lat
-    data_exceedances = exceedances[exceedances['stacja'].isin(chosen_stations)].copy()
+def run_lengths(mask):
+    """
+        Wyznacza ciągi kolejnych wartości True w każdej kolumnie macierzy (kodowanie długości serii).
+        Działa w czasie liniowym, bez pętli po kolumnach.
+        Args:
+            mask (np.ndarray): Macierz logiczna [czas, grupa].
+        Returns:
+            tuple: (numer kolumny, wiersz początku, długość) dla każdego ciągu – tablice NumPy
+                   uporządkowane według kolumny i początku.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim == 1:
+        mask = mask[:, None]
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1]), dtype='int8')
+    padded[1:-1] = mask
+    change = np.diff(padded, axis=0).T  # [grupa, czas + 1]
+    columns, starts = np.nonzero(change == 1)
+    _, ends = np.nonzero(change == -1)
+    return columns, starts, ends - starts
+
+
+@instrumented
+def exceedance_episodes(df, norm=15, hours=None, by=('stacja',), min_length=1, meta=None, min_periods=None):
+    """
+        Wyszukuje epizody smogowe: ciągi kolejnych dni (lub godzin), w których średnia przekraczała normę.
+        - `hours=None` – kolejne dni ze średnią dobową powyżej normy (z agregatów dobowych, dowolne grupowanie),
+        - `hours=k` – kolejne godziny ze średnią kroczącą z k godzin powyżej normy (dla każdej stacji).
+        Dzień lub godzina bez pomiarów przerywa epizod. Epizody mogą przechodzić przez przełom roku –
+        'rok' to rok początku epizodu.
+
+        Args:
+            df (pd.DataFrame | DailyAggregates | WideStore): Dane pomiarowe (jak `final_df`), agregaty dobowe
+                                                            lub magazyn WideStore (dla `hours`).
+            norm (float, optional): Norma PM2.5 (µg/m³). Domyślnie 15.
+            hours (int, optional): Długość okna średniej kroczącej w godzinach. Domyślnie None (średnie dobowe).
+            by (tuple, optional): Kolumny grupujące dla epizodów dobowych. Domyślnie ('stacja',).
+            min_length (int, optional): Minimalna długość epizodu (w dniach lub godzinach). Domyślnie 1.
+            meta (pd.DataFrame | StationIndex, optional): Metadane stacji (dla grupowania po województwie).
+            min_periods (int, optional): Minimalna liczba pomiarów w oknie średniej kroczącej (patrz `rolling_mean`).
+        Returns:
+            pd.DataFrame: Tabela z kolumnami `by` (lub 'stacja'), 'rok', 'początek', 'koniec', 'długość'.
+    """
+    if hours is None:
+        aggregates = daily_aggregates(df)
+        if meta is not None:
+            aggregates = aggregates.with_voivodeship(meta)
+        # ciągła oś dni dla każdej grupy (epizod może przechodzić przez przełom roku), rok – z początku epizodu
+        keys = [column for column in by if column != 'rok']
+        groups, sums, counts, first = aggregates.daily_matrix(keys, per_year=False)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (sums / np.where(counts > 0, counts, np.nan)).astype('float32')
+        columns, starts, lengths = run_lengths(means > norm)
+
+        episodes = groups.iloc[columns].reset_index(drop=True)
+        episodes['początek'] = (starts + first).astype('datetime64[D]')
+        episodes['koniec'] = (starts + first + lengths - 1).astype('datetime64[D]')
+        episodes.insert(list(by).index('rok') if 'rok' in by else len(keys), 'rok',
+                        episodes['początek'].dt.year.astype('int16'))
+    else:
+        means = rolling_mean(df, hours, min_periods)
+        hour = _hour_numbers(means.index)
+
+        # luki w czasie (brakujące godziny) przerywają epizod: wstawienie wiersza bez przekroczenia
+        gaps = np.flatnonzero(np.diff(hour) > 1) + 1
+        mask = np.insert(means.to_numpy() > norm, gaps, False, axis=0)
+        times = np.insert(means.index.to_numpy(), gaps, np.datetime64('NaT'))
+        columns, starts, lengths = run_lengths(mask)
+
+        episodes = pd.DataFrame({'stacja': means.columns[columns]})
+        episodes['początek'] = times[starts]
+        episodes['koniec'] = times[starts + lengths - 1]
+        episodes.insert(1, 'rok', episodes['początek'].dt.year.astype('int16'))
+
+    episodes['długość'] = lengths
+    return episodes[episodes['długość'] >= min_length].reset_index(drop=True)
+
+
+@instrumented
+def longest_episode(df, norm=15, hours=None, by=('stacja',), meta=None, min_periods=None):
+    """
+        Długość najdłuższego epizodu przekroczeń normy (`exceedance_episodes`) dla każdej grupy i roku.
+        Grupy bez przekroczeń mają długość 0.
+        Returns:
+            pd.DataFrame: Tabela z kolumnami `by` (lub 'stacja'), 'rok', 'najdłuższy epizod'.
+    """
+    if hours is not None and not isinstance(df, WideStore):
+        df = WideStore.from_long(df)  # macierz godzinowa budowana raz
+    episodes = exceedance_episodes(df, norm, hours, by, meta=meta, min_periods=min_periods)
+    if hours is None:
+        aggregates = daily_aggregates(df)
+        aggregates = aggregates.with_voivodeship(meta) if meta is not None else aggregates
+        keys = list(by) if 'rok' in by else list(by) + ['rok']
+        groups = aggregates.daily_matrix(keys)[0]
+    else:
+        keys = ['stacja', 'rok']
+        years = np.array(df.years, dtype='int16')
+        groups = pd.DataFrame({'stacja': np.repeat(df.stations, len(years)),
+                               'rok': np.tile(years, len(df.stations))})
+
+    longest = episodes.groupby(keys, observed=True)['długość'].max().rename('najdłuższy epizod').reset_index()
+    result = groups.merge(longest, on=keys, how='left')
+    result['najdłuższy epizod'] = result['najdłuższy epizod'].fillna(0).astype('int64')
+    return result
 
-    return data_exceedances
 
 #zadanie 5 
+@instrumented
 def voivodeship_above_norm_mean(df_meta, final_df, norm = 15):
     """
     Oblicza roczną liczbę dni z przekroczeniem normy PM2.5 dla każdego województwa.
@@ -140,8 +362,8 @@ def voivodeship_above_norm_mean(df_meta, final_df, norm = 15):
     dla całych województw i zlicza wystąpienia przekroczeń zadanej normy.
 
     Args:
-        df_meta (pd.DataFrame): Ramka danych zawierająca metadane stacji. 
-        final_df (pd.DataFrame): Główna ramka danych z pomiarami. 
+        df_meta (pd.DataFrame | StationIndex): Ramka danych zawierająca metadane stacji (lub gotowy indeks stacji). 
+        final_df (pd.DataFrame | DailyAggregates): Główna ramka danych z pomiarami (lub agregaty dobowe). 
         norm (int, optional): Wartość progowa stężenia PM2.5 (µg/m³). 
             Domyślnie wynosi 15.
 
@@ -152,28 +374,13 @@ def voivodeship_above_norm_mean(df_meta, final_df, norm = 15):
             - 'liczba przekroczeń': Suma dni, w których średnia dobowa dla 
             województwa była wyższa niż norma.
     """
-    # tablica z województwami i kodami stacji 
-    voivodeship = df_meta[["Kod stacji", "Województwo"]] 
-    voivodeship = voivodeship.dropna()
-    voivodeship.drop_duplicates(inplace=True)
-    
-    # przypisanie województwa do kodu stacji 
-    final_df['czas'] = pd.to_datetime(final_df['czas'])
-    final_df = filter_data(final_df)
-    df_with_voivodeship = final_df.merge(voivodeship, left_on='stacja', right_on='Kod stacji', how='left')
-    # usunięcie niepotrzebnej kolumny
-    df_with_voivodeship.drop(columns=['Kod stacji'], inplace=True)
-
-    # grupowanie danych po Województwie oraz po dacie wyciągniętej z kolumny 'czas'
-    daily_voivodeship_avg = df_with_voivodeship.groupby(['Województwo', 'rok', df_with_voivodeship['czas'].dt.date])['wartość'].mean().reset_index()
-    
-    #zmiana nazw kolumn
-    daily_voivodeship_avg.rename(columns={'czas': 'data', 'wartość': 'średnia_dobowa_PM25'}, inplace=True)
-    # badanie czy przekraczona jest norma 
-    daily_voivodeship_avg["przekroczenie"] = daily_voivodeship_avg['średnia_dobowa_PM25']> norm
-    #zliczenie dni z przekroczeniem w roku
-    yearly_exceedances = daily_voivodeship_avg.groupby(['Województwo', 'rok'])['przekroczenie'].sum().reset_index().rename(columns={'przekroczenie': 'liczba przekroczeń'})
+    if isinstance(final_df, pd.DataFrame) and not pd.api.types.is_datetime64_any_dtype(final_df['czas']):
+        final_df['czas'] = pd.to_datetime(final_df['czas'])
 
+    # przypisanie województwa do stacji w agregatach dobowych (wyszukiwanie w indeksie stacji),
+    # średnia dobowa dla województwa, badanie czy przekroczona jest norma i zliczenie dni z przekroczeniem w roku
+    yearly_exceedances = (count_exceedances(final_df, norms=norm, by=('Województwo', 'rok'), meta=df_meta)
+                          .drop(columns='norma').rename(columns={'ilość przekroczeń': 'liczba przekroczeń'}))
 
     return yearly_exceedances
 
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# domyślny katalog pamięci podręcznej (względem katalogu roboczego notatnika)
+default_cache_dir = ".gios_cache"
+
+# domyślny limit rozmiaru pamięci podręcznej: 2 GB
+default_max_bytes = 2 * 1024 ** 3
+
+# blokada chroniąca plik indeksu przy równoległym pobieraniu kilku lat
+_index_lock = threading.Lock()
+
+
+def _index_path(cache_dir):
+    return os.path.join(cache_dir, "index.json")
+
+
+def _load_index(cache_dir):
+    path = _index_path(cache_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_index(cache_dir, index):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = _index_path(cache_dir) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, _index_path(cache_dir))
+
+
+def cache_key(gios_id, filename):
+    """
+        Zwraca klucz wpisu w pamięci podręcznej dla pary (ID archiwum GIOŚ, nazwa pliku).
+    """
+    return f"{gios_id}/{filename}"
+
+
+def archive_path(cache_dir, entry):
+    """
+        Zwraca ścieżkę do archiwum ZIP zapisanego pod skrótem SHA-256 jego zawartości.
+    """
+    return os.path.join(cache_dir, "archives", f"{entry['sha256']}.zip")
+
+
+def sheet_path(cache_dir, entry, engine='openpyxl'):
+    """
+        Zwraca ścieżkę do kolumnowej (Parquet) kopii arkusza wczytanego z archiwum.
+        Nazwa zależy od zawartości archiwum, nazwy pliku i silnika wczytywania, więc zmiana danych
+        po stronie GIOŚ automatycznie unieważnia starą kopię.
+    """
+    name = entry['filename'] if engine == 'openpyxl' else f"{entry['filename']}|{engine}"
+    name_hash = hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir, "sheets", f"{entry['sha256']}-{name_hash}.parquet")
+
+
+def get_entry(cache_dir, gios_id, filename):
+    """
+        Zwraca wpis pamięci podręcznej dla danego archiwum lub None, gdy archiwum nie było pobierane.
+        Args:
+            cache_dir (str): Katalog pamięci podręcznej.
+            gios_id (str): Identyfikator zasobu w URL archiwum GIOŚ.
+            filename (str): Nazwa pliku Excel wewnątrz archiwum ZIP.
+        Returns:
+            dict: Wpis z kluczami 'sha256', 'filename', 'etag', 'last_modified', 'last_used' (lub None).
+    """
+    with _index_lock:
+        entry = _load_index(cache_dir).get(cache_key(gios_id, filename))
+    if entry is None or not os.path.exists(archive_path(cache_dir, entry)):
+        return None
+    return entry
+
+
+def validators(entry):
+    """
+        Tworzy nagłówki żądania warunkowego (If-None-Match / If-Modified-Since) na podstawie wpisu.
+        Args:
+            entry (dict): Wpis pamięci podręcznej (lub None).
+        Returns:
+            dict: Nagłówki HTTP do przekazania w `requests.get`.
+    """
+    headers = {}
+    if entry is None:
+        return headers
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+        Liczy skrót SHA-256 pliku, czytając go porcjami (bez wczytywania całości do pamięci).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def temp_dir(cache_dir):
+    """
+        Zwraca katalog na pliki tymczasowe leżący w pamięci podręcznej
+        (ten sam system plików, więc gotowe archiwum można przenieść bez kopiowania).
+    """
+    path = os.path.join(cache_dir, "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def store_archive(cache_dir, gios_id, filename, source, etag=None, last_modified=None):
+    """
+        Zapisuje pobrane archiwum ZIP pod skrótem SHA-256 zawartości i aktualizuje indeks.
+        Identyczne archiwa (np. ten sam plik pod różnymi ID) są zapisywane tylko raz.
+        Args:
+            cache_dir (str): Katalog pamięci podręcznej.
+            gios_id (str): Identyfikator zasobu w URL archiwum GIOŚ.
+            filename (str): Nazwa pliku Excel wewnątrz archiwum ZIP.
+            source (bytes | str): Zawartość archiwum albo ścieżka do pobranego pliku
+                                  (plik jest przenoszony do pamięci podręcznej).
+            etag (str, optional): Nagłówek ETag z odpowiedzi serwera.
+            last_modified (str, optional): Nagłówek Last-Modified z odpowiedzi serwera.
+        Returns:
+            dict: Nowy wpis pamięci podręcznej.
+    """
+    if isinstance(source, bytes):
+        sha256 = hashlib.sha256(source).hexdigest()
+    else:
+        sha256 = file_sha256(source)
+
+    entry = {
+        'sha256': sha256,
+        'filename': filename,
+        'etag': etag,
+        'last_modified': last_modified,
+        'last_used': time.time(),
+    }
+    path = archive_path(cache_dir, entry)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if isinstance(source, bytes):
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(source)
+            os.replace(tmp_path, path)
+    elif os.path.exists(path):
+        os.remove(source)
+    else:
+        os.replace(source, path)
+
+    with _index_lock:
+        index = _load_index(cache_dir)
+        index[cache_key(gios_id, filename)] = entry
+        _save_index(cache_dir, index)
+
+    return entry
+
+
+def touch(cache_dir, gios_id, filename):
+    """
+        Oznacza wpis jako ostatnio użyty (na potrzeby usuwania najdawniej używanych wpisów).
+    """
+    with _index_lock:
+        index = _load_index(cache_dir)
+        key = cache_key(gios_id, filename)
+        if key in index:
+            index[key]['last_used'] = time.time()
+            _save_index(cache_dir, index)
+
+
+def load_sheet(cache_dir, entry, engine='openpyxl'):
+    """
+        Wczytuje kolumnową kopię arkusza z pamięci podręcznej.
+        Args:
+            cache_dir (str): Katalog pamięci podręcznej.
+            entry (dict): Wpis pamięci podręcznej.
+            engine (str, optional): Silnik, którym arkusz został wczytany. Domyślnie 'openpyxl'.
+        Returns:
+            pd.DataFrame: Arkusz z tymi samymi kolumnami i typami kolumn, jakie zwrócił silnik wczytywania
+                          (lub None, gdy kopii nie ma). Komórki kolumn typu object są tekstem (patrz `store_sheet`).
+    """
+    path = sheet_path(cache_dir, entry, engine)
+    if not os.path.exists(path):
+        return None
+    df = pd.read_parquet(path)
+    if list(df.columns) == [str(i) for i in range(len(df.columns))]:
+        df.columns = range(len(df.columns))  # przywrócenie numerycznych nazw kolumn (header=None)
+    for col in df.columns:
+        # kolumny zapisane jako tekst przez `store_sheet` wracają do typu object (braki jako NaN, jak po wczytaniu)
+        if isinstance(df[col].dtype, pd.StringDtype) and df[col].dtype.na_value is pd.NA:
+            df[col] = df[col].astype(object).where(df[col].notna(), np.nan)
+    return df
+
+
+def store_sheet(cache_dir, entry, df, engine='openpyxl'):
+    """
+        Zapisuje kolumnową (Parquet) kopię arkusza wczytanego z archiwum.
+
+        Kopia przechowuje surowy arkusz, a nie dane po czyszczeniu: surowy arkusz GIOŚ ma w każdej kolumnie
+        zarówno nagłówki (tekst), jak i pomiary, dlatego kolumny typu object są zapisywane jako tekst
+        (daty i liczby w postaci `str`). `load_sheet` przywraca typy kolumn z wczytania, a `clear_data`
+        parsuje daty i wartości tak samo jak po wczytaniu pliku Excel – z tym samym wynikiem.
+        Args:
+            cache_dir (str): Katalog pamięci podręcznej.
+            entry (dict): Wpis pamięci podręcznej.
+            df (pd.DataFrame): Arkusz wczytany przez `pd.read_excel(header=None)` lub inny silnik.
+            engine (str, optional): Silnik, którym arkusz został wczytany. Domyślnie 'openpyxl'.
+    """
+    path = sheet_path(cache_dir, entry, engine)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    columnar = df.copy()
+    columnar.columns = [str(col) for col in columnar.columns]  # Parquet wymaga nazw kolumn typu str
+    for col in columnar.columns:
+        if columnar[col].dtype == object:
+            columnar[col] = columnar[col].astype('string')
+
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    columnar.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def cache_size(cache_dir):
+    """
+        Zwraca łączny rozmiar (w bajtach) plików w pamięci podręcznej.
+    """
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def evict(cache_dir, max_bytes=default_max_bytes):
+    """
+        Usuwa najdawniej używane wpisy, dopóki rozmiar pamięci podręcznej przekracza `max_bytes`.
+        Archiwa współdzielone przez kilka wpisów są usuwane dopiero wraz z ostatnim z nich.
+        Args:
+            cache_dir (str): Katalog pamięci podręcznej.
+            max_bytes (int, optional): Maksymalny rozmiar pamięci podręcznej. Domyślnie 2 GB.
+        Returns:
+            list: Lista kluczy usuniętych wpisów.
+    """
+    removed = []
+    with _index_lock:
+        index = _load_index(cache_dir)
+        size = cache_size(cache_dir)
+
+        # od najdawniej używanego wpisu
+        for key, entry in sorted(index.items(), key=lambda item: item[1]['last_used']):
+            if size <= max_bytes:
+                break
+            del index[key]
+            removed.append(key)
+
+            # archiwum i jego arkusze (wczytane dowolnym silnikiem) usuwamy, gdy nie wskazuje na nie inny wpis
+            if any(other['sha256'] == entry['sha256'] for other in index.values()):
+                continue
+            sheets_dir = os.path.join(cache_dir, "sheets")
+            sheets = [os.path.join(sheets_dir, name) for name in os.listdir(sheets_dir)
+                      if name.startswith(entry['sha256'])] if os.path.isdir(sheets_dir) else []
+            for path in [archive_path(cache_dir, entry)] + sheets:
+                if os.path.exists(path):
+                    size -= os.path.getsize(path)
+                    os.remove(path)
+
+        if removed:
+            _save_index(cache_dir, index)
+
+    return removed
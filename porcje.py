@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from agregaty import DailyAggregates
+from czyszczenie_danych import clear_data_wide
+from instrumentacja import instrumented
+from stacje import station_index
+
+# domyślna liczba stacji w jednej porcji (rok x 50 stacji to ok. 440 tys. wierszy w formacie long)
+default_station_block = 50
+
+
+def _year_frame(source):
+    # surowy arkusz roku: DataFrame albo funkcja, która go wczytuje (np. z pamięci podręcznej)
+    return source() if callable(source) else source
+
+
+def _block_frame(czas, codes, places, values):
+    # format long dla porcji stacji (jak `clear_data` + `update_data` + `add_place`), z rokiem jak w `combine_years`
+    df = pd.DataFrame({
+        'czas': np.tile(czas, len(codes)),
+        'stacja': pd.Categorical(np.repeat(np.asarray(codes, dtype=object), len(czas))),
+        'wartość': values.T.ravel(),
+    })
+    df['miejscowość'] = pd.Categorical(np.repeat(np.asarray(places, dtype=object), len(czas)))
+    df['rok'] = df['czas'].dt.year.astype('int16')
+    return df
+
+
+@instrumented
+def chunked_aggregates(sources, meta, station_block=default_station_block, spill_dir=None, common_stations=True,
+                       report=None):
+    """
+        Liczy agregaty dobowe dla wielu lat porcjami (tryb dla danych większych niż dostępna pamięć).
+
+        W pamięci jest naraz tylko surowy arkusz jednego roku i tabela long jednej porcji stacji:
+        1. arkusz roku jest czyszczony do macierzy float32 (`clear_data_wide`), a kody stacji aktualizowane,
+        2. dla każdej porcji `station_block` stacji liczone są agregaty dobowe (`DailyAggregates.from_frame`)
+           i zapisywane na dysk (Parquet w `spill_dir`),
+        3. na koniec wczytywane są agregaty tylko stacji obecnych we wszystkich latach (jak w `combine_years`),
+           a dni stacji z kilku porcji (stary i aktualny kod w różnych porcjach) są sumowane.
+        Funkcje z `obliczenia` przyjmują wynik zamiast tabeli pomiarów i zwracają te same tabele
+        co dla `combine_years(prepare_to_analize(...))`.
+
+        Args:
+            sources (dict): Słownik {rok: surowy DataFrame lub funkcja bez argumentów, która go wczytuje}.
+            meta (pd.DataFrame | StationIndex): Metadane stacji.
+            station_block (int, optional): Liczba stacji w jednej porcji. Domyślnie 50.
+            spill_dir (str, optional): Katalog na agregaty częściowe. Domyślnie None – katalog tymczasowy
+                                       usuwany po zakończeniu.
+            common_stations (bool, optional): Czy zostawić tylko stacje obecne we wszystkich latach. Domyślnie True.
+            report (QualityReport, optional): Raport jakości danych uzupełniany statystykami lat. Domyślnie None.
+        Returns:
+            DailyAggregates: Agregaty dobowe dla wszystkich lat (lub None, gdy któregoś roku nie udało się oczyścić).
+    """
+    index = station_index(meta)
+    temporary = spill_dir is None
+    spill_dir = tempfile.mkdtemp(prefix="gios_porcje_") if temporary else spill_dir
+    os.makedirs(spill_dir, exist_ok=True)
+
+    try:
+        paths, stations_per_year = [], []
+        for year, source in sources.items():
+            cleaned = clear_data_wide(_year_frame(source), year, report)
+            if cleaned is None:
+                return None
+            czas, stations, values = cleaned
+
+            # aktualizacja kodów stacji i miejscowości dla kolumn macierzy (tylko dla unikalnych kodów)
+            codes = index.canonical(pd.Series(pd.Categorical(stations))).astype(object).to_numpy()
+            if report is not None:
+                report.years[year].rename_stations(codes)
+            places = index.lookup(pd.Series(codes), 'miejscowość').astype(object).to_numpy()
+            stations_per_year.append(set(codes))
+
+            for start in range(0, len(codes), station_block):
+                block = slice(start, start + station_block)
+                partial = DailyAggregates.from_frame(_block_frame(czas, codes[block], places[block], values[:, block]))
+                path = os.path.join(spill_dir, f"{year}-{start // station_block:05d}.parquet")
+                partial.save(path)
+                paths.append(path)
+            del cleaned, values
+
+        common = set.intersection(*stations_per_year) if common_stations and stations_per_year else None
+        return _load_partials(paths, common)
+    finally:
+        if temporary:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def _load_partials(paths, stations=None):
+    # wczytanie agregatów częściowych (z filtrem stacji przekazanym do czytnika Parquet)
+    filters = [('stacja', 'in', sorted(stations))] if stations is not None else None
+    parts = []
+    for path in paths:
+        part = pd.read_parquet(path, filters=filters)
+        parts.append(part.astype({'stacja': object, 'miejscowość': object}))
+
+    daily = pd.concat(parts, ignore_index=True)
+    columns = daily.columns
+    daily['stacja'] = daily['stacja'].astype('category')
+    daily['miejscowość'] = daily['miejscowość'].astype('category')
+
+    # ten sam dzień stacji może być w kilku porcjach (np. stary i aktualny kod stacji w różnych porcjach
+    # po `update_data`) – sumy i liczby pomiarów są dodawane jak w `DailyAggregates.append(mode='add')`
+    daily = (daily.groupby(DailyAggregates.keys, observed=True, dropna=False, sort=True)
+             .agg({'miesiąc': 'first', 'suma': 'sum', 'liczba': 'sum', 'wiersze': 'sum'}).reset_index())
+    daily = daily.astype({'liczba': 'int32', 'wiersze': 'int32'})[columns]
+    return DailyAggregates(daily)
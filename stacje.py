@@ -0,0 +1,203 @@
+import hashlib
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# nazwa kolumny ze starymi kodami stacji w metadanych GIOŚ
+old_code_column = 'Stary Kod stacji \n(o ile inny od aktualnego)'
+
+
+class StationIndex:
+    """
+        Indeks stacji pomiarowych zbudowany raz z metadanych (`load_metadane` / `load_metadane2`).
+
+        Każda stacja ma całkowity identyfikator (pozycję w tabeli `stations`). Tabela aliasów
+        wiąże z identyfikatorem zarówno aktualny kod stacji, jak i jej stare kody, więc
+        aktualizacja kodów oraz przypisanie miejscowości i województwa sprowadzają się
+        do indeksowania tablic (bez słowników budowanych w pętli i bez łączenia DataFrame'ów).
+
+        Atrybuty:
+            stations (pd.DataFrame): Tabela stacji (indeks: id) z kolumnami 'Kod stacji', 'miejscowość',
+                                     'Województwo', 'WGS84 φ N', 'WGS84 λ E'.
+            aliases (pd.Series): Tabela aliasów {kod (aktualny lub stary): id stacji}.
+    """
+
+    def __init__(self, stations, aliases):
+        self.stations = stations.reset_index(drop=True)
+        self.aliases = aliases
+        self._alias_index = pd.Index(aliases.index)
+        self._alias_ids = aliases.to_numpy(dtype='int64')
+
+    def __len__(self):
+        return len(self.stations)
+
+    def __repr__(self):
+        return f"StationIndex({len(self)} stacji, {len(self.aliases)} kodów)"
+
+    @classmethod
+    def from_meta(cls, meta):
+        """
+            Buduje indeks stacji z metadanych GIOŚ.
+            W kolumnie 'Stary Kod stacji \\n(o ile inny od aktualnego)' może wystąpić wiele kodów
+            oddzielonych przecinkami. Gdy stary kod jest jednocześnie aktualnym kodem innej
+            (zamkniętej) stacji, pierwszeństwo ma stary kod – tak jak w `update_data`.
+            Args:
+                meta (pd.DataFrame): Metadane stacji z kolumną 'Kod stacji' oraz opcjonalnie
+                                     'Stary Kod stacji \\n(o ile inny od aktualnego)', 'Miejscowość',
+                                     'Województwo', 'WGS84 φ N', 'WGS84 λ E'.
+            Returns:
+                StationIndex: Indeks stacji.
+        """
+        # atrybuty stacji z ostatniego wiersza danego kodu; stare kody zbierane ze wszystkich wierszy (niżej)
+        rows = meta.reset_index(drop=True)
+        meta = rows.drop_duplicates('Kod stacji', keep='last').reset_index(drop=True)
+
+        stations = pd.DataFrame({'Kod stacji': meta['Kod stacji'].astype(object)})
+        for column, source, default in (('miejscowość', 'Miejscowość', None), ('Województwo', 'Województwo', None),
+                                        ('WGS84 φ N', 'WGS84 φ N', np.nan), ('WGS84 λ E', 'WGS84 λ E', np.nan)):
+            stations[column] = meta[source] if source in meta.columns else default
+        # kolumny opcjonalne: bez nich w metadanych indeks ma kategorie z samymi NaN
+        stations['miejscowość'] = pd.Categorical(stations['miejscowość'])
+        stations['Województwo'] = pd.Categorical(stations['Województwo'])
+
+        # aliasy: najpierw aktualne kody, potem stare (stare nadpisują aktualne, jak w słowniku `update_data`)
+        aliases = pd.Series(np.arange(len(meta)), index=meta['Kod stacji'].astype(object))
+        if old_code_column in rows.columns:
+            # stare kody ze wszystkich wierszy metadanych (także z powtórzeń aktualnego kodu stacji)
+            row_ids = pd.Index(stations['Kod stacji']).get_indexer(rows['Kod stacji'].astype(object))
+            old_codes = rows[old_code_column].dropna().astype(str).str.split(',').explode().str.strip()
+            old_codes = old_codes[old_codes != '']  # gwarancja braku pustych kodów
+            aliases = pd.concat([aliases, pd.Series(row_ids[old_codes.index.to_numpy()], index=old_codes.to_numpy())])
+        aliases = aliases[~aliases.index.duplicated(keep='last')].rename('id')
+
+        return cls(stations, aliases)
+
+    @property
+    def codes(self):
+        """
+            Aktualne kody stacji (pozycja = id stacji).
+        """
+        return pd.Index(self.stations['Kod stacji'])
+
+    def resolve(self, codes, aliases=True):
+        """
+            Zamienia kody stacji na identyfikatory.
+            Args:
+                codes (array-like): Kody stacji.
+                aliases (bool, optional): Czy uwzględniać stare kody stacji. Domyślnie True;
+                                          przy False rozpoznawane są tylko aktualne kody.
+            Returns:
+                np.ndarray: Identyfikatory stacji (-1 dla kodów spoza metadanych).
+        """
+        codes = pd.Index(codes)
+        if not aliases:
+            return self.codes.get_indexer(codes)
+        positions = self._alias_index.get_indexer(codes)
+        return np.where(positions >= 0, self._alias_ids[positions], -1)
+
+    def code_map(self):
+        """
+            Zwraca słownik {stary kod: aktualny kod} (tylko kody różne od aktualnych).
+        """
+        current = self.codes.to_numpy()[self._alias_ids]
+        changed = self._alias_index.to_numpy() != current
+        return dict(zip(self._alias_index[changed], current[changed]))
+
+    def _category_ids(self, values):
+        # identyfikator stacji dla każdego wiersza, liczony tylko dla unikalnych kodów (kategorii)
+        values = values.astype('category')
+        lookup = np.append(self.resolve(values.cat.categories, aliases=False), -1)
+        return values, lookup[values.cat.codes.to_numpy()]
+
+    def canonical(self, values):
+        """
+            Zamienia stare kody stacji na aktualne (kody spoza metadanych pozostają bez zmian).
+            Args:
+                values (pd.Series): Kolumna z kodami stacji (najlepiej typu category).
+            Returns:
+                pd.Series: Kolumna typu category z aktualnymi kodami stacji.
+        """
+        values = values.astype('category')
+        old = values.cat.categories
+        ids = self.resolve(old)
+        new = pd.Categorical(np.where(ids >= 0, self.codes.to_numpy()[ids], old.to_numpy(dtype=object)))
+
+        lookup = np.append(new.codes, -1)
+        codes = lookup[values.cat.codes.to_numpy()]
+        return pd.Series(pd.Categorical.from_codes(codes, new.categories), index=values.index, name=values.name)
+
+    def lookup(self, values, column):
+        """
+            Przypisuje każdemu kodowi stacji wartość z tabeli stacji (np. miejscowość lub województwo).
+            Rozpoznawane są aktualne kody stacji (po `canonical` / `update_data`).
+            Args:
+                values (pd.Series): Kolumna z kodami stacji (najlepiej typu category).
+                column (str): Kolumna tabeli `stations`, np. 'miejscowość' lub 'Województwo'.
+            Returns:
+                pd.Series: Kolumna z wartościami (typu category dla 'miejscowość' i 'Województwo';
+                           NaN dla stacji spoza metadanych).
+        """
+        values, ids = self._category_ids(values)
+        target = self.stations[column]
+        if isinstance(target.dtype, pd.CategoricalDtype):
+            lookup = np.append(target.cat.codes.to_numpy(), -1)
+            result = pd.Categorical.from_codes(lookup[ids], target.cat.categories)
+        else:
+            lookup = np.append(target.to_numpy(dtype='float64'), np.nan)
+            result = lookup[ids]
+        return pd.Series(result, index=values.index, name=column)
+
+    def save(self, path):
+        """
+            Zapisuje indeks do pliku (pickle), żeby kolejne uruchomienia nie musiały czytać pliku Excel.
+        """
+        pd.to_pickle({'stations': self.stations, 'aliases': self.aliases}, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+            Wczytuje indeks zapisany przez `save`.
+        """
+        data = pd.read_pickle(path)
+        return cls(data['stations'], data['aliases'])
+
+
+# kolumny metadanych wykorzystywane przez indeks stacji
+_meta_columns = ('Kod stacji', old_code_column, 'Miejscowość', 'Województwo', 'WGS84 φ N', 'WGS84 λ E')
+
+# indeksy zbudowane dla wczytanych metadanych: {id(meta): (weakref, sygnatura treści, StationIndex)}
+_index_cache = {}
+
+
+def _meta_signature(meta):
+    # skrót treści używanych kolumn – zmienia się także po edycji metadanych w miejscu
+    columns = [column for column in _meta_columns if column in meta.columns]
+    hashes = pd.util.hash_pandas_object(meta[columns], index=False).to_numpy()
+    return len(meta), tuple(columns), hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def station_index(meta):
+    """
+        Zwraca indeks stacji dla metadanych, budując go tylko przy pierwszym wywołaniu
+        dla danego DataFrame `meta` (kolejne wywołania `update_data`, `add_place`
+        i `voivodeship_above_norm_mean` korzystają z tego samego indeksu).
+        Zapamiętany indeks jest sprawdzany skrótem treści używanych kolumn, więc edycja
+        `meta` w miejscu (np. poprawa miejscowości lub starego kodu) buduje indeks od nowa.
+        Args:
+            meta (pd.DataFrame | StationIndex): Metadane stacji lub gotowy indeks.
+        Returns:
+            StationIndex: Indeks stacji.
+    """
+    if isinstance(meta, StationIndex):
+        return meta
+
+    signature = _meta_signature(meta)
+    cached = _index_cache.get(id(meta))
+    if cached is not None and cached[0]() is meta and cached[1] == signature:
+        return cached[2]
+
+    index = StationIndex.from_meta(meta)
+    _index_cache[id(meta)] = (weakref.ref(meta, lambda _, key=id(meta): _index_cache.pop(key, None)),
+                              signature, index)
+    return index
@@ -1,6 +1,27 @@
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
 import pytest
 import pandas as pd
-from czyszczenie_danych import clear_data, combine_years
+import pamiec_podreczna
+import requests
+from agregaty import DailyAggregates, daily_aggregates, update_store
+from benchmark import benchmark_long_format_memory, benchmark_pipeline, compare_benchmarks, synthetic_dataset, synthetic_gios_sheet
+from dane_szerokie import WideStore
+from instrumentacja import profile
+from jakosc import QualityReport
+from porcje import chunked_aggregates
+from stacje import StationIndex, station_index
+from czyszczenie_danych import add_place, clear_data, combine_years, parse_values, prepare_to_analize, station_code_map, update_data
+from obliczenia import add_month_column, count_daily_avg, count_exceedances, count_monthly_avg_city, exceedance_episodes, longest_episode, rolling_mean, run_lengths, top_stations, voivodeship_above_norm_mean
+from wczytywanie import load_all_data, load_metadane2, read_sheet
+from wyniki import ResultsStore, fingerprint
+from zapytania import MeasurementQuery, save_measurements
+from wykresy import city_trends_plot, export_plots, heatmap_plot, heatmap_tensor, minmax_decimate, trend_series, trend_table
 
 def test_clear_data():
     df = pd.DataFrame({
@@ -102,3 +123,853 @@ def test_combine_years_filter():
     # Sprawdzenie, czy odfiltrowano stacje, które nie są obecne we wszystkich latach
     assert set(df_all['stacja'].unique()) == {'A'}, "Nie odfiltrowano odpowiednich stacji"
 
+
+
+def _make_zip(filename, df):
+    # archiwum ZIP z jednym plikiem Excel (tak jak w archiwum GIOŚ)
+    xlsx = io.BytesIO()
+    df.to_excel(xlsx, header=False, index=False)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        z.writestr(filename, xlsx.getvalue())
+    return buf.getvalue()
+
+
+@pytest.fixture
+def gios_server():
+    # lokalny zamiennik serwera GIOŚ: /1 i /2 zwracają archiwa, /2 za pierwszym razem zwraca błąd 503
+    archives = {
+        '1': _make_zip('2020.xlsx', pd.DataFrame({0: ["Kod stacji", "2020-01-01 01:00"], 1: ["ST01", 10]})),
+        '2': _make_zip('2021.xlsx', pd.DataFrame({0: ["Kod stacji", "2021-01-01 01:00"], 1: ["ST01", 20]})),
+    }
+    calls = {'1': 0, '2': 0, 'not_modified': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            gios_id = self.path.rsplit('/', 1)[-1]
+            calls[gios_id] = calls.get(gios_id, 0) + 1
+            if gios_id == '2' and calls['2'] == 1:
+                self.send_error(503)
+                return
+            if gios_id not in archives:
+                self.send_error(404)
+                return
+            etag = f'"v{gios_id}"'
+            if self.headers.get('If-None-Match') == etag:
+                calls['not_modified'] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = archives[gios_id]
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", calls
+    server.shutdown()
+
+
+def test_load_all_data_local_server(gios_server):
+    base_url, calls = gios_server
+
+    errors = {}
+    all_data = load_all_data({2021: '2', 2020: '1', 2019: '404'},
+                             {2021: '2021.xlsx', 2020: '2020.xlsx', 2019: '2019.xlsx'},
+                             max_workers=3, retries=3, backoff=0.01, base_url=base_url, errors=errors)
+
+    # Sprawdzenie, czy zachowano kolejność lat i pominięto rok, którego nie ma na serwerze (z przyczyną w `errors`)
+    assert list(all_data.keys()) == [2021, 2020], "Niepoprawne lata w wyniku"
+    assert list(errors) == [2019] and '404' in errors[2019], "Nie zapisano błędu pobierania"
+
+    # Sprawdzenie, czy ponowiono pobieranie po błędzie serwera
+    assert calls['2'] == 2, "Nie ponowiono pobierania po błędzie 503"
+    assert all_data[2021].iloc[1, 1] == 20, "Niepoprawnie wczytane dane"
+
+    # Bez słownika `errors` błąd pobierania jest zgłaszany (niepełny wynik nie trafia dalej)
+    with pytest.raises(requests.exceptions.HTTPError):
+        load_all_data({2020: '1', 2019: '404'}, {2020: '2020.xlsx', 2019: '2019.xlsx'},
+                      retries=1, base_url=base_url)
+
+
+def test_load_all_data_cache(gios_server, tmp_path):
+    base_url, calls = gios_server
+    ids = {2020: '1'}
+    files = {2020: '2020.xlsx'}
+
+    first = load_all_data(ids, files, base_url=base_url, cache_dir=tmp_path)
+    second = load_all_data(ids, files, base_url=base_url, cache_dir=tmp_path)
+
+    # Sprawdzenie, czy drugie wczytanie skorzystało z żądania warunkowego (304)
+    assert calls['not_modified'] == 1, "Nie wysłano żądania warunkowego"
+
+    # Sprawdzenie, czy przy revalidate=False nie łączymy się z serwerem
+    third = load_all_data(ids, files, base_url=base_url, cache_dir=tmp_path, revalidate=False)
+    assert calls['1'] == 2, "Przy revalidate=False wysłano żądanie do serwera"
+
+    # Sprawdzenie, czy dane z pamięci podręcznej dają ten sam wynik czyszczenia
+    expected = clear_data(first[2020], 2020)
+    for cached in (second[2020], third[2020]):
+        result = clear_data(cached, 2020)
+        assert result['czas'].equals(expected['czas']), "Niepoprawne daty z pamięci podręcznej"
+        assert float(result['wartość'].iloc[0]) == float(expected['wartość'].iloc[0]), "Niepoprawne wartości"
+
+
+def test_cached_sheet_matches_fresh_read(tmp_path):
+    path = tmp_path / "2024_PM25_1g.xlsx"
+    raw = synthetic_gios_sheet(2024, n_stations=3).iloc[:400]
+    raw.loc[100, 2] = 'b.d.'
+    raw.to_excel(path, header=False, index=False)
+    entry = {'filename': path.name, 'sha256': 'arkusz'}
+
+    fresh = read_sheet(path)
+    pamiec_podreczna.store_sheet(tmp_path, entry, fresh)
+    cached = pamiec_podreczna.load_sheet(tmp_path, entry)
+
+    # Kopia z pamięci podręcznej ma typy kolumn z wczytania, a czyszczenie daje ten sam wynik i raport jakości
+    pd.testing.assert_series_equal(cached.dtypes, fresh.dtypes)
+    reports = {'fresh': QualityReport(), 'cached': QualityReport()}
+    pd.testing.assert_frame_equal(clear_data(cached, 2024, reports['cached']),
+                                  clear_data(fresh, 2024, reports['fresh']))
+    pd.testing.assert_frame_equal(reports['cached'].summary(), reports['fresh'].summary())
+
+
+def test_load_all_data_stats(gios_server):
+    base_url, _ = gios_server
+    stats = {}
+
+    load_all_data({2020: '1'}, {2020: '2020.xlsx'}, base_url=base_url, stats=stats)
+
+    # Sprawdzenie, czy zebrano statystyki pobierania i zużycia pamięci
+    assert stats[2020]['bytes'] > 0, "Nie zapisano rozmiaru archiwum"
+    assert stats['total']['bytes'] == stats[2020]['bytes'], "Niepoprawna łączna liczba bajtów"
+    assert stats['total']['peak_rss_mb'] > 0, "Nie zmierzono zużycia pamięci"
+    assert stats['total']['rss_growth_mb'] >= 0 and stats[2020]['peak_rss_mb'] > 0, "Niepoprawny pomiar RSS"
+
+
+def test_read_sheet_engines(tmp_path):
+    path = tmp_path / "2024_PM25_1g.xlsx"
+    raw = synthetic_gios_sheet(2024, n_stations=3).iloc[:50]
+    raw.loc[20, 2] = 'b.d.'
+    raw.to_excel(path, header=False, index=False)
+
+    expected = clear_data(read_sheet(path, 'openpyxl'), 2024)
+    result = clear_data(read_sheet(path, 'stream'), 2024)
+
+    # Sprawdzenie, czy silnik 'stream' od razu zwraca typowane kolumny
+    stream = read_sheet(path, 'stream')
+    assert stream.columns[0] == 'Kod stacji' and (stream.dtypes.iloc[1:] == np.float32).all(), \
+        "Kolumny pomiarów nie są typu float32"
+    assert result['wartość'].dtype == np.float32, "Wartości nie są typu float32"
+    pd.testing.assert_frame_equal(result, expected)
+
+    # Sprawdzenie, czy oba silniki dają te same dane po czyszczeniu
+    assert result['czas'].equals(expected['czas']), "Niepoprawne daty"
+    assert result['stacja'].equals(expected['stacja']), "Niepoprawne kody stacji"
+    values = pd.to_numeric(expected['wartość'].astype(str).str.replace(',', '.'), errors='coerce')
+    assert np.allclose(result['wartość'], values, equal_nan=True), "Niepoprawne wartości"
+
+    # Wartości nieliczbowe policzone przy wczytywaniu trafiają do raportu jakości danych
+    reports = {engine: QualityReport() for engine in ('openpyxl', 'stream')}
+    for engine, report in reports.items():
+        clear_data(read_sheet(path, engine), 2024, report)
+    pd.testing.assert_frame_equal(reports['stream'].summary(), reports['openpyxl'].summary())
+
+
+def test_read_sheet_calamine(tmp_path):
+    pytest.importorskip("python_calamine")
+    path = tmp_path / "2024_PM25_1g.xlsx"
+    synthetic_gios_sheet(2024, n_stations=3).iloc[:50].to_excel(path, header=False, index=False)
+
+    # Silnik 'calamine' daje te same dane po czyszczeniu co domyślny silnik 'openpyxl'
+    pd.testing.assert_frame_equal(clear_data(read_sheet(path, 'calamine'), 2024),
+                                  clear_data(read_sheet(path, 'openpyxl'), 2024))
+
+
+def test_clear_data_fixed_time_format():
+    df = pd.DataFrame({
+        0: ["Kod stacji", "01.02.2023 01:00", "13.02.2023 01:00", "14.02.2023 00:00"],
+        1: ["ST01", 10, 11, 12],
+    })
+
+    result = clear_data(df, year=2023)
+
+    # Sprawdzenie, czy wszystkie daty odczytano jednym formatem (dzień.miesiąc.rok)
+    assert (result["czas"].dt.month == 2).all(), "Daty odczytano różnymi formatami"
+
+    # Sprawdzenie przesunięcia pomiaru o północy
+    assert result["czas"].iloc[-1] == pd.Timestamp("2023-02-13 23:59:59"), "Niepoprawne przesunięcie pomiaru o północy"
+
+
+def test_compact_long_format():
+    df = pd.DataFrame({
+        0: ["Kod stacji", "2023-01-01 01:00", "2023-01-01 02:00"],
+        1: ["001", "10,5", 12],
+        2: ["003", 20, None],
+    })
+    meta = pd.DataFrame({
+        'Kod stacji': ['101', '102'],
+        'Stary Kod stacji \n(o ile inny od aktualnego)': ['001', '003,004'],
+        'Miejscowość': ['X', 'Y'],
+    })
+
+    result = add_place(update_data(clear_data(df, year=2023), meta), meta)
+
+    # Sprawdzenie typów kolumn
+    assert result['stacja'].dtype == 'category', "Kolumna 'stacja' nie jest typu category"
+    assert result['miejscowość'].dtype == 'category', "Kolumna 'miejscowość' nie jest typu category"
+    assert result['wartość'].dtype == np.float32, "Kolumna 'wartość' nie jest typu float32"
+
+    # Sprawdzenie aktualizacji kodów, miejscowości i odczytu przecinka dziesiętnego
+    assert result['stacja'].tolist() == ['101', '101', '102', '102'], "Niepoprawnie zaktualizowane kody stacji"
+    assert result['miejscowość'].tolist() == ['X', 'X', 'Y', 'Y'], "Niepoprawnie przypisane miejscowości"
+    assert result['wartość'].iloc[0] == np.float32(10.5), "Niepoprawnie odczytany przecinek dziesiętny"
+
+    # Raport pamięci porównuje tabelę z dawnego potoku (kolumny object, float64) z tabelą kompaktową
+    report = benchmark_long_format_memory(years=(2023, 2024), n_stations=5)
+    assert report.loc['wartość', 'typ (przed)'] == 'float64' and report.loc['stacja', 'typ (po)'] == 'category'
+    assert report.loc['czas', 'przed'] == report.loc['czas', 'po'], "Tabele przed i po mają różną liczbę wierszy"
+    assert report.loc['RAZEM', 'po'] < report.loc['RAZEM', 'przed'], "Format kompaktowy nie zmniejszył zużycia pamięci"
+
+
+def test_wide_store():
+    stores = {
+        2020: WideStore(pd.to_datetime(['2020-01-01 01:00', '2020-01-01 02:00', '2020-01-02 01:00']),
+                        ['A', 'B'], [[10, 1], [20, np.nan], [30, 3]]),
+        2021: WideStore(pd.to_datetime(['2021-01-01 01:00']), ['C', 'A'], [[5, 40]]),
+    }
+
+    combined = WideStore.concat(stores)
+
+    # Sprawdzenie, czy zostały tylko stacje obecne we wszystkich latach
+    assert combined.stations.tolist() == ['A'], "Nie odfiltrowano odpowiednich stacji"
+    assert combined.values.dtype == np.float32, "Macierz pomiarów nie jest typu float32"
+
+    # Sprawdzenie średnich dobowych i miesięcznych
+    daily = combined.daily_mean()['A']
+    assert daily.tolist() == [15.0, 30.0, 40.0], "Niepoprawne średnie dobowe"
+    assert combined.monthly_mean().loc[(2020, 1), 'A'] == 20.0, "Niepoprawna średnia miesięczna"
+
+    # Sprawdzenie formatu long budowanego na żądanie
+    assert len(combined.select_years([2020]).to_long()) == 3, "Niepoprawny wybór roku"
+
+    # Wiersz bez kodu stacji nie trafia do kolumny innej stacji
+    long = pd.DataFrame({'czas': pd.to_datetime(['2024-01-01 01:00'] * 3), 'stacja': ['A', 'B', None],
+                         'wartość': [1.0, 2.0, 99.0]})
+    assert WideStore.from_long(long).to_frame().iloc[0].tolist() == [1.0, 2.0], "Pomiar bez stacji przypisany stacji"
+
+    # Dzień ze średnią tuż nad normą w float64 (25.00000008), ale równą normie w float32 – jak w agregatach dobowych
+    hours = pd.date_range('2024-01-01 01:00', periods=24, freq='h')
+    values = np.full(24, 25.0, dtype='float32')
+    values[0] = np.nextafter(np.float32(25.0), np.float32(26.0))
+    long = pd.DataFrame({'czas': hours, 'stacja': pd.Categorical(['A'] * 24), 'miejscowość': pd.Categorical(['X'] * 24),
+                         'rok': np.int16(2024), 'wartość': values})
+    wide = WideStore.from_long(long).daily_exceedances(norm=25)
+    aggregates = DailyAggregates.from_frame(long).exceedances(['stacja'], norms=25)
+    assert wide.loc[2024, 'A'] == aggregates['przekroczenia'].iloc[0] == 0, "Różna liczba przekroczeń w magazynach"
+
+
+def test_station_index(tmp_path):
+    meta = pd.DataFrame({
+        'Kod stacji': ['A', 'B', 'C'],
+        'Stary Kod stacji \n(o ile inny od aktualnego)': ['A1, A2', None, 'B'],
+        'Miejscowość': ['Kraków', 'Gdańsk', 'Warszawa'],
+        'Województwo': ['MAŁOPOLSKIE', 'POMORSKIE', 'MAZOWIECKIE'],
+    })
+    index = station_index(meta)
+
+    # Sprawdzenie, czy indeks jest budowany raz dla danych metadanych
+    assert station_index(meta) is index, "Indeks stacji nie został ponownie użyty"
+
+    # Sprawdzenie aliasów: stary kod ma pierwszeństwo przed aktualnym kodem innej stacji
+    assert index.code_map() == {'A1': 'A', 'A2': 'A', 'B': 'C'}, "Niepoprawne mapowanie starych kodów"
+    assert index.resolve(['A2', 'X']).tolist() == [0, -1], "Niepoprawne identyfikatory stacji"
+
+    codes = pd.Series(['A1', 'B', 'X'], dtype='category')
+    assert index.canonical(codes).tolist() == ['A', 'C', 'X'], "Niepoprawna aktualizacja kodów"
+    places = index.lookup(pd.Series(['A', 'C', 'X']), 'miejscowość')
+    assert places.iloc[:2].tolist() == ['Kraków', 'Warszawa'] and pd.isna(places.iloc[2]), \
+        "Niepoprawne przypisanie miejscowości"
+
+    # Sprawdzenie zapisu i odczytu indeksu
+    index.save(tmp_path / "stacje.pkl")
+    loaded = StationIndex.load(tmp_path / "stacje.pkl")
+    assert loaded.code_map() == index.code_map(), "Indeks po odczycie różni się od zapisanego"
+
+    # Edycja metadanych w miejscu buduje indeks od nowa
+    meta.loc[2, 'Miejscowość'] = 'Łódź'
+    meta.loc[1, 'Stary Kod stacji \n(o ile inny od aktualnego)'] = 'B1'
+    edited = station_index(meta)
+    assert edited is not index, "Użyto nieaktualnego indeksu po edycji metadanych"
+    assert edited.lookup(pd.Series(['C']), 'miejscowość').tolist() == ['Łódź'], "Nieaktualna miejscowość"
+    assert edited.code_map()['B1'] == 'B', "Nieaktualne mapowanie starych kodów"
+
+    # Stare kody z każdego wiersza powtórzonego kodu stacji (jak w pętli po wierszach metadanych)
+    repeated = pd.DataFrame({
+        'Kod stacji': ['A', 'B', 'A'],
+        'Stary Kod stacji \n(o ile inny od aktualnego)': ['A1', 'B1', 'A2'],
+        'Miejscowość': ['Kraków', 'Gdańsk', 'Nowy Kraków'],
+    })
+    index = StationIndex.from_meta(repeated)
+    assert index.code_map() == {'A1': 'A', 'B1': 'B', 'A2': 'A'}, "Pominięto stare kody z powtórzonego wiersza"
+    assert index.lookup(pd.Series(['A']), 'miejscowość').tolist() == ['Nowy Kraków'], \
+        "Atrybuty stacji powinny pochodzić z ostatniego wiersza"
+
+    # Bez kolumny 'Miejscowość' miejscowości są brakujące (kategoria z NaN)
+    places = add_place(pd.DataFrame({'czas': [pd.Timestamp('2024-01-01')] * 2, 'stacja': ['A1', 'B'],
+                                     'wartość': [1.0, 2.0]}), repeated.drop(columns='Miejscowość'))
+    assert isinstance(places['miejscowość'].dtype, pd.CategoricalDtype) and places['miejscowość'].isna().all(), \
+        "Oczekiwano brakujących miejscowości"
+
+
+def test_station_code_map_matches_iterrows():
+    meta = load_metadane2(os.path.join(os.path.dirname(os.path.abspath(__file__)), "metadane.xlsx"))
+    old_column = 'Stary Kod stacji \n(o ile inny od aktualnego)'
+
+    # Poprzednia implementacja: słownik budowany pętlą po wierszach metadanych
+    old_map = {old_code.strip(): row['Kod stacji'] for _, row in meta.iterrows()
+               for old_code in str(row[old_column] or '').split(',') if old_code.strip()}
+    new_map = station_code_map(meta)
+
+    # Różnice tylko bez wpływu na dane: klucz 'nan' (str(NaN) z pustego starego kodu) i kod mapowany na siebie
+    assert 'nan' in old_map and 'nan' not in new_map
+    assert {code: new for code, new in old_map.items() if code != 'nan' and code != new} == new_map, \
+        "Mapowanie starych kodów różni się od poprzedniego"
+    assert new_map['OpKrap3MajaMOB'] == 'OpKrap3Maja', "Niepoprawne mapowanie stacji o powtórzonym kodzie"
+
+    # Aktualizacja kodów daje ten sam wynik co `replace` ze starym słownikiem (także dla powtórzonego kodu)
+    codes = pd.Series(sorted(set(meta['Kod stacji']) | set(old_map) - {'nan'}))
+    updated = update_data(pd.DataFrame({'stacja': codes.astype('category')}), meta)['stacja']
+    assert updated.astype(str).tolist() == codes.replace(old_map).tolist(), "Niepoprawna aktualizacja kodów"
+
+
+def test_update_data_code_columns_only():
+    # Metadane tylko z kolumnami kodów (jak w `Uruchamianie.ipynb`) wystarczają do aktualizacji kodów
+    meta = pd.DataFrame({
+        'Kod stacji': ['A', 'B'],
+        'Stary Kod stacji \n(o ile inny od aktualnego)': ['A1, A2', None],
+    })
+    df = pd.DataFrame({'stacja': ['A1', 'A2', 'B', 'X'], 'wartość': [1.0, 2.0, 3.0, 4.0]})
+
+    assert update_data(df, meta)['stacja'].tolist() == ['A', 'A', 'B', 'X'], "Niepoprawna aktualizacja kodów"
+    assert station_code_map(meta) == {'A1': 'A', 'A2': 'A'}, "Niepoprawne mapowanie starych kodów"
+
+
+def test_prepare_to_analize_parallel(capsys):
+    meta = pd.DataFrame({'Kod stacji': ['A', 'B'], 'Miejscowość': ['Kraków', 'Gdańsk']})
+    raw = {
+        2020: synthetic_gios_sheet(2020, seed=1, codes=['A', 'B']),
+        2021: synthetic_gios_sheet(2021, seed=2, codes=['A', 'B']),
+        2022: pd.DataFrame([["brak nagłówka", 1.0]]),
+    }
+
+    serial_errors, parallel_errors = {}, {}
+    serial = prepare_to_analize(raw, meta, errors=serial_errors)
+    parallel = prepare_to_analize(raw, meta, max_workers=2, errors=parallel_errors)
+
+    # Sprawdzenie, czy błędny rok jest pomijany i zgłaszany, a pozostałe lata są przetwarzane
+    assert list(parallel) == [2020, 2021], "Niepoprawne lata w wyniku"
+    assert list(parallel_errors) == [2022] and serial_errors == parallel_errors, "Nie zgłoszono błędnego roku"
+    for year in parallel:
+        pd.testing.assert_frame_equal(serial[year], parallel[year])
+
+    # Bez słownika błędów zachowane jest dotychczasowe zachowanie
+    assert prepare_to_analize(raw, meta) is None, "Oczekiwano None dla błędnego roku"
+
+    # W puli procesów bez słownika błędów wypisywany jest rok i przyczyna błędu
+    capsys.readouterr()
+    assert prepare_to_analize(raw, meta, max_workers=2) is None, "Oczekiwano None dla błędnego roku"
+    assert "Błąd przy czyszczeniu roku 2022" in capsys.readouterr().out, "Nie wypisano błędnego roku"
+
+
+def test_daily_aggregates():
+    df = pd.DataFrame({
+        'czas': pd.to_datetime(['2024-01-01 01:00', '2024-01-01 02:00', '2024-01-02 01:00', '2024-01-01 01:00']),
+        'stacja': pd.Categorical(['A', 'A', 'A', 'B']),
+        'miejscowość': pd.Categorical(['Kraków', 'Kraków', 'Kraków', 'Kraków']),
+        'rok': np.array([2024] * 4, dtype='int16'),
+        'wartość': np.array([10.0, 30.0, np.nan, 50.0], dtype='float32'),
+    })
+    aggregates = daily_aggregates(df)
+
+    # Sprawdzenie, czy agregaty są liczone raz dla danego DataFrame
+    assert daily_aggregates(df) is aggregates, "Agregaty nie zostały ponownie użyte"
+    assert aggregates.daily['wiersze'].sum() == 4, "Agregaty nie obejmują wszystkich wierszy"
+
+    # Średnia dobowa stacji i miasta z sum i liczby pomiarów
+    stations = aggregates.rollup(['stacja', 'dzień'])
+    assert stations['średnia'].iloc[0] == 20.0 and pd.isna(stations['średnia'].iloc[1]), "Niepoprawne średnie dobowe"
+    cities = aggregates.rollup(['miejscowość', 'rok', 'miesiąc'])
+    assert cities['średnia'].tolist() == [30.0], "Niepoprawna średnia miesięczna miasta"
+
+    # Dzień bez pomiarów nie jest liczony jako przekroczenie
+    exceedances = aggregates.exceedances(['stacja'], norms=15)
+    assert exceedances['przekroczenia'].tolist() == [1, 1], "Niepoprawna liczba przekroczeń"
+
+    # Zmiana wartości lub czasu w miejscu unieważnia zapisane agregaty
+    df.loc[3, 'wartość'] = 5.0
+    assert daily_aggregates(df).exceedances(['stacja'], norms=15)['przekroczenia'].tolist() == [1, 0], \
+        "Nie przeliczono agregatów po zmianie wartości"
+    df.loc[1, 'czas'] = pd.Timestamp('2024-01-03 02:00')
+    assert daily_aggregates(df).daily['dzień'].nunique() == 3, "Nie przeliczono agregatów po zmianie czasu"
+
+    # Zmiana kolumn grup (miejscowość, rok) w miejscu także unieważnia zapisane agregaty
+    df['miejscowość'] = df['miejscowość'].cat.add_categories('Gdańsk')
+    df.loc[3, 'miejscowość'] = 'Gdańsk'
+    assert set(daily_aggregates(df).rollup(['miejscowość'])['miejscowość']) == {'Gdańsk', 'Kraków'}, \
+        "Nie przeliczono agregatów po zmianie miejscowości"
+    df.loc[0, 'rok'] = np.int16(2023)
+    assert daily_aggregates(df).rollup(['rok'])['rok'].tolist() == [2023, 2024], \
+        "Nie przeliczono agregatów po zmianie roku"
+
+
+def test_update_store_matches_full_rebuild(tmp_path):
+    meta = pd.DataFrame({'Kod stacji': ['A', 'B'], 'Miejscowość': ['Kraków', 'Gdańsk']})
+    raw = {2020: synthetic_gios_sheet(2020, seed=1, codes=['A', 'B']),
+           2021: synthetic_gios_sheet(2021, seed=2, codes=['A', 'B'])}
+    cleared = prepare_to_analize(raw, meta)
+    full = DailyAggregates.from_frame(combine_years(cleared))
+
+    # Historia zapisana raz, potem dwie aktualizacje roku 2021 (z nakładającym się czerwcem)
+    path = tmp_path / "agregaty.parquet"
+    new = cleared[2021]
+    update_store(path, {2020: cleared[2020]})
+    update_store(path, {2021: new[new['czas'] < '2021-07-01']})
+    incremental = update_store(path, {2021: new[new['czas'] >= '2021-06-01']})
+
+    for by in (['stacja', 'rok', 'miesiąc'], ['miejscowość', 'rok', 'dzień']):
+        pd.testing.assert_frame_equal(full.rollup(by), incremental.rollup(by))
+    pd.testing.assert_frame_equal(full.exceedances(['stacja']), DailyAggregates.load(path).exceedances(['stacja']))
+
+
+def test_results_store(tmp_path):
+    meta = pd.DataFrame({'Kod stacji': ['A', 'B'], 'Miejscowość': ['Kraków', 'Gdańsk'],
+                         'Województwo': ['MAŁOPOLSKIE', 'POMORSKIE']})
+    final_df = combine_years(prepare_to_analize({2024: synthetic_gios_sheet(2024, seed=1, codes=['A', 'B'])}, meta))
+    loads = []
+
+    def load_data():
+        loads.append(1)
+        return final_df
+
+    key = fingerprint({'2024': 'sha-archiwum'}, {'meta': 1})
+    store = ResultsStore(key, load_data, meta, directory=tmp_path)
+    expected = store.monthly_avg_city(cities=['Kraków'])
+    store.voivodeship_above_norm_mean(norm=15)
+
+    # Parametry `count_daily_avg` są częścią klucza
+    for norm in (15, 25, 50):
+        pd.testing.assert_frame_equal(store.daily_avg(norm=norm), count_daily_avg(final_df, norm=norm))
+    assert len(list(tmp_path.glob("count_daily_avg-*.parquet"))) == 3, "Nie uwzględniono parametru norm"
+
+    # Ponowne otwarcie: wyniki z plików, bez wczytywania tabeli pomiarów
+    reopened = ResultsStore(key, load_data, meta, directory=tmp_path)
+    pd.testing.assert_frame_equal(reopened.monthly_avg_city(cities=['Kraków']), expected)
+    reopened.voivodeship_above_norm_mean(norm=15)
+    assert len(loads) == 1, "Tabela pomiarów została wczytana ponownie"
+
+    # Zmiana danych wejściowych unieważnia zapisany wynik
+    changed = ResultsStore(fingerprint({'2024': 'nowe-archiwum'}, {'meta': 1}), load_data, meta, directory=tmp_path)
+    changed.monthly_avg_city(cities=['Kraków'])
+    assert len(loads) == 2, "Wynik dla zmienionych danych nie został przeliczony"
+    assert len(list(tmp_path.glob("count_monthly_avg_city-*.parquet"))) == 1, "Nie usunięto nieaktualnego wyniku"
+
+    # Zmiana metadanych unieważnia wyniki od nich zależne
+    renamed = meta.assign(Województwo=['ŚLĄSKIE', 'POMORSKIE'])
+    regions = ResultsStore(key, load_data, renamed, directory=tmp_path).voivodeship_above_norm_mean(norm=15)
+    assert 'ŚLĄSKIE' in set(regions['Województwo']), "Nie przeliczono wyniku po zmianie metadanych"
+    assert len(list(tmp_path.glob("voivodeship_above_norm_mean-*.parquet"))) == 1, "Nie usunięto nieaktualnego wyniku"
+
+    # Nieznany odcisk (brak archiwów w pamięci podręcznej): wyniki liczone bez zapisywania
+    unknown = ResultsStore(fingerprint(None, {'meta': 1}), load_data, meta, directory=tmp_path / "brak")
+    pd.testing.assert_frame_equal(unknown.monthly_avg_city(cities=['Kraków']), expected)
+    assert not (tmp_path / "brak").exists(), "Zapisano wynik bez odcisku danych"
+
+
+def test_count_exceedances_many_norms():
+    days = pd.date_range('2024-01-01 01:00', '2024-12-31 01:00', freq='D')
+    values = np.where(np.arange(len(days)) % 3 == 0, 30.0, 10.0)  # co trzeci dzień 30 µg/m³
+    df = pd.DataFrame({
+        'czas': np.concatenate([days, days]),
+        'stacja': pd.Categorical(['A'] * len(days) + ['B'] * len(days)),
+        'miejscowość': pd.Categorical(['Kraków'] * (2 * len(days))),
+        'rok': np.int16(2024),
+        'wartość': np.concatenate([values, values / 2]).astype('float32'),
+    })
+
+    result = count_exceedances(df, norms=[12, 25], by=('stacja',))
+    counts = result.set_index(['stacja', 'norma'])['ilość przekroczeń']
+
+    # Sprawdzenie liczby przekroczeń dla kilku norm naraz
+    assert counts[('A', 12.0)] == 122 and counts[('A', 25.0)] == 122, "Niepoprawna liczba przekroczeń stacji A"
+    assert counts[('B', 12.0)] == 122 and counts[('B', 25.0)] == 0, "Niepoprawna liczba przekroczeń stacji B"
+
+    # Średnia 3-dniowa (30, 10, 10) nie przekracza 25 µg/m³
+    window = count_exceedances(df, norms=[16, 25], by=('stacja',), window=3).set_index(['stacja', 'norma'])
+    assert window.loc[('A', 25.0), 'ilość przekroczeń'] == 0, "Niepoprawne przekroczenia w oknie 3-dniowym"
+    assert window.loc[('A', 16.0), 'ilość przekroczeń'] == 364, "Niepoprawna liczba ocenianych okien"
+
+    # Wybór stacji według roku odniesienia
+    chosen = top_stations(result, reference_year=2024, k=1, norm=25)
+    assert sorted(chosen['stacja'].unique()) == ['A', 'B'], "Niepoprawny wybór stacji"
+
+    # Wybór według jawnie podanej kolumny grup
+    cities = count_exceedances(df, norms=25, by=('miejscowość',))
+    assert top_stations(cities, k=1, by='miejscowość')['miejscowość'].tolist() == ['Kraków'], "Niepoprawny wybór miast"
+    with pytest.raises(ValueError):
+        top_stations(cities, by='stacja')
+
+
+def test_exceedances_match_groupby_mean():
+    raw, meta = synthetic_dataset(years=(2022, 2023, 2024), n_stations=12, n_cities=4)
+    df = add_month_column(combine_years(prepare_to_analize(raw, meta)))
+
+    # Poprzednia implementacja: średnie dobowe z groupby (float32) porównywane z normą
+    def reference(by, norm):
+        with_voivodeship = df.assign(Województwo=station_index(meta).lookup(df['stacja'], 'Województwo'))
+        daily = (with_voivodeship.groupby(by + ['rok', with_voivodeship['czas'].dt.date], observed=True)['wartość']
+                 .mean() > norm)
+        return daily.groupby(by + ['rok'], observed=True).sum()
+
+    # Przekroczenia liczone na agregatach dobowych zgadzają się z groupby także dla średnich bliskich normie
+    stations = reference(['stacja'], 15)
+    result = count_daily_avg(df)
+    assert not result.empty
+    for row in result.itertuples():
+        assert row[4] == stations[(row.stacja, row.rok)], f"Inna liczba przekroczeń dla {row.stacja} {row.rok}"
+
+    for norm in (15, 25):
+        expected = reference(['Województwo'], norm)
+        result = voivodeship_above_norm_mean(meta, df, norm=norm).set_index(['Województwo', 'rok'])
+        assert result['liczba przekroczeń'].to_dict() == expected.to_dict(), f"Inne przekroczenia dla normy {norm}"
+
+
+def test_rolling_mean_and_episodes():
+    # Sprawdzenie kodowania długości serii dla każdej kolumny
+    columns, starts, lengths = run_lengths(np.array([[1, 0], [1, 1], [0, 1], [1, 1]], dtype=bool))
+    assert columns.tolist() == [0, 0, 1] and starts.tolist() == [0, 3, 1] and lengths.tolist() == [2, 1, 3], \
+        "Niepoprawne ciągi wartości True"
+
+    # 6 godzin pomiarów, luka (brak 07:00 i 08:00), potem 3 godziny
+    times = pd.to_datetime(['2024-01-01 01:00', '2024-01-01 02:00', '2024-01-01 03:00', '2024-01-01 04:00',
+                            '2024-01-01 05:00', '2024-01-01 06:00', '2024-01-01 09:00', '2024-01-01 10:00',
+                            '2024-01-01 11:00'])
+    store = WideStore(times, ['A'], np.array([[10], [20], [30], [40], [50], [60], [70], [80], [90]], dtype='float32'))
+
+    means = rolling_mean(store, hours=3, min_periods=2)['A']
+    assert np.isnan(means.iloc[0]) and means.iloc[2] == 20.0, "Niepoprawna średnia krocząca"
+    assert np.isnan(means.iloc[6]) and means.iloc[7] == 75.0, "Luka w danych nie została uwzględniona"
+
+    # Luka przerywa epizod przekroczeń średniej kroczącej
+    episodes = exceedance_episodes(store, norm=25, hours=3, min_periods=2)
+    assert episodes['długość'].tolist() == [3, 2], "Niepoprawne epizody godzinowe"
+    assert longest_episode(store, norm=25, hours=3, min_periods=2)['najdłuższy epizod'].tolist() == [3], \
+        "Niepoprawna długość najdłuższego epizodu"
+
+    # Epizod od 30 grudnia do 2 stycznia nie jest dzielony na przełomie roku (rok – z początku epizodu)
+    times = pd.date_range('2023-12-28 01:00', '2024-01-05 00:00', freq='h')
+    values = np.where((times >= '2023-12-30 01:00') & (times <= '2024-01-03 00:00'), 40.0, 5.0)
+    df = pd.DataFrame({'czas': times, 'stacja': pd.Categorical(['A'] * len(times)),
+                       'miejscowość': pd.Categorical(['Kraków'] * len(times)),
+                       'rok': times.year.astype('int16'), 'wartość': values.astype('float32')})
+    episodes = exceedance_episodes(df, norm=25)
+    assert episodes[['rok', 'długość']].values.tolist() == [[2023, 4]], "Epizod podzielony na przełomie roku"
+    assert episodes['koniec'].iloc[0] == pd.Timestamp('2024-01-02'), "Niepoprawny koniec epizodu"
+    daily = longest_episode(df, norm=25).set_index('rok')['najdłuższy epizod']
+    hourly = longest_episode(df, norm=25, hours=1).set_index('rok')['najdłuższy epizod']
+    assert daily.to_dict() == {2023: 4, 2024: 0} and hourly.to_dict() == {2023: 96, 2024: 0}, \
+        "Niezgodne epizody dobowe i godzinowe"
+
+
+def test_chunked_aggregates(tmp_path):
+    meta = pd.DataFrame({'Kod stacji': ['A', 'B', 'C'], 'Miejscowość': ['Kraków', 'Gdańsk', 'Kraków'],
+                         'Stary Kod stacji \n(o ile inny od aktualnego)': ['A0', None, None]})
+    raw = {2023: synthetic_gios_sheet(2023, seed=1, codes=['A0', 'B', 'C']),
+           2024: synthetic_gios_sheet(2024, seed=2, codes=['A', 'C'])}
+
+    full = combine_years(prepare_to_analize(raw, meta))
+    # Arkusz 2024 wczytywany dopiero przy przetwarzaniu (funkcja zamiast DataFrame), porcje po 1 stacji
+    chunked = chunked_aggregates({2023: raw[2023], 2024: lambda: raw[2024]}, meta, station_block=1,
+                                 spill_dir=tmp_path)
+
+    # Tylko stacje obecne we wszystkich latach, te same wyniki co dla pełnej tabeli
+    assert sorted(chunked.daily['stacja'].unique()) == ['A', 'C'], "Niepoprawne przecięcie stacji"
+    assert len(list(tmp_path.glob("*.parquet"))) == 5, "Agregaty częściowe nie zostały zapisane na dysk"
+    pd.testing.assert_frame_equal(count_monthly_avg_city(full), count_monthly_avg_city(chunked))
+    pd.testing.assert_frame_equal(count_exceedances(full, [15, 25]), count_exceedances(chunked, [15, 25]))
+
+    # Stary (A0) i aktualny (A) kod tej samej stacji w różnych porcjach: dni stacji sumowane, bez powtórzeń kluczy
+    raw[2023] = synthetic_gios_sheet(2023, seed=1, codes=['A0', 'B', 'C', 'A'])
+    chunked = chunked_aggregates(raw, meta, station_block=1)
+    expected = DailyAggregates.from_years(prepare_to_analize(raw, meta)).common_stations()
+    assert not chunked.daily.duplicated(DailyAggregates.keys).any(), "Powtórzone dni stacji z różnych porcji"
+    pd.testing.assert_frame_equal(chunked.daily, expected.daily.reset_index(drop=True), check_categorical=False)
+    pd.testing.assert_frame_equal(count_exceedances(expected, [15, 25]), count_exceedances(chunked, [15, 25]),
+                                  check_categorical=False)
+
+
+def test_measurement_query(tmp_path):
+    meta = pd.DataFrame({'Kod stacji': ['A', 'B', 'C'], 'Miejscowość': ['Kraków', 'Gdańsk', 'Kraków']})
+    all_data = {year: synthetic_gios_sheet(year, seed=year, codes=['A', 'B', 'C']) for year in (2023, 2024)}
+    final_df = add_month_column(combine_years(prepare_to_analize(all_data, meta)))
+    save_measurements(final_df, tmp_path)
+
+    query = MeasurementQuery(tmp_path).where(miejscowość='Kraków')
+    expected = count_monthly_avg_city(final_df, cities=['Kraków'])
+    pd.testing.assert_frame_equal(query.aggregate(), expected, check_categorical=False, rtol=1e-5)
+
+    # Filtry miesięcy i czasu, wybór kolumn, kwantyl zamiast średniej
+    winter = query.where(rok=2024, miesiąc=[1, 2]).select('stacja', 'wartość').to_pandas()
+    subset = final_df[(final_df['miejscowość'] == 'Kraków') & (final_df['rok'] == 2024) & final_df['miesiąc'].isin([1, 2])]
+    assert list(winter.columns) == ['stacja', 'wartość']
+    assert sorted(winter['stacja'].unique()) == ['A', 'C'] and len(winter) == len(subset)
+    january = query.between('2024-01-01', '2024-02-01').to_pandas()
+    assert january['czas'].min() >= pd.Timestamp('2024-01-01') and january['czas'].max() < pd.Timestamp('2024-02-01')
+    q90 = query.aggregate(by=['stacja', 'rok'], stat=0.9, name='p90')
+    krakow = final_df[final_df['miejscowość'] == 'Kraków']
+    expected_q90 = krakow.groupby(['stacja', 'rok'], observed=True)['wartość'].quantile(0.9)
+    assert q90['p90'].tolist() == pytest.approx(expected_q90.tolist(), rel=1e-5)
+
+    with pytest.raises(ValueError):
+        query.where(województwo='MAŁOPOLSKIE')
+
+
+def test_measurement_query_duckdb(tmp_path):
+    pytest.importorskip("duckdb")
+    meta = pd.DataFrame({'Kod stacji': ['A', 'B', 'C'], 'Miejscowość': ['Kraków', 'Gdańsk', 'Kraków']})
+    all_data = {year: synthetic_gios_sheet(year, seed=year, codes=['A', 'B', 'C']) for year in (2023, 2024)}
+    save_measurements(add_month_column(combine_years(prepare_to_analize(all_data, meta))), tmp_path)
+
+    # Silnik 'duckdb' zwraca te same wiersze, kolumny i typy co domyślny silnik 'arrow'
+    queries = [lambda engine: MeasurementQuery(tmp_path, engine).where(miejscowość='Kraków').between('2024-01-01', '2024-03-01'),
+               lambda engine: MeasurementQuery(tmp_path, engine).where(rok=2023).select('czas', 'stacja', 'wartość')]
+    for query in queries:
+        arrow = query('arrow').to_pandas().sort_values(['stacja', 'czas'], ignore_index=True)
+        duckdb = query('duckdb').to_pandas().sort_values(['stacja', 'czas'], ignore_index=True)
+        pd.testing.assert_frame_equal(duckdb, arrow)
+
+    for by, stat in ((['miejscowość', 'rok', 'miesiąc'], 'mean'), (['stacja', 'rok'], 'count'),
+                     (['stacja'], 'max'), (['stacja', 'rok'], 0.9)):
+        pd.testing.assert_frame_equal(MeasurementQuery(tmp_path, 'duckdb').aggregate(by, stat),
+                                      MeasurementQuery(tmp_path, 'arrow').aggregate(by, stat), rtol=1e-5)
+
+
+def test_combine_years_min_years():
+    all_data = {
+        year: pd.DataFrame({
+            'czas': np.tile(pd.date_range(f'{year}-01-01', periods=2, freq='h'), len(stations)),
+            'stacja': pd.Categorical(np.repeat(stations, 2)),
+            'wartość': np.arange(2 * len(stations), dtype='float32'),
+            'miejscowość': np.repeat(['X'] * len(stations), 2),
+        })
+        for year, stations in {2020: ['A', 'B', 'C'], 2021: ['A', 'C'], 2022: ['A', 'B']}.items()
+    }
+
+    assert list(combine_years(all_data)['stacja'].unique()) == ['A']
+    df_all = combine_years(all_data, min_years=2)
+    assert list(df_all['stacja'].unique()) == ['A', 'B', 'C'], "Niepoprawny wybór stacji obecnych w co najmniej 2 latach"
+    # Stacja B nie ma wierszy z roku 2021, stacja C z roku 2022
+    assert df_all.groupby('stacja', observed=True)['rok'].unique().map(list).to_dict() == {
+        'A': [2020, 2021, 2022], 'B': [2020, 2022], 'C': [2020, 2021]}
+    assert df_all.loc[df_all['stacja'] == 'C', 'wartość'].tolist() == [4, 5, 2, 3]
+
+
+def test_quality_report():
+    meta = pd.DataFrame({'Kod stacji': ['A', 'B'], 'Miejscowość': ['Kraków', 'Gdańsk'],
+                         'Stary Kod stacji \n(o ile inny od aktualnego)': ['OLD_A', None]})
+    raw = synthetic_gios_sheet(2024, seed=1, codes=['OLD_A', 'B'], missing_fraction=0)
+    times = pd.to_datetime(raw.iloc[6:, 0])
+    raw.loc[times[(times > '2024-03-01') & (times <= '2024-03-02')].index, 1] = None  # brak pomiarów 1 marca
+    raw.loc[100, 2] = 'b.d.'
+    raw.loc[50, 0] = 'błędna data'
+    raw = pd.concat([raw, raw.iloc[[10]]], ignore_index=True)  # powtórzony znacznik czasu
+
+    report = QualityReport()
+    cleaned = prepare_to_analize({2024: raw}, meta, report=report)[2024]
+
+    summary = report.summary().loc[2024]
+    assert summary['stacje'] == 2 and summary['dni z pomiarami'] == 366
+    assert summary['wiersze bez daty'] == 1, "Niepoprawna liczba wierszy bez daty"
+    assert summary['zduplikowane znaczniki czasu'] == 1 and summary['wartości nieliczbowe'] == 1
+
+    # Statystyki stacji z aktualnymi kodami, mapa dni bez pomiarów i stacje o niskiej kompletności
+    stations = report.years[2024].stations
+    assert list(stations.index) == ['A', 'B']
+    assert stations.loc['A', 'dni bez pomiarów'] == 1 and stations.loc['B', 'dni bez pomiarów'] == 0
+    assert report.missing_days(2024).loc['2024-03-01', 'A'] and not report.missing_days(2024).loc['2024-03-02', 'A']
+    assert stations.loc['A', 'godziny z pomiarem'] == cleaned.loc[cleaned['stacja'] == 'A', 'wartość'].notna().sum()
+    assert report.low_coverage(0.999)['stacja'].tolist() == ['A']
+
+    # Podsumowanie łączenia lat
+    all_data = prepare_to_analize({2023: synthetic_gios_sheet(2023, codes=['B']),
+                                   2024: synthetic_gios_sheet(2024, codes=['OLD_A', 'B'])}, meta)
+    combine_years(all_data, report=report)
+    assert report.combined['stacje'].tolist() == [1, 1] and report.combined['odrzucone stacje'].tolist() == [0, 1]
+    assert report.combined['dni z pomiarami'].tolist() == [365, 366]
+
+    # Raport z przetwarzania równoległego jest taki sam
+    parallel = QualityReport()
+    prepare_to_analize({2024: raw, 2023: synthetic_gios_sheet(2023, codes=['B'])}, meta, max_workers=2, report=parallel)
+    pd.testing.assert_frame_equal(parallel.summary().loc[[2024]], report.summary())
+    pd.testing.assert_frame_equal(parallel.years[2024].stations, stations)
+
+
+def test_parse_values():
+    stats = {}
+    values = pd.Series([1.5, '2,5', None, 'b.d.', ' 3,25 ', 7, np.nan, '12.5'], dtype=object)
+    parsed = parse_values(values, stats)
+    assert parsed.dtype == np.float32
+    assert np.array_equal(parsed, np.array([1.5, 2.5, np.nan, np.nan, 3.25, 7, np.nan, 12.5], dtype='float32'), equal_nan=True)
+    assert stats['wartości nieliczbowe'] == 1, "Niepoprawna liczba wartości nieliczbowych"
+
+    # Same liczby i sam tekst (np. arkusz z pamięci podręcznej zapisany jako tekst)
+    assert parse_values(pd.Series([1.0, None, 3], dtype=object), stats).tolist()[::2] == [1.0, 3.0]
+    assert stats['wartości nieliczbowe'] == 0
+    assert parse_values(pd.Series(['0,5', 'x', None], dtype=object), stats).tolist()[0] == 0.5
+    assert stats['wartości nieliczbowe'] == 1
+
+    # add_month_column nie kopiuje kolumn już przekonwertowanych przy wczytywaniu
+    df = pd.DataFrame({'czas': pd.date_range('2024-01-31', periods=2, freq='D'), 'stacja': ['A', 'A'],
+                       'miejscowość': ['X', 'X'], 'rok': [2024, 2024], 'wartość': np.array([1, 2], dtype='float32')})
+    result = add_month_column(df)
+    assert result['miesiąc'].tolist() == [1, 2]
+    assert np.shares_memory(result['wartość'].to_numpy(), df['wartość'].to_numpy()), "Kolumna 'wartość' została skopiowana"
+
+
+def test_export_plots(tmp_path):
+    import matplotlib.pyplot as plt
+
+    df = pd.DataFrame([(city, year, month) for city in ['A', 'B'] for year in [2023, 2024] for month in range(1, 13)],
+                      columns=['miejscowość', 'rok', 'miesiąc'])
+    df['miejscowość'] = df['miejscowość'].astype('category')
+    df['średnie_PM25'] = np.arange(len(df), dtype='float32')
+    df = df[~((df['miejscowość'] == 'B') & (df['rok'] == 2023) & (df['miesiąc'] == 5))]
+
+    # Tryb bez wyświetlania: figura zwracana bez tworzenia figur pyplot
+    figures = plt.get_fignums()
+    fig = city_trends_plot(df, ['B'], [2023, 2024], show=False)
+    line = fig.axes[0].lines[0]
+    assert line.get_xdata().tolist() == [m for m in range(1, 13) if m != 5]
+    assert line.get_ydata().tolist() == df.loc[(df['miejscowość'] == 'B') & (df['rok'] == 2023), 'średnie_PM25'].tolist()
+    assert len(heatmap_plot(df, show=False, path=tmp_path / "heatmapa.svg")) == 1
+    assert (tmp_path / "heatmapa.svg").stat().st_size > 0
+    assert plt.get_fignums() == figures, "Tryb bez wyświetlania utworzył figurę pyplot"
+
+    # Tabela liczona raz dla wielu wykresów, zapis kolejno i w puli procesów
+    table = trend_table(df)
+    jobs = {city: (city_trends_plot, {'cities': [city], 'years': [2023, 2024]}) for city in ['A', 'B']}
+    for workers, directory in ((None, tmp_path / "kolejno"), (2, tmp_path / "pula")):
+        paths = export_plots(table, jobs, directory, max_workers=workers)
+        assert list(paths) == ['A', 'B']
+        assert all(path.endswith('.png') and os.path.getsize(path) > 0 for path in paths.values())
+
+    with pytest.raises(ValueError):
+        export_plots(table, jobs, tmp_path, fmt='gif')
+
+
+def test_heatmap_pages(tmp_path):
+    df = pd.DataFrame([(f"M{i}", year, month) for i in range(5) for year in [2023, 2024] for month in range(1, 13)],
+                      columns=['miejscowość', 'rok', 'miesiąc'])
+    df['średnie_PM25'] = np.arange(len(df), dtype='float32')
+    df = df[~((df['miejscowość'] == 'M3') & (df['rok'] == 2023))]
+
+    cities, years, values = heatmap_tensor(df)
+    assert cities.tolist() == [f"M{i}" for i in range(5)] and years.tolist() == [2023, 2024]
+    assert values.shape == (5, 2, 12)
+    assert np.isnan(values[3, 0]).all() and values[4, 1, 11] == df['średnie_PM25'].iloc[-1]
+
+    # Wszystkie miejscowości, po 2 panele na stronie (bez pomijania miejscowości ponad siatkę)
+    figures = heatmap_plot((cities, years, values), show=False, path=tmp_path / "heatmapy.png", ncols=2, per_page=2)
+    assert len(figures) == 3
+    assert [ax.get_title() for fig in figures for ax in fig.axes if ax.get_visible() and ax.get_title()] == cities.tolist()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["heatmapy-1.png", "heatmapy-2.png", "heatmapy-3.png"]
+
+    # Panel M3 bez roku 2023
+    m3 = figures[1].axes[1]
+    assert [label.get_text() for label in m3.get_yticklabels()] == ['2024']
+
+
+def test_trend_series_decimation():
+    czas = pd.date_range('2023-01-01 01:00', '2025-01-01 00:00', freq='h')
+    values = np.sin(np.arange(len(czas)) / 50.0) * 20 + 30
+    values[1000:1500] = np.nan
+    df = pd.DataFrame({'czas': np.tile(czas, 2), 'stacja': pd.Categorical(np.repeat(['S1', 'S2'], len(czas))),
+                       'miejscowość': pd.Categorical(np.repeat(['A', 'B'], len(czas))),
+                       'wartość': np.concatenate([values, values + 1]).astype('float32')})
+    df['rok'] = df['czas'].dt.year.astype('int16')
+
+    # Przerzedzanie zachowuje minimum, maksimum i przerwę w pomiarach
+    keep = minmax_decimate(values, 500)
+    assert len(keep) <= 500 and np.all(np.diff(keep) > 0)
+    assert np.nanmin(values[keep]) == np.nanmin(values) and np.nanmax(values[keep]) == np.nanmax(values)
+    assert np.isnan(values[keep]).any()
+    assert np.array_equal(minmax_decimate(values[:100], 500), np.arange(100))
+
+    # Średnie dobowe z agregatów jak bezpośrednio z tabeli godzinowej
+    daily = trend_series(df, ['A', 'B'], [2024], resolution='daily')
+    expected = df[df['rok'] == 2024].groupby([df['czas'].dt.floor('D'), 'miejscowość'], observed=True)['wartość'].mean()
+    assert np.allclose(daily.stack().to_numpy(), expected.to_numpy())
+    assert trend_series(df, ['B'], resolution='hourly')['B'].count() == df['wartość'].iloc[len(czas):].count()
+
+    fig = city_trends_plot(df, ['A', 'B'], [2023, 2024], show=False, resolution='hourly', max_points=1000)
+    assert [len(line.get_xdata()) <= 1000 for line in fig.axes[0].lines] == [True, True]
+    with pytest.raises(ValueError):
+        city_trends_plot(daily_aggregates(df), ['A'], [2024], show=False, resolution='hourly')
+
+
+def test_benchmark_pipeline(tmp_path):
+    path = tmp_path / "benchmark.json"
+    benchmark = benchmark_pipeline(years=(2023, 2024), n_stations=6, n_cities=2, output=path, max_workers=2)
+    stages = benchmark['etapy']
+    assert list(stages)[:5] == ['clear_data', 'prepare_to_analize', 'prepare_to_analize_parallel', 'combine_years',
+                                'add_month_column']
+    assert stages['prepare_to_analize_parallel']['wiersze wyniku'] == stages['prepare_to_analize']['wiersze wyniku']
+    assert {'count_exceedances', 'count_monthly_avg_city', 'rolling_mean', 'longest_episode'} <= set(stages)
+    assert stages['add_month_column']['wiersze wyniku'] == benchmark['parametry']['wiersze'] > 0
+    assert all(stage['czas [s]'] >= 0 and stage['szczyt pamięci [MB]'] >= 0 for stage in stages.values())
+
+    # Wyniki zapisane w JSON można porównać z kolejnym uruchomieniem
+    report = compare_benchmarks(str(path), benchmark)
+    assert list(report.index) == list(stages)
+    assert np.allclose(report['pamięć po/przed'].dropna(), 1.0)
+
+
+def test_profile(tmp_path):
+    import json
+
+    raw = {2024: synthetic_gios_sheet(2024, n_stations=3)}
+    meta = pd.DataFrame({'Kod stacji': ['Syn0000', 'Syn0001', 'Syn0002'],
+                         'Stary Kod stacji \n(o ile inny od aktualnego)': [None, None, None],
+                         'Miejscowość': ['A', 'B', 'B']})
+    with profile(trace_memory=True) as profiler:
+        df = add_month_column(combine_years(prepare_to_analize(raw, meta)))
+        with pytest.raises(KeyError):
+            count_exceedances(df, by=('brak',))
+
+    frame = profiler.to_frame()
+    assert frame['funkcja'].tolist()[:3] == ['czyszczenie_danych.prepare_to_analize', 'czyszczenie_danych.clear_data',
+                                             'czyszczenie_danych.clear_data_wide']
+    assert frame['poziom'].tolist()[:3] == [0, 1, 2]
+    assert frame.set_index('funkcja').loc['obliczenia.add_month_column', 'wiersze wyjścia'] == len(df)
+    assert frame.set_index('funkcja').loc['obliczenia.count_exceedances', 'błąd'] == 'KeyError'
+    assert (frame['czas [s]'] >= 0).all() and (frame['przydzielona pamięć [MB]'] >= 0).all()
+    assert profiler.summary().loc['czyszczenie_danych.clear_data', 'wywołania'] == 1
+
+    # Eksport: logi JSON Lines i Chrome Trace
+    profiler.save_log(tmp_path / "profil.jsonl")
+    profiler.save_chrome_trace(tmp_path / "profil.json")
+    lines = (tmp_path / "profil.jsonl").read_text(encoding='utf-8').splitlines()
+    assert len(lines) == len(frame) and json.loads(lines[0])['funkcja']
+    events = json.loads((tmp_path / "profil.json").read_text(encoding='utf-8'))['traceEvents']
+    assert {event['ph'] for event in events} == {'X'} and len(events) == len(frame)
+
+    # Poza blokiem `profile` wywołania nie są rejestrowane
+    add_month_column(df)
+    assert len(profiler.records) == len(frame)
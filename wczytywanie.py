@@ -1,21 +1,236 @@
+import numpy as np
+import openpyxl
 import pandas as pd
 import requests
 import zipfile
 import io, os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+import pamiec_podreczna
+from czyszczenie_danych import find_header_row, parse_values
+from instrumentacja import instrumented, peak_rss_mb
 
 gios_archive_url = "https://powietrze.gios.gov.pl/pjp/archives/downloadFile/"
 
+# rozmiar porcji przy strumieniowym pobieraniu i wypakowywaniu archiwów (1 MB)
+chunk_size = 1024 * 1024
+
+# dostępne silniki wczytywania arkuszy Excel:
+# - 'openpyxl' – `pd.read_excel(header=None)`, cały arkusz jako kolumny typu object,
+# - 'calamine' – `pd.read_excel(engine='calamine')`, szybszy parser (wymaga pakietu python-calamine),
+# - 'stream'   – jednoprzebiegowy odczyt openpyxl w trybie read-only; pomija wiersze opisowe, liczby
+#                zapisuje od razu do macierzy float32 i zwraca kolumnę czasu (datetime64) oraz kolumny pomiarów (float32).
+excel_engines = ('openpyxl', 'calamine', 'stream')
+
+
+def _read_excel_stream(path):
+    # odczyt tylko wiersza 'Kod stacji' i wierszy z pomiarami; liczby trafiają od razu do macierzy float32
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+
+        # wiersz nagłówka ustalany przez `find_header_row`, tak jak dla pozostałych silników
+        head = []
+        for row in rows:
+            head.append(row)
+            if "Kod stacji" in row:
+                break
+        else:
+            return pd.DataFrame()
+        header = head[find_header_row(pd.DataFrame(head), year=None)]
+
+        width = len(header)
+        n_columns = width - 1
+        capacity = max((sheet.max_row or 0) - len(head), 1024)
+        values = np.empty((capacity, n_columns), dtype='float32')
+        times, text_rows, text_cells = [], [], []
+        for row in rows:
+            if not row or row[0] is None:
+                continue
+            n = len(times)
+            if n == capacity:
+                capacity *= 2
+                values = np.resize(values, (capacity, n_columns))
+            cells = row[1:width]
+            if len(cells) < n_columns:
+                cells = cells + (None,) * (n_columns - len(cells))
+            times.append(row[0])
+            try:
+                if str in map(type, cells):
+                    raise ValueError
+                values[n] = cells  # liczby i puste komórki (None -> NaN) bez pośredniej ramki typu object
+            except (ValueError, TypeError):
+                # wiersze z tekstem (np. przecinek dziesiętny, 'b.d.', wiersze opisowe) – parsowane po odczycie
+                text_rows.append(n)
+                text_cells.append(cells)
+    finally:
+        workbook.close()
+
+    # wiersze opisowe (np. 'Wskaźnik', 'Jednostka') nie są datami i zostają odrzucone
+    czas = pd.to_datetime(pd.Series(times, dtype=object), format='mixed', errors='coerce')
+    keep = czas.notna().to_numpy()
+    first = np.argmax(keep) if keep.any() else len(keep)
+    values = values[:len(times)]
+
+    # komórki wierszy z tekstem przeliczane przez `parse_values` (te same reguły co w `clear_data`)
+    non_numeric = [0] * n_columns
+    text_rows = np.array(text_rows, dtype='int64')
+    kept = keep[text_rows] if len(text_rows) else np.zeros(0, dtype=bool)
+    if kept.any():
+        cells = np.array([text_cells[i] for i in np.flatnonzero(kept)], dtype=object).reshape(-1, n_columns)
+        for i in range(n_columns):
+            stats = {}
+            values[text_rows[kept], i] = parse_values(pd.Series(cells[:, i], dtype=object), stats).to_numpy()
+            non_numeric[i] = stats['wartości nieliczbowe']
+
+    df = pd.DataFrame(values[keep], columns=list(header[1:width]))
+    df.insert(0, "Kod stacji", czas[keep].reset_index(drop=True))
+
+    # liczba wartości nieliczbowych w kolumnach i odrzuconych wierszy z niepoprawną datą po pierwszym
+    # pomiarze (dla raportu jakości danych w `clear_data_wide`)
+    df.attrs['wartości nieliczbowe'] = non_numeric
+    df.attrs['wiersze bez daty'] = int(np.count_nonzero(~keep[first:]))
+    return df
+
+
+@instrumented
+def read_sheet(source, engine='openpyxl'):
+    """
+        Wczytuje arkusz z pomiarami GIOŚ wybranym silnikiem.
+        Args:
+            source (str | file): Ścieżka do pliku Excel lub otwarty plik.
+            engine (str, optional): Silnik wczytywania, jeden z `excel_engines`. Domyślnie 'openpyxl'.
+        Returns:
+            pd.DataFrame: Dla 'openpyxl' i 'calamine' – surowy arkusz (`header=None`).
+                          Dla 'stream' – kolumna 'Kod stacji' z czasem pomiaru (datetime64)
+                          i po jednej kolumnie float32 na każdą stację.
+        Raises:
+            ValueError: gdy podano nieznany silnik.
+    """
+    if engine == 'openpyxl':
+        return pd.read_excel(source, header=None)
+    if engine == 'calamine':
+        return pd.read_excel(source, header=None, engine='calamine')
+    if engine == 'stream':
+        return _read_excel_stream(source)
+    raise ValueError(f"Nieznany silnik wczytywania: {engine} (dostępne: {', '.join(excel_engines)})")
+
+
+def make_session(pool_size=4):
+    """
+        Tworzy sesję HTTP z pulą połączeń, współdzieloną przez wątki pobierające archiwa.
+        Args:
+            pool_size (int): Maksymalna liczba równoległych połączeń do serwera GIOŚ.
+        Returns:
+            requests.Session: Sesja z zamontowanym adapterem HTTP/HTTPS.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def read_archive_sheet(archive, filename, year, engine='openpyxl'):
+    """
+        Wypakowuje wskazany plik z archiwum ZIP i wczytuje go do DataFrame.
+
+        Plik Excel jest wypakowywany strumieniowo do pliku tymczasowego, więc w pamięci
+        nie są jednocześnie trzymane: archiwum, rozpakowany plik i gotowy DataFrame.
+        Args:
+            archive (bytes | str): Zawartość archiwum ZIP albo ścieżka do niego.
+            filename (str): Dokładna nazwa pliku Excel wewnątrz archiwum ZIP.
+            year (int): Rok, którego dotyczą dane (używany w komunikatach o błędach).
+            engine (str, optional): Silnik wczytywania arkusza (patrz `read_sheet`). Domyślnie 'openpyxl'.
+        Returns:
+            pd.DataFrame: Dane wczytane z pliku Excel (lub None, gdy nie udało się ich wczytać).
+        Raises:
+            zipfile.BadZipFile: gdy archiwum nie jest poprawnym plikiem ZIP.
+    """
+    df = None
+    source = io.BytesIO(archive) if isinstance(archive, bytes) else archive
+
+    # Otwórz zip
+    with zipfile.ZipFile(source) as z:
+        # znajdź właściwy plik z PM2.5
+        if not filename:
+            print(f"Błąd: nie znaleziono {filename}.")
+            return df
+
+        # wypakuj plik porcjami na dysk i wczytaj go do pandas
+        suffix = os.path.splitext(filename)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            with z.open(filename) as f:
+                shutil.copyfileobj(f, tmp, chunk_size)
+        try:
+            df = read_sheet(tmp.name, engine)
+        except Exception as e:
+            print(f"Błąd przy wczytywaniu {year}: {e}")
+        finally:
+            os.remove(tmp.name)
+
+    return df
+
+
+def stream_to_file(response, directory=None):
+    """
+        Zapisuje treść odpowiedzi HTTP porcjami do pliku tymczasowego.
+        Args:
+            response (requests.Response): Odpowiedź pobrana z `stream=True`.
+            directory (str, optional): Katalog pliku tymczasowego. Domyślnie katalog systemowy.
+        Returns:
+            tuple: (ścieżka do pliku, liczba pobranych bajtów).
+    """
+    size = 0
+    with tempfile.NamedTemporaryFile(suffix=".zip", dir=directory, delete=False) as tmp:
+        try:
+            for chunk in response.iter_content(chunk_size):
+                tmp.write(chunk)
+                size += len(chunk)
+        except Exception:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    return tmp.name, size
+
+
 # funkcja do ściągania podanego archiwum
-def download_gios_archive(year, gios_id, filename):
+@instrumented
+def download_gios_archive(year, gios_id, filename, base_url=gios_archive_url, session=None,
+                          cache_dir=None, revalidate=True, max_cache_bytes=pamiec_podreczna.default_max_bytes,
+                          stats=None, engine='openpyxl'):
     """
         Funkcja:
-        1. Pobiera archiwum ZIP z bazy GIOŚ
+        1. Pobiera archiwum ZIP z bazy GIOŚ (strumieniowo, porcjami do pliku tymczasowego)
         2. Wypakowuje wskazany plik
         3. Wczytuje ten plik do DataFrame.
+
+        Gdy podano `cache_dir`, archiwum i jego kolumnowa kopia (Parquet) są zapisywane w pamięci podręcznej
+        (moduł `pamiec_podreczna`). Przy kolejnym wywołaniu wysyłane jest żądanie warunkowe (ETag/Last-Modified),
+        a gdy serwer odpowie 304 – arkusz wczytywany jest z kopii Parquet, bez pobierania i parsowania Excela.
+        Przy `revalidate=False` zapisany arkusz jest używany bez łączenia się z serwerem.
+
+        Gdy podano słownik `stats`, funkcja uzupełnia go o statystyki wczytywania:
+        'bytes' (rozmiar archiwum), 'download_s', 'throughput_mb_s', 'read_s' oraz 'peak_rss_mb' i 'rss_growth_mb'
+        (szczytowy RSS procesu po wczytaniu i jego przyrost w trakcie wywołania, wg `resource.getrusage` – pomiar
+        nie spowalnia pobierania; w Windows None). RSS dotyczy całego procesu, więc przy równoległym pobieraniu
+        obejmuje też inne wątki.
         Args:
             year (int): Rok, którego dotyczą dane (używany głównie w obsłudze błędów).
             gios_id (str): Identyfikator zasobu w URL archiwum GIOŚ.
             filename (str): Dokładna nazwa pliku Excel wewnątrz archiwum ZIP do wczytania.
+            base_url (str, optional): Adres bazowy archiwum. Domyślnie serwer GIOŚ
+                                      (można podać lokalny serwer, np. w testach).
+            session (requests.Session, optional): Sesja HTTP z pulą połączeń. Domyślnie None (zwykłe `requests.get`).
+            cache_dir (str, optional): Katalog pamięci podręcznej. Domyślnie None (bez pamięci podręcznej).
+            revalidate (bool, optional): Czy sprawdzać na serwerze aktualność zapisanego archiwum. Domyślnie True.
+            max_cache_bytes (int, optional): Limit rozmiaru pamięci podręcznej. Domyślnie 2 GB.
+            stats (dict, optional): Słownik uzupełniany statystykami pobierania. Domyślnie None.
+            engine (str, optional): Silnik wczytywania arkusza (patrz `read_sheet`). Domyślnie 'openpyxl'.
 
         Returns:
             pd.DataFrame: Dane wczytane z pliku Excel
@@ -23,62 +238,217 @@ def download_gios_archive(year, gios_id, filename):
             requests.exceptions.HTTPError: gdy wystąpi błąd podczas pobierania pliku.
             zipfile.BadZipFile: gdy pobrany plik nie jest poprawnym archiwum ZIP.
         """
-    # Pobranie archiwum ZIP do pamięci
-    url = f"{gios_archive_url}{gios_id}"
-    response = requests.get(url)
-    response.raise_for_status()  # jeśli błąd HTTP, zatrzymaj
+    rss_before = peak_rss_mb()
+    try:
+        return _download_gios_archive(year, gios_id, filename, base_url, session,
+                                      cache_dir, revalidate, max_cache_bytes, stats, engine)
+    finally:
+        if stats is not None:
+            _add_rss(stats, rss_before)
 
-    # Otwórz zip w pamięci
-    with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-        # znajdź właściwy plik z PM2.5
-        if not filename:
-            print(f"Błąd: nie znaleziono {filename}.")
-        else:
-            # wczytaj plik do pandas
-            with z.open(filename) as f:
-                try:
-                    df = pd.read_excel(f, header=None)
-                except Exception as e:
-                    print(f"Błąd przy wczytywaniu {year}: {e}")
 
+def _add_rss(stats, rss_before):
+    # szczytowy RSS procesu po wywołaniu i jego przyrost względem szczytu sprzed wywołania
+    rss = peak_rss_mb()
+    stats['peak_rss_mb'] = rss
+    stats['rss_growth_mb'] = rss - rss_before if rss is not None else None
+
+
+def _download_gios_archive(year, gios_id, filename, base_url, session, cache_dir, revalidate, max_cache_bytes, stats,
+                           engine):
+    stats = {} if stats is None else stats
+    stats.update({'bytes': 0, 'download_s': 0.0, 'throughput_mb_s': 0.0, 'read_s': 0.0})
+
+    entry = None
+    headers = {}
+    if cache_dir is not None:
+        entry = pamiec_podreczna.get_entry(cache_dir, gios_id, filename)
+        if entry is not None:
+            if not revalidate:
+                start = time.perf_counter()
+                df = pamiec_podreczna.load_sheet(cache_dir, entry, engine)
+                stats['read_s'] = time.perf_counter() - start
+                if df is not None:
+                    pamiec_podreczna.touch(cache_dir, gios_id, filename)
+                    return df
+            headers = pamiec_podreczna.validators(entry)
+
+    # Pobranie archiwum ZIP porcjami do pliku tymczasowego
+    url = f"{base_url}{gios_id}"
+    http = session if session is not None else requests
+    start = time.perf_counter()
+    with http.get(url, headers=headers, stream=True) as response:
+        # Archiwum nie zmieniło się od ostatniego pobrania
+        if response.status_code == 304 and entry is not None:
+            pamiec_podreczna.touch(cache_dir, gios_id, filename)
+            start = time.perf_counter()
+            df = pamiec_podreczna.load_sheet(cache_dir, entry, engine)
+            if df is None:
+                df = read_archive_sheet(pamiec_podreczna.archive_path(cache_dir, entry), filename, year, engine)
+                if df is not None:
+                    pamiec_podreczna.store_sheet(cache_dir, entry, df, engine)
+            stats['read_s'] = time.perf_counter() - start
+            return df
+
+        response.raise_for_status()  # jeśli błąd HTTP, zatrzymaj
+
+        tmp_dir = pamiec_podreczna.temp_dir(cache_dir) if cache_dir is not None else None
+        path, size = stream_to_file(response, tmp_dir)
+
+    stats['bytes'] = size
+    stats['download_s'] = time.perf_counter() - start
+    if stats['download_s'] > 0:
+        stats['throughput_mb_s'] = size / 1024 ** 2 / stats['download_s']
+
+    start = time.perf_counter()
+    if cache_dir is None:
+        try:
+            return read_archive_sheet(path, filename, year, engine)
+        finally:
+            os.remove(path)
+            stats['read_s'] = time.perf_counter() - start
+
+    # Zapis archiwum; jeśli zawartość się nie zmieniła, wystarczy zapisana kopia arkusza
+    entry = pamiec_podreczna.store_archive(cache_dir, gios_id, filename, path,
+                                           etag=response.headers.get('ETag'),
+                                           last_modified=response.headers.get('Last-Modified'))
+    df = pamiec_podreczna.load_sheet(cache_dir, entry, engine)
+    if df is None:
+        df = read_archive_sheet(pamiec_podreczna.archive_path(cache_dir, entry), filename, year, engine)
+        if df is not None:
+            pamiec_podreczna.store_sheet(cache_dir, entry, df, engine)
+    stats['read_s'] = time.perf_counter() - start
+    pamiec_podreczna.evict(cache_dir, max_cache_bytes)
 
     return df
 
 
-def load_all_data(gios_url_ids, gios_pm25_file):
+def download_with_retry(year, gios_id, filename, retries=3, backoff=1.0, base_url=gios_archive_url, session=None,
+                        **options):
+    """
+        Wywołuje `download_gios_archive`, ponawiając próbę przy błędach sieci lub serwera.
+        Kolejne próby są opóźniane wykładniczo: backoff, 2*backoff, 4*backoff, ...
+        Błędy klienta (HTTP 4xx) nie są ponawiane.
+        Args:
+            year (int): Rok, którego dotyczą dane.
+            gios_id (str): Identyfikator zasobu w URL archiwum GIOŚ.
+            filename (str): Nazwa pliku Excel wewnątrz archiwum ZIP.
+            retries (int, optional): Maksymalna liczba prób. Domyślnie 3.
+            backoff (float, optional): Opóźnienie (w sekundach) przed drugą próbą. Domyślnie 1.0.
+            base_url (str, optional): Adres bazowy archiwum.
+            session (requests.Session, optional): Sesja HTTP z pulą połączeń.
+            **options: Pozostałe opcje przekazywane do `download_gios_archive`
+                       (`cache_dir`, `revalidate`, `max_cache_bytes`, `stats`, `engine`).
+        Returns:
+            pd.DataFrame: Dane wczytane z pliku Excel (lub None, gdy pliku nie udało się wczytać).
+        Raises:
+            requests.exceptions.RequestException: gdy wszystkie próby zakończyły się błędem.
+            zipfile.BadZipFile: gdy po wszystkich próbach archiwum jest nadal niepoprawne.
+    """
+    for attempt in range(retries):
+        try:
+            return download_gios_archive(year, gios_id, filename, base_url=base_url, session=session,
+                                         **options)
+        except (requests.exceptions.RequestException, zipfile.BadZipFile) as e:
+            response = getattr(e, 'response', None)
+            client_error = response is not None and response.status_code < 500
+            if client_error or attempt == retries - 1:
+                raise
+            print(f"Ponawianie pobierania roku {year} (próba {attempt + 2}/{retries}): {e}")
+            time.sleep(backoff * 2 ** attempt)
+
+
+@instrumented
+def load_all_data(gios_url_ids, gios_pm25_file, max_workers=4, retries=3, backoff=1.0, base_url=gios_archive_url,
+                  cache_dir=None, revalidate=True, stats=None, engine='openpyxl', errors=None):
     """
     Pobiera dane PM2.5 dla wszystkich lat zdefiniowanych w słownikach `gios_url_ids` i `gios_pm25_file`.
     Funkcja:
-    - Iteruje po wszystkich latach w słowniku `gios_url_ids`.
-    - Pobiera dane dla każdego roku za pomocą funkcji `download_gios_archive`.
-    - Zbiera wszystkie DataFrame'y do słownika: {rok: DataFrame}.
+    - Pobiera archiwa równolegle w puli wątków (co najwyżej `max_workers` naraz), używając wspólnej puli połączeń HTTP.
+    - Pobiera dane dla każdego roku za pomocą funkcji `download_with_retry` (ponawianie z opóźnieniem).
+    - Zbiera wszystkie DataFrame'y do słownika: {rok: DataFrame}, w kolejności lat z `gios_url_ids`.
     - Wypisuje informację o wczytywaniu roku.
+    - Gdy podano słownik `errors`, rok, którego nie udało się pobrać po wszystkich próbach, jest pomijany,
+      a przyczyna trafia do `errors`; bez niego błąd pobierania jest zgłaszany (jak dotąd `raise_for_status`).
     Args:
         gios_url_ids (dict): Słownik {rok: ID archiwum GIOŚ}.
         gios_pm25_file (dict): Słownik {rok: nazwa pliku PM2.5}.
+        max_workers (int, optional): Liczba równoległych pobrań. Domyślnie 4.
+        retries (int, optional): Maksymalna liczba prób dla każdego roku. Domyślnie 3.
+        backoff (float, optional): Początkowe opóźnienie między próbami w sekundach. Domyślnie 1.0.
+        base_url (str, optional): Adres bazowy archiwum. Domyślnie serwer GIOŚ.
+        cache_dir (str, optional): Katalog pamięci podręcznej archiwów i arkuszy
+                                   (np. `pamiec_podreczna.default_cache_dir`). Domyślnie None.
+        revalidate (bool, optional): Czy sprawdzać na serwerze aktualność zapisanych archiwów.
+                                     Przy False ponowne uruchomienie nie korzysta z sieci. Domyślnie True.
+        stats (dict, optional): Słownik uzupełniany statystykami: {rok: statystyki z `download_gios_archive`}
+                                oraz 'total' – łączna liczba bajtów, czas, przepustowość oraz szczytowy RSS procesu
+                                i jego przyrost ('peak_rss_mb', 'rss_growth_mb'). Pamięć mierzona jest dla całego
+                                wczytywania – przy `max_workers` > 1 wartości RSS lat obejmują równoległe pobrania.
+        engine (str, optional): Silnik wczytywania arkuszy (patrz `read_sheet`). Domyślnie 'openpyxl'.
+        errors (dict, optional): Słownik uzupełniany błędami pobierania: {rok: komunikat}. Domyślnie None.
     Returns:
         - dict: Słownik DataFrame'ów, gdzie klucz to rok, a wartość to DataFrame z danymi PM2.5.
+    Raises:
+        requests.exceptions.RequestException: gdy nie podano `errors`, a pobieranie roku nie powiodło się.
+        zipfile.BadZipFile: gdy nie podano `errors`, a archiwum roku jest niepoprawne.
     """
 
-    all_years_data = {}
+    results = {}
+    failed = {}
+    session = make_session(max_workers)
 
-    #pętla po latach z słownika gios_url_ids
-    for year in gios_url_ids.keys():
-        print(f"Wczytywanie roku {year}...")
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
 
-        #pobranie id i nazwy pliku
-        current_id = gios_url_ids[year]
-        current_file = gios_pm25_file[year]
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        #zlecenie pobrania każdego roku ze słownika gios_url_ids
+        for year in gios_url_ids.keys():
+            print(f"Wczytywanie roku {year}...")
+            year_stats = None
+            if stats is not None:
+                year_stats = stats[year] = {}
+            future = executor.submit(download_with_retry, year, gios_url_ids[year], gios_pm25_file[year],
+                                     retries, backoff, base_url, session,
+                                     cache_dir=cache_dir, revalidate=revalidate, stats=year_stats,
+                                     engine=engine)
+            futures[future] = year
 
-        #wywołanie funkcji
-        df = download_gios_archive(year, current_id, current_file)
+        for future in as_completed(futures):
+            year = futures[future]
+            try:
+                df = future.result()
+            except (requests.exceptions.RequestException, zipfile.BadZipFile) as e:
+                print(f"Błąd przy pobieraniu roku {year}: {e}")
+                if errors is None:
+                    # pozostałe lata nie są już pobierane – niepełny wynik nie trafia dalej do analizy
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                failed[year] = f"{type(e).__name__}: {e}"
+                continue
 
-        if df is not None:
-            all_years_data[year] = df
+            if df is not None:
+                results[year] = df
+
+    if stats is not None:
+        seconds = time.perf_counter() - start
+        total_bytes = sum(stats[year].get('bytes', 0) for year in gios_url_ids.keys())
+        stats['total'] = {'bytes': total_bytes, 'seconds': seconds,
+                          'throughput_mb_s': total_bytes / 1024 ** 2 / seconds if seconds > 0 else 0.0}
+        _add_rss(stats['total'], rss_before)
+
+    if errors is not None:
+        errors.update({year: failed[year] for year in gios_url_ids.keys() if year in failed})
+
+    # zachowanie kolejności lat z gios_url_ids
+    all_years_data = {year: results[year] for year in gios_url_ids.keys() if year in results}
 
     return all_years_data
 
 # załadowywanie metadanych
+@instrumented
 def load_metadane():
     """
         Wczytuje metadane stacji pomiarowych PM2.5 z archiwum GIOŚ.
@@ -98,12 +468,35 @@ def load_metadane():
    #  meta = download_gios_archive("Metadane", metadane_id, metadane_file)
 
 #awaryjne: na wypadek, gdyby nie działała strona
-def load_metadane2():
+@instrumented
+def load_metadane2(path="metadane.xlsx", engine='openpyxl'):
     """
         Wczytuje metadane stacji PM2.5 z lokalnego pliku Excel.
         Funkcja awaryjna, gdy serwis GIOŚ jest niedostępny.
+        Args:
+            path (str, optional): Ścieżka do pliku z metadanymi. Domyślnie "metadane.xlsx".
+            engine (str, optional): Silnik wczytywania, jeden z `excel_engines`. Domyślnie 'openpyxl'.
         Returns:
             pd.DataFrame: DataFrame zawierający metadane stacji.
+        Raises:
+            ValueError: gdy podano nieznany silnik.
     """
-    return pd.read_excel("metadane.xlsx")
-
+    if engine == 'stream':
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = list(workbook.worksheets[0].iter_rows(values_only=True))
+        finally:
+            workbook.close()
+        # pomijamy puste kolumny bez nagłówka (tryb read-only zwraca pełną szerokość arkusza)
+        width = max(i + 1 for i, name in enumerate(rows[0]) if name is not None)
+        meta = pd.DataFrame([row[:width] for row in rows[1:]], columns=rows[0][:width]).infer_objects()
+        # kolumny liczbowe zapisane częściowo tekstem (np. współrzędne) -> float, jak w `pd.read_excel`
+        for col in meta.columns[meta.dtypes == object]:
+            try:
+                meta[col] = pd.to_numeric(meta[col])
+            except (ValueError, TypeError):
+                pass
+        return meta
+    if engine in excel_engines:
+        return pd.read_excel(path, engine=engine)
+    raise ValueError(f"Nieznany silnik wczytywania: {engine} (dostępne: {', '.join(excel_engines)})")
@@ -1,40 +1,246 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from agregaty import DailyAggregates, daily_aggregates
+from obliczenia import count_monthly_avg_city
+
+# formaty plików zapisywanych przez `export_plots`
+plot_formats = ('png', 'svg')
+
+# rozdzielczości wykresu trendów `city_trends_plot`
+trend_resolutions = ('monthly', 'daily', 'hourly')
+
+
+def _figure(show, figsize=None):
+    # na ekran – figura pyplot (wyświetlana przez plt.show); bez wyświetlania – samodzielna figura
+    # z płótnem Agg, bez globalnego stanu pyplot (bezpieczna w procesach wsadowych)
+    if show:
+        return plt.figure(figsize=figsize)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _finish(fig, show, path):
+    # zapis do pliku (format z rozszerzenia, np. .png lub .svg), potem wyświetlenie albo zwrócenie figury
+    if path is not None:
+        fig.savefig(path, bbox_inches='tight')
+    if show:
+        plt.show()
+        return None
+    return fig
+
+
+def trend_table(df):
+    """
+        Przekształca średnie miesięczne miast (wynik `count_monthly_avg_city`) do tabeli [(miejscowość, rok) x miesiąc].
+        Tabelę policzoną raz można przekazać do wielu wywołań `city_trends_plot` i `heatmap_plot`
+        (np. w `export_plots`) – panele wybierają wtedy wiersze z indeksu zamiast filtrować całą ramkę.
+        Args:
+            df (pd.DataFrame): DataFrame z kolumnami 'miejscowość', 'rok', 'miesiąc', 'średnie_PM25'.
+        Returns:
+            pd.DataFrame: Tabela średnich (indeks: miejscowość, rok; kolumny: miesiące).
+    """
+    return df.set_index(['miejscowość', 'rok', 'miesiąc'])['średnie_PM25'].unstack('miesiąc')
+
+
+def _trend_table(df, cities=None, years=None):
+    # tabela z `trend_table` przekazywana bez zmian, średnie w formacie long przekształcane;
+    # z agregatów dobowych albo tabeli pomiarów najpierw liczone są średnie miesięczne miast
+    if isinstance(df, DailyAggregates) or 'wartość' in df.columns:
+        df = count_monthly_avg_city(df, cities, years)
+    return trend_table(df) if 'średnie_PM25' in df.columns else df
+
+
+def trend_series(data, cities, years=None, resolution='daily'):
+    """
+        Zwraca średnie miast w kolejnych dniach lub godzinach (średnia ze wszystkich pomiarów stacji w mieście).
+        Średnie dobowe liczone są z agregatów dobowych (`daily_aggregates` – dla tabeli pomiarów liczone raz
+        i zapamiętywane), godzinowe z tabeli pomiarów zawężonej do wybranych miast i lat.
+        Args:
+            data (pd.DataFrame | DailyAggregates): Tabela pomiarów w formacie long (kolumny 'czas', 'miejscowość',
+                                                   'rok', 'wartość') albo agregaty dobowe (tylko 'daily').
+            cities (list[str]): Lista miast.
+            years (list[int], optional): Lista lat. Domyślnie None (wszystkie lata).
+            resolution (str, optional): 'daily' lub 'hourly'. Domyślnie 'daily'.
+        Returns:
+            pd.DataFrame: Średnie (indeks: czas, kolumny: miejscowości; NaN, gdy brak pomiarów).
+    """
+    if resolution == 'daily':
+        daily = daily_aggregates(data).select(cities, years).rollup(['miejscowość', 'dzień'])
+        series = daily.pivot(index='dzień', columns='miejscowość', values='średnia')
+        series.index = pd.DatetimeIndex(series.index.to_numpy().astype('datetime64[D]').astype('datetime64[ns]'),
+                                        name='czas')
+    elif resolution == 'hourly':
+        if isinstance(data, DailyAggregates):
+            raise ValueError("Rozdzielczość 'hourly' wymaga tabeli pomiarów (agregaty dobowe nie mają godzin)")
+        mask = data['miejscowość'].isin(cities).to_numpy()
+        if years is not None:
+            mask = mask & data['rok'].isin(years).to_numpy()
+        df = data.loc[mask, ['czas', 'miejscowość', 'wartość']]
+        series = df.groupby(['czas', 'miejscowość'], observed=True)['wartość'].mean().unstack('miejscowość')
+    else:
+        raise ValueError(f"Nieznana rozdzielczość: {resolution} (dostępne: 'daily', 'hourly')")
+    series.columns = series.columns.astype(object)
+    return series.astype('float64')
+
+
+def minmax_decimate(values, max_points=2000):
+    """
+        Wybiera najwyżej `max_points` punktów linii tak, żeby zachować jej obwiednię: wartości dzielone są
+        na `max_points` / 2 równych przedziałów, a z każdego brane są punkty minimum i maksimum (w kolejności czasu).
+        Szczyty i spadki pozostają na wykresie, a przedział bez pomiarów zostaje przerwą w linii.
+        Args:
+            values (np.ndarray): Wartości linii (NaN – brak pomiaru).
+            max_points (int, optional): Maksymalna liczba punktów. Domyślnie 2000.
+        Returns:
+            np.ndarray: Rosnące pozycje wybranych punktów.
+    """
+    n = len(values)
+    buckets = max(1, max_points // 2)
+    if n <= max_points:
+        return np.arange(n)
+
+    # przedziały równej długości (ostatni dopełniony NaN) jako macierz [przedział, pozycja]
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(buckets, size)
+    missing = np.isnan(padded)
+    low = np.where(missing, np.inf, padded).argmin(axis=1)
+    high = np.where(missing, -np.inf, padded).argmax(axis=1)
+
+    starts = np.arange(buckets) * size
+    positions = np.sort(np.column_stack([low, high]), axis=1) + starts[:, None]
+    return np.unique(np.minimum(positions.ravel(), n - 1))
+
 
 #ZADANIE 2
-def city_trends_plot(df, cities, years):
+def city_trends_plot(df, cities, years, show=True, path=None, resolution='monthly', max_points=2000):
     """
         Funkcja rysuje wykres liniowy trendów średnich miesięcznych wartości PM2.5
         dla wybranych miast i lat (po uśrednieniu wyników ze wszystkich stacji pomiarowych w danym mieście).
         Oś X przedstawia miesiące (1–12), natomiast oś Y średnie wartości PM2.5.
         Wykres umożliwia porównanie zmian poziomu zanieczyszczenia powietrza w danych miastach dla określonych lat.
 
+        Przy rozdzielczości 'daily' lub 'hourly' oś X to czas, a każde miasto ma jedną linię średnich dobowych
+        lub godzinowych (`trend_series`) dla wszystkich wybranych lat. Linie dłuższe niż `max_points` punktów są
+        przerzedzane z zachowaniem obwiedni min/max (`minmax_decimate`), więc wykres dziesięciu lat
+        pomiarów godzinowych rysuje się tak szybko jak wykres miesięczny.
+
         Args:
         df (pd.DataFrame): DataFrame zawierający uśrednione dane miesięczne PM2.5 dla miast, z kolumnami:
-            'miejscowość', 'rok', 'miesiąc', 'średnie_PM25'.
+            'miejscowość', 'rok', 'miesiąc', 'średnie_PM25' (albo tabela z `trend_table`). Można też podać
+            tabelę pomiarów lub agregaty dobowe (`DailyAggregates`) – średnie liczone są wtedy jak w
+            `count_monthly_avg_city` ('monthly') albo `trend_series` ('daily', 'hourly').
         cities (list[str]): Lista miast do uwzględnienia w analizie
         years (list[int]): Lista lat do porównania
+        show (bool, optional): Czy wyświetlić wykres. Domyślnie True. Przy False wykres rysowany jest
+            bez pyplot (backend Agg) i zwracany jako figura.
+        path (str, optional): Ścieżka pliku wykresu (.png, .svg). Domyślnie None – bez zapisu.
+        resolution (str, optional): Jedna z `trend_resolutions`. Domyślnie 'monthly'.
+        max_points (int, optional): Maksymalna liczba punktów linii przy 'daily' i 'hourly'. Domyślnie 2000.
 
     Zwraca:
-        None
-        Funkcja wyświetla wykres, nie zwraca wartości.
+        None przy show=True (funkcja wyświetla wykres), w przeciwnym razie matplotlib.figure.Figure.
     """
+    if resolution not in trend_resolutions:
+        raise ValueError(f"Nieznana rozdzielczość: {resolution} (dostępne: {', '.join(trend_resolutions)})")
+    if resolution != 'monthly':
+        return _series_plot(trend_series(df, cities, years, resolution), resolution, show, path, max_points)
+
+    table = _trend_table(df, cities, years)
+    fig = _figure(show)
+    ax = fig.subplots()
     for city in cities:
         for year in years:
-            df_plot = df[(df['miejscowość'] == city) & (df['rok'] == year)]
-            plt.plot(df_plot['miesiąc'], df_plot['średnie_PM25'],
-                     marker='o', label=f"{city} {year}")
+            row = table.loc[(city, year)].dropna() if (city, year) in table.index else table.iloc[:0, 0]
+            ax.plot(row.index.to_numpy(), row.to_numpy(), marker='o', label=f"{city} {year}")
+
+    ax.set_xlabel('Miesiące', fontsize=12)
+    ax.set_ylabel('Średnia wartość PM2.5', fontsize=12)
+    ax.set_title("Trend średnich miesięcznych wartości PM2.5")
+    ax.grid()
+    ax.legend()
+    return _finish(fig, show, path)
+
+
+def _series_plot(series, resolution, show, path, max_points):
+    # jedna przerzedzona linia na miasto (oś X – czas)
+    fig = _figure(show, figsize=(14, 6))
+    ax = fig.subplots()
+    czas = series.index.to_numpy()
+    for city in series.columns:
+        values = series[city].to_numpy()
+        keep = minmax_decimate(values, max_points)
+        ax.plot(czas[keep], values[keep], linewidth=0.8, label=city)
+
+    label = 'dobowych' if resolution == 'daily' else 'godzinowych'
+    ax.set_xlabel('Czas', fontsize=12)
+    ax.set_ylabel('Średnia wartość PM2.5', fontsize=12)
+    ax.set_title(f"Trend średnich {label} wartości PM2.5")
+    ax.grid()
+    ax.legend()
+    return _finish(fig, show, path)
+
+
+def heatmap_tensor(df):
+    """
+        Przekształca średnie miesięczne miast do tablicy [miejscowość, rok, miesiąc] – raz dla wszystkich paneli
+        `heatmap_plot` (brak pomiarów w danym miesiącu to NaN).
+        Args:
+            df (pd.DataFrame): DataFrame z kolumnami 'miejscowość', 'rok', 'miesiąc', 'średnie_PM25'
+                               (albo tabela z `trend_table`).
+        Returns:
+            tuple: (miejscowości (pd.Index), lata (pd.Index), wartości (np.ndarray float64 [miejscowość, rok, 12])).
+    """
+    table = _trend_table(df)
+    city_codes, cities = pd.factorize(table.index.get_level_values('miejscowość'), sort=True)
+    year_codes, years = pd.factorize(table.index.get_level_values('rok'), sort=True)
+    months = table.columns.to_numpy().astype(np.int64) - 1
+
+    values = np.full((len(cities), len(years), 12), np.nan)
+    values[city_codes[:, None], year_codes[:, None], months] = table.to_numpy(dtype=np.float64, na_value=np.nan)
+    return pd.Index(cities, name='miejscowość'), pd.Index(years, name='rok'), values
+
+
+def _page_path(path, page, pages):
+    # przy wielu stronach numer strony dopisywany przed rozszerzeniem: heatmapy.png -> heatmapy-2.png
+    if path is None or pages == 1:
+        return path
+    root, ext = os.path.splitext(os.fspath(path))
+    return f"{root}-{page}{ext}"
 
-    plt.xlabel('Miesiące', fontsize=12)
-    plt.ylabel('Średnia wartość PM2.5', fontsize=12)
-    plt.title("Trend średnich miesięcznych wartości PM2.5")
-    plt.grid()
-    plt.legend()
-    plt.show()
+
+def _heatmap_panel(ax, city, years, values):
+    # panel jednej miejscowości w układzie `sns.heatmap` (bez ramki, lata od góry, etykiety w środkach komórek);
+    # pomijane są lata i miesiące bez pomiarów, jak w pivot_table
+    rows = ~np.isnan(values).all(axis=1)
+    cols = ~np.isnan(values).all(axis=0)
+    data = values[np.ix_(rows, cols)]
+    mesh = ax.pcolormesh(np.ma.masked_invalid(data), cmap='rocket_r', vmin=0.0, vmax=70.0)
+    ax.set(xlim=(0, data.shape[1]), ylim=(0, data.shape[0]))
+    ax.invert_yaxis()
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.set_xticks(np.arange(data.shape[1]) + 0.5, np.flatnonzero(cols) + 1)
+    ax.set_yticks(np.arange(data.shape[0]) + 0.5, years[rows], va='center')
+    ax.set_title(city)
+    ax.set_xlabel('Miesiąc')
+    ax.set_ylabel('Rok')
+    return mesh
 
 
 #ZADANIE 3
-def heatmap_plot(df_mean_month):
+def heatmap_plot(df_mean_month, show=True, path=None, ncols=4, per_page=20):
     """
         Funkcja tworzy heatmapy średnich miesięcznych stężeń PM2.5 dla wybranych lat i miejscowości.
 
@@ -47,42 +253,60 @@ def heatmap_plot(df_mean_month):
         Każdy panel odpowiada jednej miejscowości, co pozwala
         porównać zmiany poziomu zanieczyszczeń w czasie
         pomiędzy różnymi miastami.
+        Średnie są raz przekształcane do tablicy [miejscowość, rok, miesiąc] (`heatmap_tensor`), z której
+        rysowane są wszystkie panele. Siatka ma `ncols` kolumn i tyle wierszy, ile potrzeba; gdy miejscowości
+        jest więcej niż `per_page`, heatmapy dzielone są na kolejne strony (osobne figury).
 
         Args:
             df_mean_month (pd.DataFrame):
                 DataFrame zawierający uśrednione miesięczne dane PM2.5 dla miast, z kolumnami:
-                'miejscowość', 'rok', 'miesiąc', 'średnie_PM25'.
+                'miejscowość', 'rok', 'miesiąc', 'średnie_PM25' (albo tabela z `trend_table`
+                lub wynik `heatmap_tensor`).
+            show (bool, optional): Czy wyświetlić wykres. Domyślnie True. Przy False heatmapy rysowane są
+                bez pyplot (backend Agg) i zwracane jako figury.
+            path (str, optional): Ścieżka pliku wykresu (.png, .svg). Przy wielu stronach numer strony
+                dopisywany jest przed rozszerzeniem (heatmapy-1.png, heatmapy-2.png, ...). Domyślnie None – bez zapisu.
+            ncols (int, optional): Liczba kolumn siatki paneli. Domyślnie 4.
+            per_page (int, optional): Maksymalna liczba paneli na stronie. Domyślnie 20.
         Returns:
-            None
-                Funkcja wyświetla heatmapy, nie zwraca wartości.
+            None przy show=True (funkcja wyświetla heatmapy), w przeciwnym razie lista figur
+            (matplotlib.figure.Figure, po jednej na stronę).
 
         Uwaga: Kolor heatmapy jest skalowany od 0 do 70 µg/m³.
         """
-    # Lista badanych miast
-    cities = df_mean_month['miejscowość'].unique()
+    # tablica [miejscowość, rok, miesiąc] liczona raz dla wszystkich paneli
+    cities, years, values = df_mean_month if isinstance(df_mean_month, tuple) else heatmap_tensor(df_mean_month)
+
+    pages = max(1, -(-len(cities) // per_page))
+    figures = []
+    for page in range(pages):
+        page_cities = range(page * per_page, min((page + 1) * per_page, len(cities)))
+        cols = max(1, min(ncols, len(page_cities)))
+        rows = max(1, -(-len(page_cities) // cols))
 
-    # Tworzenie siatki (5 wierszy x 4 kolumny)
-    fig, axes = plt.subplots(nrows=5, ncols=4, figsize=(30, 25))
-    axes = axes.flatten()  # spłaszczenie do listy
+        # Tworzenie siatki (panel 7.5 x 5 cala, jak w siatce 5 x 4 o rozmiarze 30 x 25)
+        fig = _figure(show, figsize=(7.5 * cols, 5 * rows))
+        axes = fig.subplots(nrows=rows, ncols=cols, squeeze=False).flatten()
+        for ax in axes[len(page_cities):]:
+            ax.set_visible(False)
 
-    for ax, city in zip(axes, cities):
-        m_avg = df_mean_month[df_mean_month['miejscowość'] == city]
-        h_data = (m_avg.pivot_table(values='średnie_PM25', index='rok', columns='miesiąc').astype(float))
+        mesh = None
+        for ax, i in zip(axes, page_cities):
+            mesh = _heatmap_panel(ax, cities[i], years, values[i])
 
-        sns.heatmap(h_data, cmap='rocket_r', vmin=0.0, vmax=70.0, cbar=False, ax=ax)
-        ax.set_title(city)
-        ax.set_xlabel('Miesiąc')
-        ax.set_ylabel('Rok')
+        # Dodanie odpowiedniej skali kolorów
+        if mesh is not None:
+            cbar = fig.colorbar(mesh, ax=axes[:len(page_cities)].tolist(), orientation='vertical')
+            cbar.outline.set_linewidth(0)
+            cbar.set_label('Średnie PM2.5')
 
-    # Dodanie odpowiedniej skali kolorów
-    cbar = fig.colorbar(axes[0].collections[0], ax=axes, orientation='vertical')
-    cbar.set_label('Średnie PM2.5')
+        figures.append(_finish(fig, show, _page_path(path, page + 1, pages)))
 
-    plt.show()
+    return None if show else figures
 
 
 #ZADANIE 4
-def barplot(df_exc):
+def barplot(df_exc, show=True, path=None):
     """
         Funkcja tworzy grupowy wykres słupkowy liczby dni z przekroczeniem dobowej normy PM2.5.
 
@@ -101,55 +325,117 @@ def barplot(df_exc):
                 - 'miejscowość' (nazwa stacji),
                 - 'rok',
                 - 'ilość przekroczeń'.
+            show (bool, optional): Czy wyświetlić wykres. Domyślnie True. Przy False wykres rysowany jest
+                bez pyplot (backend Agg) i zwracany jako figura.
+            path (str, optional): Ścieżka pliku wykresu (.png, .svg). Domyślnie None – bez zapisu.
         Returns:
-            None
-            Funkcja wyświetla wykres słupkowy, nie zwraca wartości.
+            None przy show=True (funkcja wyświetla wykres słupkowy), w przeciwnym razie matplotlib.figure.Figure.
     """
-    plt.figure(figsize=(12, 9))
-    sns.barplot(data=df_exc, x='miejscowość', y='ilość przekroczeń', hue='rok', width=0.8)
-    plt.title("Wykres przekroczeń dobowej normy zanieczyszczeń PM2.5 dla wybranych stacji", size=20)
-    plt.ylabel("Ilość wykroczeń ponad dobową normę dla danego roku", size=13)
-    plt.xlabel("Stacje", size=13)
-    plt.grid()
-    plt.show()
+    fig = _figure(show, figsize=(12, 9))
+    ax = fig.subplots()
+    sns.barplot(data=df_exc, x='miejscowość', y='ilość przekroczeń', hue='rok', width=0.8, ax=ax)
+    ax.set_title("Wykres przekroczeń dobowej normy zanieczyszczeń PM2.5 dla wybranych stacji", size=20)
+    ax.set_ylabel("Ilość wykroczeń ponad dobową normę dla danego roku", size=13)
+    ax.set_xlabel("Stacje", size=13)
+    ax.grid()
+    return _finish(fig, show, path)
 
 #zadanie 5
-def plot_voivodeship_comparison(df_voivodeship):
+def plot_voivodeship_comparison(df_voivodeship, show=True, path=None):
     """
-    Funkcja generuje wykres słupkowy grupowany porównujący liczbę dni z przekroczeniem normy PM2.5 
+    Funkcja generuje wykres słupkowy grupowany porównujący liczbę dni z przekroczeniem normy PM2.5
     w województwach.
 
     Args:
         df_voivodeship (pd.DataFrame): Ramka danych z roczna liczbą przekroczeń w województwach.
+        show (bool, optional): Czy wyświetlić wykres. Domyślnie True. Przy False wykres rysowany jest
+            bez pyplot (backend Agg) i zwracany jako figura.
+        path (str, optional): Ścieżka pliku wykresu (.png, .svg). Domyślnie None – bez zapisu.
 
     Returns:
-        None: Funkcja nie zwraca żadnej wartości, generuje podgląd wykresu 
-            za pomocą plt.show().
+        None przy show=True (podgląd wykresu za pomocą plt.show()), w przeciwnym razie matplotlib.figure.Figure.
     """
 
     # Ustawienie stylu i rozmiaru wykresu
     sns.set_theme(style="whitegrid")
-    plt.figure(figsize=(15, 8))
+    fig = _figure(show, figsize=(15, 8))
+    ax = fig.subplots()
 
     # Rysowanie wykresu słupkowego
     # x: Województwo, y: liczba dni
-    ax = sns.barplot(
-        data=df_voivodeship, 
-        x='Województwo', 
-        y='liczba przekroczeń', 
-        hue='rok', 
-        palette='Pastel2'
+    sns.barplot(
+        data=df_voivodeship,
+        x='Województwo',
+        y='liczba przekroczeń',
+        hue='rok',
+        palette='Pastel2',
+        ax=ax
     )
 
     # Dodanie legendy i opisów
-    plt.title('Liczba dni z przekroczeniem normy PM2.5 w województwach', fontsize=16)
-    plt.xlabel('Województwo', fontsize=12)
-    plt.ylabel('liczba dni z przekroczeniem', fontsize=12)
-    plt.xticks(rotation=45, ha='right')
+    ax.set_title('Liczba dni z przekroczeniem normy PM2.5 w województwach', fontsize=16)
+    ax.set_xlabel('Województwo', fontsize=12)
+    ax.set_ylabel('liczba dni z przekroczeniem', fontsize=12)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
 
     # Dostosowanie legendy, aby nie zasłaniała danych
-    plt.legend(title='Rok pomiaru', bbox_to_anchor=(1.02, 1), loc='upper left')
+    ax.legend(title='Rok pomiaru', bbox_to_anchor=(1.02, 1), loc='upper left')
+
+    fig.tight_layout()
+    return _finish(fig, show, path)
+
+
+# dane wspólne wykresów dziedziczone przez procesy potomne (fork), żeby nie kopiować tabel przez pickle
+_pool_inputs = {}
+
+
+def _export_worker(function, kwargs, path, data=None):
+    # zadanie wykonywane w procesie potomnym: rysowanie i zapis jednego wykresu (figura nie wraca do rodzica)
+    if data is None:
+        data = _pool_inputs['data']
+    function(data, **kwargs, show=False, path=path)
+    return path
+
+
+def export_plots(data, jobs, directory, fmt='png', max_workers=None):
+    """
+        Zapisuje wiele wykresów do plików bez wyświetlania (np. nocny raport z wykresami dla wielu miast i lat).
+        Każdy wykres rysowany jest na osobnej figurze backendem Agg, a przy `max_workers` > 1 wykresy
+        powstają równolegle w puli procesów. Procesy potomne dziedziczą dane (fork, bez kopiowania).
+        Dane wspólne dla wszystkich wykresów warto przygotować raz, np. `trend_table` dla
+        `city_trends_plot` i `heatmap_plot`.
+
+        Args:
+            data: Pierwszy argument każdej funkcji rysującej (np. tabela z `trend_table`).
+            jobs (dict): Słownik {nazwa pliku bez rozszerzenia: (funkcja z `wykresy`, słownik pozostałych argumentów)},
+                         np. {'Kraków': (city_trends_plot, {'cities': ['Kraków'], 'years': [2015, 2024]})}.
+            directory (str): Katalog plików (tworzony, gdy nie istnieje).
+            fmt (str, optional): Format plików, jeden z `plot_formats`. Domyślnie 'png'.
+            max_workers (int, optional): Liczba procesów. Domyślnie None – wykresy rysowane kolejno.
+        Returns:
+            dict: Słownik {nazwa: ścieżka zapisanego pliku} (w kolejności `jobs`; heatmapy na wielu stronach
+                  zapisywane są z numerem strony, zob. `heatmap_plot`).
+    """
+    if fmt not in plot_formats:
+        raise ValueError(f"Nieznany format wykresu: {fmt} (dostępne: {', '.join(plot_formats)})")
+    os.makedirs(directory, exist_ok=True)
+    paths = {name: os.path.join(directory, f"{name}.{fmt}") for name in jobs}
+
+    if max_workers is None or max_workers <= 1 or len(jobs) <= 1:
+        for name, (function, kwargs) in jobs.items():
+            _export_worker(function, kwargs, paths[name], data)
+        return paths
 
-    plt.tight_layout()
-    plt.show()
-    return 
\ No newline at end of file
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if fork else None)
+    if fork:
+        _pool_inputs.update(data=data)
+    try:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs)), mp_context=context) as executor:
+            futures = [executor.submit(_export_worker, function, kwargs, paths[name], None if fork else data)
+                       for name, (function, kwargs) in jobs.items()]
+            for future in futures:
+                future.result()
+    finally:
+        _pool_inputs.clear()
+    return paths
@@ -0,0 +1,204 @@
+import glob
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import pamiec_podreczna
+from agregaty import DailyAggregates
+from obliczenia import count_daily_avg, count_monthly_avg_city, count_monthly_avg_station, voivodeship_above_norm_mean
+from stacje import StationIndex
+
+# domyślny katalog zapisanych wyników (obok archiwów w pamięci podręcznej)
+default_results_dir = os.path.join(pamiec_podreczna.default_cache_dir, "wyniki")
+
+# wersja sposobu liczenia wyników – zmiana unieważnia wszystkie zapisane tabele
+results_version = 1
+
+
+def fingerprint(*inputs):
+    """
+        Liczy odcisk (SHA-256) danych wejściowych.
+        - DataFrame, DailyAggregates i StationIndex – skrót zawartości (wymaga przejrzenia tabeli),
+        - ścieżka do istniejącego pliku – skrót zawartości pliku,
+        - None (nieznany odcisk, np. z `sources_fingerprint` bez archiwów w pamięci podręcznej) – odcisk jest nieznany,
+        - pozostałe wartości (np. odcisk z `sources_fingerprint`, słownik) – skrót zapisu JSON.
+        Args:
+            *inputs: Dane wejściowe wpływające na wyniki.
+        Returns:
+            str: Odcisk danych wejściowych (lub None, gdy któraś z danych wejściowych to None).
+    """
+    if any(item is None for item in inputs):
+        return None
+    digest = hashlib.sha256(f"v{results_version}".encode("utf-8"))
+    for item in inputs:
+        if isinstance(item, StationIndex):
+            item = fingerprint(item.stations, item.aliases.reset_index())
+        if isinstance(item, DailyAggregates):
+            item = item.daily
+        if isinstance(item, pd.DataFrame):
+            digest.update(pd.util.hash_pandas_object(item, index=False).to_numpy().tobytes())
+            digest.update(json.dumps([str(col) for col in item.columns]).encode("utf-8"))
+        elif isinstance(item, (str, os.PathLike)) and os.path.isfile(item):
+            digest.update(pamiec_podreczna.file_sha256(item).encode("utf-8"))
+        else:
+            digest.update(json.dumps(item, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def sources_fingerprint(cache_dir, gios_url_ids, gios_pm25_file):
+    """
+        Liczy odcisk danych źródłowych na podstawie skrótów archiwów zapisanych w pamięci podręcznej
+        (bez wczytywania tabeli pomiarów). Zmiana archiwum po stronie GIOŚ zmienia odcisk.
+        Args:
+            cache_dir (str): Katalog pamięci podręcznej archiwów (jak w `load_all_data`).
+            gios_url_ids (dict): Słownik {rok: ID archiwum GIOŚ}.
+            gios_pm25_file (dict): Słownik {rok: nazwa pliku PM2.5}.
+        Returns:
+            str: Odcisk danych źródłowych (lub None, gdy któregoś archiwum nie ma w pamięci podręcznej).
+    """
+    hashes = {}
+    for year, gios_id in gios_url_ids.items():
+        entry = pamiec_podreczna.get_entry(cache_dir, gios_id, gios_pm25_file[year])
+        if entry is None:
+            return None
+        hashes[str(year)] = entry['sha256']
+    return fingerprint(hashes)
+
+
+class ResultsStore:
+    """
+        Zapisane wyniki `obliczenia` (tabele Parquet) z kluczem: odcisk danych wejściowych, funkcja i parametry.
+
+        Tabela pomiarów (`data`) wczytywana jest dopiero wtedy, gdy któregoś wyniku brakuje, więc ponowne
+        otwarcie notatnika i rysowanie wykresów z zapisanych wyników nie wymaga danych godzinowych.
+        Zmiana danych wejściowych zmienia odcisk – zapisane wcześniej wyniki tej samej funkcji z tymi samymi
+        parametrami są wtedy usuwane przy zapisie nowych. Klucz wyników zależnych od metadanych stacji
+        (`voivodeship_above_norm_mean`) zawiera też odcisk metadanych (`meta`).
+        Gdy odcisk jest nieznany (None, np. archiwów nie ma jeszcze w pamięci podręcznej), wyniki są liczone
+        bez zapisywania.
+
+        Atrybuty:
+            directory (str): Katalog z zapisanymi wynikami.
+            fingerprint (str | None): Odcisk danych wejściowych (np. z `sources_fingerprint` lub `fingerprint`).
+    """
+
+    def __init__(self, fingerprint, data, meta=None, directory=default_results_dir):
+        """
+            Args:
+                fingerprint (str | None): Odcisk danych wejściowych (None – wyniki liczone bez zapisywania).
+                data (pd.DataFrame | DailyAggregates | callable): Tabela pomiarów (jak `final_df`), agregaty
+                                                                  lub funkcja bez argumentów, która je zwraca.
+                meta (pd.DataFrame | StationIndex | callable, optional): Metadane stacji (potrzebne
+                                                                       w `voivodeship_above_norm_mean`).
+                directory (str, optional): Katalog z zapisanymi wynikami. Domyślnie `.gios_cache/wyniki`.
+        """
+        self.fingerprint = fingerprint
+        self.directory = directory
+        self._inputs = {'data': data, 'meta': meta}
+        self._meta_fingerprint = None
+
+    def _input(self, name):
+        # dane wejściowe wczytywane przy pierwszym użyciu
+        value = self._inputs[name]
+        if callable(value) and not isinstance(value, (pd.DataFrame, DailyAggregates)):
+            value = self._inputs[name] = value()
+        return value
+
+    @property
+    def data(self):
+        """
+            Tabela pomiarów (wczytywana przy pierwszym użyciu).
+        """
+        return self._input('data')
+
+    @property
+    def meta(self):
+        """
+            Metadane stacji (wczytywane przy pierwszym użyciu).
+        """
+        return self._input('meta')
+
+    def _key(self, uses_meta=False):
+        # odcisk wyniku: odcisk danych, a dla wyników zależnych od metadanych także odcisk metadanych
+        if not uses_meta or self.fingerprint is None:
+            return self.fingerprint
+        if self._meta_fingerprint is None:
+            self._meta_fingerprint = fingerprint(self.meta)
+        return fingerprint(self.fingerprint, self._meta_fingerprint)
+
+    def path(self, name, uses_meta=False, **params):
+        """
+            Zwraca ścieżkę pliku z wynikiem funkcji `name` dla podanych parametrów
+            (lub None, gdy odcisk danych jest nieznany).
+        """
+        key = self._key(uses_meta)
+        if key is None:
+            return None
+        params_hash = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.directory, f"{name}-{params_hash}-{key[:16]}.parquet")
+
+    def get(self, name, compute, uses_meta=False, **params):
+        """
+            Zwraca zapisany wynik albo liczy go (`compute()`), zapisuje i zwraca.
+            Args:
+                name (str): Nazwa wyniku (np. nazwa funkcji z `obliczenia`).
+                compute (callable): Funkcja bez argumentów licząca wynik.
+                uses_meta (bool, optional): Czy wynik zależy od metadanych stacji (odcisk metadanych
+                                            jest wtedy częścią klucza). Domyślnie False.
+                **params: Parametry wyniku (część klucza).
+            Returns:
+                pd.DataFrame: Wynik.
+        """
+        path = self.path(name, uses_meta, **params)
+        if path is None:
+            return compute()
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+
+        result = compute()
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        result.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+        # unieważnienie wyników tej samej funkcji i parametrów policzonych dla innych danych
+        for stale in glob.glob(path.rsplit("-", 1)[0] + "-*.parquet"):
+            if stale != path:
+                os.remove(stale)
+        return result
+
+    def monthly_avg_station(self):
+        """
+            Wynik `count_monthly_avg_station`.
+        """
+        return self.get('count_monthly_avg_station', lambda: count_monthly_avg_station(self.data))
+
+    def monthly_avg_city(self, cities=None, years=None):
+        """
+            Wynik `count_monthly_avg_city` dla podanych miast i lat.
+        """
+        return self.get('count_monthly_avg_city', lambda: count_monthly_avg_city(self.data, cities, years),
+                        cities=cities, years=years)
+
+    def daily_avg(self, norm=15, reference_year=2024, k=3):
+        """
+            Wynik `count_daily_avg` dla podanej normy, roku odniesienia i liczby stacji.
+        """
+        return self.get('count_daily_avg', lambda: count_daily_avg(self.data, norm, reference_year, k),
+                        norm=norm, reference_year=reference_year, k=k)
+
+    def voivodeship_above_norm_mean(self, norm=15):
+        """
+            Wynik `voivodeship_above_norm_mean` dla podanej normy.
+        """
+        return self.get('voivodeship_above_norm_mean',
+                        lambda: voivodeship_above_norm_mean(self.meta, self.data, norm), uses_meta=True, norm=norm)
+
+    def clear(self):
+        """
+            Usuwa wszystkie zapisane wyniki.
+        """
+        for path in glob.glob(os.path.join(self.directory, "*.parquet")):
+            os.remove(path)
@@ -0,0 +1,272 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+
+import pamiec_podreczna
+from instrumentacja import instrumented
+from obliczenia import drop_unused_categories
+
+# domyślny katalog zapisanej tabeli pomiarów (obok archiwów w pamięci podręcznej)
+default_measurements_dir = os.path.join(pamiec_podreczna.default_cache_dir, "pomiary")
+
+# kolumny zapisanej tabeli pomiarów ('rok' jest kluczem partycji: katalogi rok=2024/...)
+measurement_columns = ('czas', 'stacja', 'miejscowość', 'rok', 'miesiąc', 'wartość')
+
+# liczba wierszy w grupie wierszy Parquet – przy tabeli posortowanej po miejscowości i stacji
+# statystyki min/max grup pozwalają czytelnikowi pominąć grupy innych miast
+row_group_size = 64 * 1024
+
+# dostępne silniki zapytań:
+# - 'arrow'  – `pyarrow.dataset`, filtry i wybór kolumn przekazywane do czytnika Parquet,
+# - 'duckdb' – zapytanie SQL na plikach Parquet (wymaga pakietu duckdb).
+query_engines = ('arrow', 'duckdb')
+
+# funkcje agregujące `MeasurementQuery.aggregate` (liczba z przedziału (0, 1) oznacza kwantyl)
+query_stats = ('mean', 'median', 'min', 'max', 'count')
+
+
+def _partition_dir(directory, year):
+    return os.path.join(directory, f"rok={int(year)}")
+
+
+def _sorted_categories(values):
+    # kategorie w porządku leksykograficznym, żeby sortowanie po kodach dawało ciągłe zakresy napisów
+    return values.cat.reorder_categories(sorted(values.cat.categories))
+
+
+@instrumented
+def save_measurements(df, directory=default_measurements_dir):
+    """
+        Zapisuje tabelę pomiarów (format long) jako pliki Parquet partycjonowane po roku (`rok=2024/part-0.parquet`).
+        Wiersze każdego roku są posortowane po miejscowości, stacji i czasie, a kody stacji i miejscowości
+        zapisane jako zwykłe napisy, więc zapytania o wybrane miasta czytają tylko pasujące grupy wierszy.
+        Nadpisywane są tylko lata obecne w `df` – pozostałe partycje zostają bez zmian.
+        Args:
+            df (pd.DataFrame): DataFrame z kolumnami 'czas', 'stacja', 'miejscowość', 'rok', 'wartość'
+                               (i opcjonalnie 'miesiąc', np. po `add_month_column`).
+            directory (str, optional): Katalog tabeli. Domyślnie `.gios_cache/pomiary`.
+        Returns:
+            list: Ścieżki zapisanych plików.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = [col for col in measurement_columns if col != 'rok']
+    paths = []
+    for year in np.unique(df['rok'].to_numpy()):
+        part = df.loc[df['rok'].to_numpy() == year, [col for col in columns if col in df.columns]]
+        if 'miesiąc' not in part.columns:
+            part = part.assign(miesiąc=part['czas'].dt.month.astype('int8'))
+        part = part.assign(stacja=_sorted_categories(part['stacja'].astype('category')),
+                           miejscowość=_sorted_categories(part['miejscowość'].astype('category')))
+        part = part.sort_values(['miejscowość', 'stacja', 'czas'])[columns]
+
+        table = pa.Table.from_pandas(part, preserve_index=False)
+        table = table.cast(pa.schema([pa.field(field.name, pa.string()) if pa.types.is_dictionary(field.type)
+                                      else field for field in table.schema]))
+
+        path = os.path.join(_partition_dir(directory, year), "part-0.parquet")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=row_group_size)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def _values_list(values):
+    # pojedyncza wartość, lista, range albo tablica -> lista wartości Pythona
+    return np.atleast_1d(np.asarray(values, dtype=object) if isinstance(values, str) else values).tolist()
+
+
+def _compact(df):
+    # układ wyniku jak w tabeli pomiarów: kody jako category, rok int16, miesiąc int8
+    for col in ('stacja', 'miejscowość'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'rok' in df.columns:
+        df['rok'] = df['rok'].astype('int16')
+    if 'miesiąc' in df.columns:
+        df['miesiąc'] = df['miesiąc'].astype('int8')
+    return drop_unused_categories(df)
+
+
+class MeasurementQuery:
+    """
+        Leniwe zapytanie do tabeli pomiarów zapisanej przez `save_measurements`.
+
+        Metody `where`, `between` i `select` zwracają nowe zapytanie i niczego nie wczytują. Dopiero
+        `to_pandas` albo `aggregate` czyta pliki: lata wybierane są po katalogach partycji, pozostałe
+        warunki i lista kolumn przekazywane są do czytnika Parquet (pomijane są grupy wierszy, które
+        nie mogą spełnić warunków), więc zapytanie o jedno miasto nie wczytuje całej tabeli.
+        Wyniki mają te same kolumny i typy co tabele z `obliczenia` i można je przekazać do `wykresy`.
+
+        Atrybuty:
+            directory (str): Katalog tabeli pomiarów.
+            engine (str): Silnik zapytań, jeden z `query_engines`.
+    """
+
+    def __init__(self, directory=default_measurements_dir, engine='arrow'):
+        """
+            Args:
+                directory (str, optional): Katalog tabeli pomiarów. Domyślnie `.gios_cache/pomiary`.
+                engine (str, optional): Silnik zapytań, jeden z `query_engines`. Domyślnie 'arrow'.
+        """
+        if engine not in query_engines:
+            raise ValueError(f"Nieznany silnik zapytań: {engine} (dostępne: {', '.join(query_engines)})")
+        self.directory = directory
+        self.engine = engine
+        self._filters = {}
+        self._time_range = (None, None)
+        self._columns = None
+
+    def _derive(self, **changes):
+        query = copy.copy(self)
+        for name, value in changes.items():
+            setattr(query, name, value)
+        return query
+
+    @staticmethod
+    def _check_columns(columns):
+        unknown = [col for col in columns if col not in measurement_columns]
+        if unknown:
+            raise ValueError(f"Nieznane kolumny: {', '.join(unknown)} (dostępne: {', '.join(measurement_columns)})")
+
+    def where(self, **conditions):
+        """
+            Dodaje warunki „kolumna należy do listy wartości”, np. `where(miejscowość=['Kraków'], rok=range(2015, 2025))`.
+            Args:
+                **conditions: Kolumna tabeli pomiarów -> wartość lub lista wartości.
+            Returns:
+                MeasurementQuery: Nowe zapytanie.
+        """
+        self._check_columns(conditions)
+        filters = dict(self._filters)
+        filters.update({col: _values_list(values) for col, values in conditions.items()})
+        return self._derive(_filters=filters)
+
+    def between(self, start=None, end=None):
+        """
+            Ogranicza pomiary do przedziału czasu [start, end) (None – bez ograniczenia).
+            Returns:
+                MeasurementQuery: Nowe zapytanie.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        return self._derive(_time_range=(start, end))
+
+    def select(self, *columns):
+        """
+            Wybiera kolumny wyniku `to_pandas` (pozostałe kolumny nie są wczytywane).
+            Returns:
+                MeasurementQuery: Nowe zapytanie.
+        """
+        self._check_columns(columns)
+        return self._derive(_columns=list(columns))
+
+    def to_pandas(self):
+        """
+            Wykonuje zapytanie i zwraca wybrane pomiary.
+            Returns:
+                pd.DataFrame: Pomiary spełniające warunki (kolumny z `select`, domyślnie wszystkie).
+        """
+        columns = self._columns or list(measurement_columns)
+        if self.engine == 'duckdb':
+            df = self._duckdb(', '.join(f'"{col}"' for col in columns))
+        else:
+            df = self._arrow_table(columns).to_pandas()
+        return _compact(df[columns])
+
+    def aggregate(self, by=('miejscowość', 'rok', 'miesiąc'), stat='mean', name='średnie_PM25'):
+        """
+            Wykonuje zapytanie i liczy statystykę wartości pomiarów w grupach.
+            Domyślnie zwraca średnie miesięczne dla miejscowości (układ `count_monthly_avg_city`,
+            do użycia w `city_trends_plot` i `heatmap_plot`).
+            Args:
+                by (list, optional): Kolumny grupujące. Domyślnie ['miejscowość', 'rok', 'miesiąc'].
+                stat (str | float, optional): Jedna z `query_stats` albo liczba z przedziału (0, 1) – kwantyl.
+                                              Domyślnie 'mean'.
+                name (str, optional): Nazwa kolumny wyniku. Domyślnie 'średnie_PM25'.
+            Returns:
+                pd.DataFrame: DataFrame z kolumnami `by` i `name` (float32, dla 'count' liczba pomiarów),
+                              posortowany po `by`.
+        """
+        by = list(by)
+        self._check_columns(by)
+        if isinstance(stat, str):
+            if stat not in query_stats:
+                raise ValueError(f"Nieznana statystyka: {stat} (dostępne: {', '.join(query_stats)} lub kwantyl)")
+        elif not 0 < stat < 1:
+            raise ValueError(f"Kwantyl musi należeć do przedziału (0, 1): {stat}")
+
+        if self.engine == 'duckdb':
+            result = self._duckdb_aggregate(by, stat, name)
+        else:
+            df = _compact(self._arrow_table(by + ['wartość']).to_pandas())
+            values = df.groupby(by, observed=True, sort=True)['wartość']
+            result = (values.quantile(stat) if not isinstance(stat, str) else values.agg(stat)).rename(name).reset_index()
+
+        result = _compact(result.sort_values(by, ignore_index=True))
+        if stat != 'count':
+            result[name] = result[name].astype('float32')
+        return result
+
+    def _arrow_table(self, columns):
+        # filtry jako wyrażenie `pyarrow.dataset` – lata wybierają katalogi, reszta działa na statystykach grup wierszy
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(self.directory, format='parquet', partitioning='hive')
+        expression = None
+        for col, values in self._filters.items():
+            condition = ds.field(col).isin(values)
+            expression = condition if expression is None else expression & condition
+        start, end = self._time_range
+        for condition in ((ds.field('czas') >= pa.scalar(start.to_pydatetime())) if start is not None else None,
+                          (ds.field('czas') < pa.scalar(end.to_pydatetime())) if end is not None else None):
+            if condition is not None:
+                expression = condition if expression is None else expression & condition
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def _duckdb_where(self):
+        conditions, params = [], []
+        for col, values in self._filters.items():
+            conditions.append(f'"{col}" IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+        start, end = self._time_range
+        if start is not None:
+            conditions.append('"czas" >= ?')
+            params.append(start.to_pydatetime())
+        if end is not None:
+            conditions.append('"czas" < ?')
+            params.append(end.to_pydatetime())
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def _duckdb(self, select, group_by=None):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("Silnik zapytań 'duckdb' wymaga pakietu duckdb (pip install duckdb)") from e
+        import pyarrow as pa
+
+        source = os.path.join(self.directory, "*", "*.parquet").replace("'", "''")
+        where, params = self._duckdb_where()
+        sql = (f"SELECT {select} FROM read_parquet('{source}', hive_partitioning = true, "
+               f"hive_types = {{'rok': INTEGER}}){where}")
+        if group_by:
+            sql += f" GROUP BY {group_by}"
+        # wynik przez Arrow – ta sama konwersja typów (czas, napisy) co w silniku 'arrow', niezależnie od wersji duckdb;
+        # rok z nazw katalogów jako INTEGER (jak w `pyarrow.dataset`), a nie domyślny BIGINT
+        with duckdb.connect() as connection:
+            return pa.table(connection.execute(sql, params).arrow()).to_pandas()
+
+    def _duckdb_aggregate(self, by, stat, name):
+        functions = {'mean': 'avg', 'median': 'median', 'min': 'min', 'max': 'max', 'count': 'count'}
+        keys = ', '.join(f'"{col}"' for col in by)
+        if isinstance(stat, str):
+            value = f'{functions[stat]}("wartość")'
+        else:
+            value = f'quantile_cont("wartość", {float(stat)})'
+        return self._duckdb(f'{keys}, {value} AS "{name}"', group_by=keys)